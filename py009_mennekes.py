@@ -9,8 +9,8 @@
 # Import knihoven
 # ----------------------------------------------------------------------------------------------------------------------
 
-# časování
-import time
+# overeni pripravenosti serveru v rezimu asyncio
+import threading
 
 # čtení příkazové řádky
 import sys
@@ -29,9 +29,21 @@ from src import peg_msg
 from src.peg_global_scope import PRODUCT_IDENTIFICATION
 from src.peg_global_scope import getsettings
 
+# trvale ulozeni registru
+from src.peg_global_scope import DATASTORE_PERSISTENCE
+
+# periody stupnu hlavni smycky
+from src.peg_global_scope import SCHEDULER_PERIODS
+
+# zpusob behu serveru a vstupu a vystupu
+from src.peg_global_scope import RUNTIME
+
 # singletony
 from src.peg_global_scope import singleton_modbus_datastore as modbus_datastore
 
+# casy kroku startu programu
+from src.peg_global_scope import singleton_startup_timer as startup_timer
+
 # počáteční hodnoty adres
 from src.peg_global_scope import IP_ADDRESS
 from src.peg_global_scope import PORT_MODBUS
@@ -46,6 +58,18 @@ from src.peg_web import WebServer
 # vykonna funkce
 from src.peg_exe import Execution
 
+# planovac hlavni smycky
+from src.peg_sch import Scheduler
+
+# beh v jedne smycce asyncio
+from src.peg_asy import AsyncRuntime
+
+# servery v oddelenem procesu
+from src.peg_prc import ServerProcess
+
+# zaznam vzorku hw a zapisu klientu
+from src.peg_rec import Recorder
+
 # ----------------------------------------------------------------------------------------------------------------------
 # Konstanty modulu
 # ----------------------------------------------------------------------------------------------------------------------
@@ -101,6 +125,7 @@ class PY009Mennekes:
             getsettings(sys.argv[1:])
         else:
             getsettings(terminal_argv)
+        startup_timer.mark('config')
 
         # volani prikazu pro konzoli za ucelem spusteni funkce ANSI znaku
         os.system('echo "Program {0} {1}, verze {2}"'.format(
@@ -144,9 +169,16 @@ class PY009Mennekes:
         self.port_web = PORT_WEB
         self.port_modbus = PORT_MODBUS
 
-        # nastaveni pocatecnich hodnot strid v modbusu
-        modbus_datastore.set_hr_state(name="CP_DUTY1", value=100)
-        modbus_datastore.set_hr_state(name="CP_DUTY2", value=100)
+        # obnoveni trvale ulozenych registru
+        restored = False
+        if DATASTORE_PERSISTENCE["persist_path"]:
+            restored = modbus_datastore.persist(DATASTORE_PERSISTENCE["persist_path"])
+
+        # nastaveni pocatecnich hodnot strid v modbusu, pokud nejsou obnoveny z trvaleho ulozeni
+        if not restored:
+            modbus_datastore.set_hr_state(name="CP_DUTY1", value=100)
+            modbus_datastore.set_hr_state(name="CP_DUTY2", value=100)
+        startup_timer.mark('datastore')
 
         # tvorba objektu modbus serveru
         self.srvmdb = ModbusServer(datastore=modbus_datastore,
@@ -157,8 +189,51 @@ class PY009Mennekes:
         self.srvweb = WebServer(host=self.ipaddr,
                                 port=self.port_web)
 
-        # zalozeni vykonneho objektu
-        self.process = Execution()
+        # servery v oddelenem procesu nad sdilenym datovym prostorem, proces vznika forkem pred zalozenim vlaken
+        self.srvproc = None
+        if RUNTIME['mode'] == 'process' and modbus_datastore.share():
+            self.srvproc = ServerProcess(servers=[self.srvmdb, self.srvweb])
+            peg_msg.warningmsg("Start procesu modbus a WEB serveru")
+            self.srvproc.restart()
+        elif RUNTIME['mode'] != 'asyncio':
+            # servery ve vlaknech startuji soubezne s inicializaci periferii, pripravenost se overi v main()
+            peg_msg.warningmsg("Start modbus serveru")
+            self.srvmdb.restart()
+            peg_msg.warningmsg("Start WEB serveru")
+            self.srvweb.restart()
+        startup_timer.mark('servers_started')
+
+        # zaznam vzorku hw a zapisu klientu pro pozdejsi prehrani, zapisy klientu procesu serveru se nezaznamenaji
+        self.recorder = None
+        if RUNTIME['record_path']:
+            if self.srvproc is not None:
+                peg_msg.warningmsg("Zapisy klientu serveru v oddelenem procesu se nezaznamenavaji")
+            self.recorder = Recorder(RUNTIME['record_path'])
+
+        # zalozeni vykonneho objektu, v rezimu asyncio bez vlastnich vlaken SPI a elektromeru
+        self.asyncio_mode = RUNTIME['mode'] == 'asyncio'
+        self.process = Execution(threaded=not self.asyncio_mode, recorder=self.recorder)
+        startup_timer.mark('execution')
+
+        # planovac stupnu vykonne funkce, kontroly serveru a ukladani registru, znacka kroku zaznamu pred stupni
+        self.scheduler = Scheduler()
+        self.process.register(self.scheduler)
+        if self.recorder is not None:
+            self.scheduler.add('record', self.recorder.tick, SCHEDULER_PERIODS['digital_period'], priority=-1)
+        if not self.asyncio_mode:
+            self.scheduler.add('supervision', self.supervise, SCHEDULER_PERIODS['supervision_period'], priority=10)
+        self.scheduler.add('sync', modbus_datastore.sync, DATASTORE_PERSISTENCE['sync_period'], priority=11)
+        self.srvweb_errcnt = 0
+        self.srvmdb_errcnt = 0
+
+        # beh serveru, hlavni smycky a uloh hw v jedne smycce asyncio, servery hlida samo behove prostredi
+        self.runtime = None
+        if self.asyncio_mode:
+            self.runtime = AsyncRuntime(scheduler=self.scheduler,
+                                        io_tasks=self.process.get_io_tasks(),
+                                        servers=[('modbus', self.srvmdb.serve_async),
+                                                 ('web', self.srvweb.serve_async)],
+                                        io_workers=RUNTIME['io_workers'])
 
         # povoleni behu programu v nekonecne smycce
         self.program_enable = True
@@ -171,6 +246,11 @@ class PY009Mennekes:
         -------
             None.
         """
+        try:
+            self.srvproc.kill()
+        except AttributeError:
+            pass
+
         try:
             self.srvweb.kill()
         except AttributeError:
@@ -181,6 +261,13 @@ class PY009Mennekes:
         except AttributeError:
             pass
 
+        # ulozeni poslednich zmen registru a zbytku zaznamu
+        modbus_datastore.sync()
+        try:
+            self.recorder.close()
+        except AttributeError:
+            pass
+
     def main(self):
         """
         Hlavni programova smycka se vykonava do okamziku ukonceni chybou nebo zasahu uzivatele.
@@ -191,52 +278,89 @@ class PY009Mennekes:
             kod chyby pro prikazovou radku, bez chyby je 0.
         """
 
-        peg_msg.warningmsg("Start modbus serveru")
-        self.srvmdb.restart()
-        time.sleep(2)
-        if not self.srvmdb.is_alive():
-            peg_msg.errormsg("Vlakno modbus serveru se nepodarilo spustit")
-            exit(1)
+        if self.asyncio_mode:
+            # servery startuji az se smyckou asyncio, pripravenost se overi ve vlakne
+            threading.Thread(target=self.wait_servers, daemon=True, name='peg_startup').start()
+            peg_msg.validmsg("Spusteni hlavni programove smycky v rezimu asyncio.")
+            self.runtime.run()
+            return
 
-        peg_msg.warningmsg("Start WEB serveru")
-        self.srvweb.restart()
-        time.sleep(2)
-        if not self.srvweb.is_alive():
-            peg_msg.errormsg("Vlakno WEB serveru se nepodarilo spustit")
+        if not self.wait_servers():
             exit(1)
 
         # sousteni programove smycky
         peg_msg.validmsg("Spusteni hlavni programove smycky.")
 
-        srvweb_errcnt = 0
-        srvmdb_errcnt = 0
         while self.program_enable:
-            # kontrola behu web serveru
-            if not self.srvweb.is_alive():
-                if srvweb_errcnt < 10:
-                    srvweb_errcnt = srvweb_errcnt + 1
-                else:
-                    peg_msg.warningmsg('Restart weboveho serveru')
-                    self.srvweb.restart()
-                    srvweb_errcnt = 0
-            else:
-                srvweb_errcnt = 0
-
-            # kontrola behu modbus serveru
-            if not self.srvmdb.is_alive():
-                if srvmdb_errcnt < 10:
-                    srvmdb_errcnt = srvmdb_errcnt + 1
-                else:
-                    peg_msg.warningmsg('Restart modbus serveru')
-                    self.srvmdb.restart()
-                    srvmdb_errcnt = 0
-            else:
-                srvweb_errcnt = 0
+            self.scheduler.run_once()
 
-            # vybaveni funkci pripravku
-            self.process.execute()
+    def wait_servers(self) -> bool:
+        """
+        Cekani na pripravenost serveru: modbus server odpovida na dotaz a web server prijima spojeni. Doba do prvni
+        odpovedi modbus serveru se zapise do registru STARTUP_MODBUS a vypise se prehled casu startu.
+
+        Returns
+        -------
+        ready : bool
+            True pokud jsou servery pripraveny, jinak False.
+        """
+        if self.srvproc is not None:
+            alive = self.srvproc.is_alive
+        elif self.asyncio_mode:
+            alive = lambda: self.program_enable
+        else:
+            alive = None
+
+        if not self.srvmdb.wait_ready(alive=alive):
+            peg_msg.errormsg("Modbus server se nepodarilo spustit")
+            return False
+        modbus_datastore.set_ir_state('STARTUP_MODBUS', round(startup_timer.mark('modbus_ready')))
+
+        if not self.srvweb.wait_ready(alive=alive):
+            peg_msg.errormsg("WEB server se nepodarilo spustit")
+            return False
+        startup_timer.mark('web_ready')
+
+        peg_msg.validmsg("Servery pripraveny, casy startu:")
+        startup_timer.report()
+        return True
+
+    def supervise(self):
+        """
+        Kontrola behu serveru a jejich restart po opakovanem zjisteni vypadku.
 
-            time.sleep(0.2)
+        Returns
+        -------
+            None
+        """
+        # servery v oddelenem procesu hlida sam proces, zde se hlida jen beh procesu
+        if self.srvproc is not None:
+            if not self.srvproc.is_alive():
+                peg_msg.warningmsg('Restart procesu serveru')
+                self.srvproc.restart()
+            return
+
+        # kontrola behu web serveru
+        if not self.srvweb.is_alive():
+            if self.srvweb_errcnt < 10:
+                self.srvweb_errcnt = self.srvweb_errcnt + 1
+            else:
+                peg_msg.warningmsg('Restart weboveho serveru')
+                self.srvweb.restart()
+                self.srvweb_errcnt = 0
+        else:
+            self.srvweb_errcnt = 0
+
+        # kontrola behu modbus serveru
+        if not self.srvmdb.is_alive():
+            if self.srvmdb_errcnt < 10:
+                self.srvmdb_errcnt = self.srvmdb_errcnt + 1
+            else:
+                peg_msg.warningmsg('Restart modbus serveru')
+                self.srvmdb.restart()
+                self.srvmdb_errcnt = 0
+        else:
+            self.srvmdb_errcnt = 0
 
     def kill(self):
         """
@@ -248,6 +372,8 @@ class PY009Mennekes:
         """
         peg_msg.warningmsg("Hlavni smycka programu ukoncena na zaklade ukonceni povoleni behu.")
         self.program_enable = False
+        if self.runtime is not None:
+            self.runtime.kill()
 
 
 
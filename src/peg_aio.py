@@ -7,8 +7,11 @@
 # Import knihoven
 # ----------------------------------------------------------------------------------------------------------------------
 
-# knihovna pro adc
-import Adafruit_BBIO.ADC as ADC
+# pristup k ADC a PWM pres backend periferii
+try:
+    import peg_hal
+except ImportError:
+    from src import peg_hal
 
 # časování smyčky
 import time
@@ -28,10 +31,17 @@ except ImportError:
 # ----------------------------------------------------------------------------------------------------------------------
 class Aio:
 
-    def __init__(self):
+    def __init__(self, hal: peg_hal.Backend = None):
         """
         Nastavení funkce analogových vstupů a výstupů pro CP a PP signály.
+
+        Parameters
+        ----------
+        hal : peg_hal.Backend
+            backend periferií, v základu společný backend programu podle konfigurace.
         """
+        self.__hal = hal if hal is not None else peg_hal.get_backend()
+
         # konstatny
         # slovník názvů analogových výstupů
         self.ANALOG_OUTPUTS = {
@@ -65,10 +75,10 @@ class Aio:
         }
 
         # inicializace adc
-        ADC.setup()
+        self.__hal.adc_setup()
 
         for key in self.__ANALOG_SCALES:
-            idle = ADC.read(self.ANALOG_INPUTS[key])
+            idle = self.__hal.adc_read(self.ANALOG_INPUTS[key])
             if idle > self.__ANALOG_SCALES[key]['idle']:
                 self.__ANALOG_SCALES[key]['idle'] = idle
 
@@ -80,19 +90,16 @@ class Aio:
 
         # inicializace pwm
         for key in self.ANALOG_OUTPUTS:
-            with open(self.ANALOG_OUTPUTS[key] + 'period', 'w') as period:
-                # udaj je v ns
-                period.write(str(self.__ANALOG_OUTPUT_PERIOD[key]))
+            # udaj je v ns
+            self.__hal.pwm_write(self.ANALOG_OUTPUTS[key], 'period', str(self.__ANALOG_OUTPUT_PERIOD[key]))
 
             self.set_output(name=key, duty=100)
 
-            with open(self.ANALOG_OUTPUTS[key] + 'polarity', 'w') as polarity:
-                # udaj muze byt bud 'normal' nebo 'inversed'
-                polarity.write('inversed')
+            # udaj muze byt bud 'normal' nebo 'inversed'
+            self.__hal.pwm_write(self.ANALOG_OUTPUTS[key], 'polarity', 'inversed')
 
-            with open(self.ANALOG_OUTPUTS[key] + 'enable', 'w') as enable:
-                # udaj je bud 0 nebo 1
-                enable.write('1')
+            # udaj je bud 0 nebo 1
+            self.__hal.pwm_write(self.ANALOG_OUTPUTS[key], 'enable', '1')
 
     def __del__(self):
         """
@@ -104,9 +111,8 @@ class Aio:
         """
 
         for key in self.ANALOG_OUTPUTS:
-            with open(self.ANALOG_OUTPUTS[key] + 'enable', 'w') as enable:
-                # udaj je bud 0 nebo 1
-                enable.write('0')
+            # udaj je bud 0 nebo 1
+            self.__hal.pwm_write(self.ANALOG_OUTPUTS[key], 'enable', '0')
 
     def check_calibration(self):
         """
@@ -118,7 +124,7 @@ class Aio:
             None
         """
         for key in self.ANALOG_INPUTS:
-            val = ADC.read(self.ANALOG_INPUTS[key])
+            val = self.__hal.adc_read(self.ANALOG_INPUTS[key])
             if val > 0.8:
                 idle = self.__ANALOG_SCALES[key]['idle'] * 15 + val
                 self.__ANALOG_SCALES[key]['idle'] = idle / 16
@@ -142,9 +148,8 @@ class Aio:
             self.__ANALOG_OUTPUT_DUTY[name] = duty
             duty_in_ns = int(duty * self.__ANALOG_OUTPUT_PERIOD[name] / 100)
 
-            with open(self.ANALOG_OUTPUTS[name] + 'duty_cycle', 'w') as duty_cycle:
-                # udaj je v ns, musi byt mene nez perioda
-                duty_cycle.write(str(duty_in_ns))
+            # udaj je v ns, musi byt mene nez perioda
+            self.__hal.pwm_write(self.ANALOG_OUTPUTS[name], 'duty_cycle', str(duty_in_ns))
 
 
 
@@ -181,7 +186,7 @@ class Aio:
             aktuální hodnota analogového vstupu.
         """
         if name in self.ANALOG_INPUTS and name in self.__ANALOG_SCALES:
-            val = ADC.read(self.ANALOG_INPUTS[name]) / self.__ANALOG_SCALES[name]['idle']
+            val = self.__hal.adc_read(self.ANALOG_INPUTS[name]) / self.__ANALOG_SCALES[name]['idle']
             if val > 0.99:
                 val = 0.99
 
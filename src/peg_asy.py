@@ -0,0 +1,245 @@
+""" ASYNC Běh programu v jedné smyčce asyncio
+
+    Modul nabízí běhové prostředí, ve kterém servery (modbus, web), hlavní programová smyčka a vyčítání periferií
+    běží jako úlohy jediné smyčky asyncio místo samostatných vláken. Blokující volání hw (SPI, sériová linka
+    elektroměrů) se spouští v malém fondu vláken, takže nezdržují smyčku. Na jednojádrovém procesoru se tak omezí
+    přepínání vláken a soupeření o GIL.
+"""
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Import knihoven
+# ----------------------------------------------------------------------------------------------------------------------
+# smycka uloh
+import asyncio
+
+# fond vlaken pro blokujici volani hw
+from concurrent.futures import ThreadPoolExecutor
+
+# monotonni casovani
+import time
+
+# planovac periodickych uloh
+try:
+    from peg_sch import Scheduler, MAX_SLEEP
+except (ImportError, ModuleNotFoundError):
+    from src.peg_sch import Scheduler, MAX_SLEEP
+
+# hlaseni na konzoli
+try:
+    import peg_msg
+except ImportError:
+    from src import peg_msg
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Konstanty modulu
+# ----------------------------------------------------------------------------------------------------------------------
+# zakladni pocet vlaken pro blokujici volani hw
+DEFAULT_IO_WORKERS = 2
+
+# prodleva pred novym spustenim serveru, ktery neocekavane skoncil, v sekundach
+SERVER_RESTART_DELAY = 2.0
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Hlavní třída modulu
+# ----------------------------------------------------------------------------------------------------------------------
+class AsyncRuntime:
+    """
+    Běhové prostředí s jedinou smyčkou asyncio pro servery, hlavní smyčku a periodické úlohy hw.
+    """
+
+    def __init__(self, scheduler: Scheduler, io_tasks: list = None, servers: list = None,
+                 io_workers: int = DEFAULT_IO_WORKERS):
+        """
+        Založení běhového prostředí, smyčka se spouští funkcí run().
+
+        Parameters
+        ----------
+        scheduler : Scheduler
+            plánovač hlavní smyčky, jeho úlohy se vykonávají přímo ve smyčce asyncio,
+        io_tasks : list
+            blokující periodické úlohy hw [(název, funkce, perioda v sekundách)], spouští se ve fondu vláken,
+        servers : list
+            servery [(název, funkce vracející korutinu)], např. ModbusServer.serve_async,
+        io_workers : int
+            počet vláken fondu pro blokující volání.
+        """
+        self.__scheduler = scheduler
+        self.__io_tasks = list(io_tasks or [])
+        self.__servers = list(servers or [])
+        self.__io_workers = max(1, int(io_workers))
+        self.__loop = None
+        self.__stop = None
+        self.__executor = None
+
+    def run(self):
+        """
+        Spuštění smyčky asyncio. Funkce se vrátí po zavolání kill() nebo přerušení z klávesnice.
+
+        Returns
+        -------
+            None
+        """
+        asyncio.run(self.__main())
+
+    def kill(self):
+        """
+        Požadavek na ukončení smyčky, lze volat z libovolného vlákna.
+
+        Returns
+        -------
+            None
+        """
+        if self.__loop is not None and self.__stop is not None:
+            self.__loop.call_soon_threadsafe(self.__stop.set)
+
+    async def run_blocking(self, function, *args):
+        """
+        Spuštění blokující funkce ve fondu vláken běhového prostředí.
+
+        Parameters
+        ----------
+        function : callable
+            blokující funkce,
+        args :
+            parametry funkce.
+
+        Returns
+        -------
+            návratová hodnota funkce.
+        """
+        return await self.__loop.run_in_executor(self.__executor, function, *args)
+
+    async def __main(self):
+        """
+        Hlavní korutina: založí úlohy, čeká na požadavek ukončení a úlohy zruší.
+
+        Returns
+        -------
+            None
+        """
+        self.__loop = asyncio.get_running_loop()
+        self.__stop = asyncio.Event()
+        self.__executor = ThreadPoolExecutor(max_workers=self.__io_workers, thread_name_prefix='peg_io')
+
+        tasks = [asyncio.create_task(self.__control(), name='control')]
+        for name, function, period in self.__io_tasks:
+            tasks.append(asyncio.create_task(self.__io(name, function, period), name=name))
+        for name, factory in self.__servers:
+            tasks.append(asyncio.create_task(self.__serve(name, factory), name=name))
+        peg_msg.validmsg("Spusteni smycky asyncio s {0} ulohami.".format(len(tasks)))
+
+        try:
+            await self.__stop.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.__executor.shutdown(wait=True)
+            peg_msg.validmsg("Smycka asyncio ukoncena.")
+
+    async def __control(self):
+        """
+        Hlavní programová smyčka: úlohy plánovače se vykonávají přímo ve smyčce asyncio a mezi termíny se čeká
+        bez blokování ostatních úloh.
+
+        Returns
+        -------
+            None
+        """
+        scheduler = self.__scheduler
+        while True:
+            scheduler.run_pending()
+            deadline = scheduler.next_deadline()
+            if deadline is None:
+                delay = MAX_SLEEP
+            else:
+                delay = min(max(deadline - time.monotonic(), 0.0), MAX_SLEEP)
+            await asyncio.sleep(delay)
+
+    async def __io(self, name: str, function, period: float):
+        """
+        Periodická blokující úloha hw ve fondu vláken s absolutními termíny.
+
+        Parameters
+        ----------
+        name : str
+            název úlohy,
+        function : callable
+            blokující funkce volaná bez parametrů,
+        period : float
+            perioda v sekundách.
+
+        Returns
+        -------
+            None
+        """
+        deadline = time.monotonic()
+        while True:
+            try:
+                await self.run_blocking(function)
+            except Exception as err:
+                peg_msg.errormsg("Chyba ulohy {0}: {1}".format(name, err))
+            deadline = deadline + period
+            now = time.monotonic()
+            if deadline < now:
+                # zmeskane terminy se nedohani
+                deadline = now
+            await asyncio.sleep(deadline - now)
+
+    async def __serve(self, name: str, factory):
+        """
+        Běh serveru s novým spuštěním po neočekávaném ukončení.
+
+        Parameters
+        ----------
+        name : str
+            název serveru,
+        factory : callable
+            funkce vracející korutinu serveru.
+
+        Returns
+        -------
+            None
+        """
+        while True:
+            try:
+                await factory()
+                peg_msg.errormsg("Server {0} neocekavane ukoncil cinnost".format(name))
+            except asyncio.CancelledError:
+                peg_msg.validmsg("Server {0} rizene ukoncen".format(name))
+                raise
+            except Exception as err:
+                peg_msg.errormsg("Server {0} ukoncen chybou: {1}".format(name, err))
+            await asyncio.sleep(SERVER_RESTART_DELAY)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Test modulu
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    peg_msg.infomsg("Test behoveho prostredi asyncio")
+    peg_msg.infomsg("===============================")
+
+    dbg_counts = {'control': 0, 'io': 0, 'server': 0}
+    dbg_scheduler = Scheduler()
+    dbg_scheduler.add('control', lambda: dbg_counts.update(control=dbg_counts['control'] + 1), period=0.01)
+
+    async def dbg_server():
+        dbg_counts['server'] = dbg_counts['server'] + 1
+        await asyncio.sleep(3600)
+
+    dbg_runtime = AsyncRuntime(dbg_scheduler,
+                               io_tasks=[('io', lambda: (time.sleep(0.02),
+                                                         dbg_counts.update(io=dbg_counts['io'] + 1)), 0.1)],
+                               servers=[('server', dbg_server)])
+    dbg_scheduler.add('stop', lambda: dbg_counts['control'] >= 100 and dbg_runtime.kill(), period=0.05)
+    dbg_start = time.monotonic()
+    dbg_runtime.run()
+    dbg_elapsed = time.monotonic() - dbg_start
+
+    if 0.9 < dbg_elapsed < 1.3 and 8 <= dbg_counts['io'] <= 12 and dbg_counts['server'] == 1:
+        peg_msg.validmsg("Ulohy za {0:.2f} s: {1}".format(dbg_elapsed, dbg_counts))
+    else:
+        peg_msg.errormsg("Ulohy za {0:.2f} s: {1}".format(dbg_elapsed, dbg_counts))
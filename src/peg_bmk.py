@@ -0,0 +1,351 @@
+""" BENCHMARK Srovnávací měření výkonu programu
+
+    Modul měří dobu jednoho volání hlavních operací programu: čtení a zápis registrů datového prostoru jednotlivě
+    i hromadně, tvorbu souborů webového serveru (json, index.html, readdata.js), jeden průchod výkonné funkce
+    Execution.execute nad simulovanými periferiemi a výpis hlášení peg_msg. Každé měření si samo určí počet volání
+    tak, aby trvalo alespoň BENCHMARK_MIN_TIME, opakuje se BENCHMARK_REPEAT krát a výsledkem je nejkratší doba,
+    která je nejméně ovlivněná ostatní zátěží počítače.
+
+    Výsledky se ukládají do souboru json. Režim porovnání označí měření, která jsou proti uloženému základu pomalejší
+    o více než zadaný práh.
+
+    Použití:
+        python peg_bmk.py [-o <výsledky.json>] [-c <základ.json>] [-t <práh>] [-f <filtr>]
+
+        -o, --output ... soubor pro uložení výsledků,
+        -c, --compare ... soubor základu, se kterým se výsledky porovnají,
+        -t, --threshold ... poměrný práh zpomalení, v základu 0.1, tj. 10 %,
+        -f, --filter ... měří se jen případy, jejichž název obsahuje zadaný text.
+"""
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Import knihoven
+# ----------------------------------------------------------------------------------------------------------------------
+# mereni doby volani
+import timeit
+
+# presmerovani vypisu hlaseni
+import contextlib
+import os
+
+# ulozeni vysledku
+import json
+import platform
+import datetime
+
+# parametry prikazove radky
+import getopt
+import sys
+
+# datovy prostor modbusu
+try:
+    import peg_das
+except (ImportError, ModuleNotFoundError):
+    from src import peg_das
+
+# popis registru programu
+try:
+    from peg_global_scope import PRODUCT_IDENTIFICATION, COILS, DIGITAL_INPUTS, HOLDING_REGISTERS, INPUT_REGISTERS
+except (ImportError, ModuleNotFoundError):
+    from src.peg_global_scope import PRODUCT_IDENTIFICATION, COILS, DIGITAL_INPUTS, HOLDING_REGISTERS, INPUT_REGISTERS
+
+# hlaseni na konzoli
+try:
+    import peg_msg
+except ImportError:
+    from src import peg_msg
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Konstanty modulu
+# ----------------------------------------------------------------------------------------------------------------------
+# verze formatu souboru vysledku
+BENCHMARK_VERSION = 1
+
+# nejkratsi doba jednoho opakovani mereni v sekundach
+BENCHMARK_MIN_TIME = 0.2
+
+# pocet opakovani mereni, vysledkem je nejkratsi doba
+BENCHMARK_REPEAT = 5
+
+# zakladni pomerny prah zpomaleni proti zakladu
+REGRESSION_THRESHOLD = 0.1
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Případy měření
+# ----------------------------------------------------------------------------------------------------------------------
+def datastore_cases() -> dict:
+    """
+    Případy měření datového prostoru. Měří se nad samostatným datovým prostorem s registry programu, aby měření
+    neměnilo globální datový prostor.
+
+    Returns
+    -------
+    cases : dict
+        {název: funkce bez parametrů}.
+    """
+    FC_CO, FC_HR, FC_IR = peg_das.FC_CO, peg_das.FC_HR, peg_das.FC_IR
+    datastore = peg_das.DataStore(identification=PRODUCT_IDENTIFICATION,
+                                  coils=COILS,
+                                  digital_inputs=DIGITAL_INPUTS,
+                                  holding_registers=HOLDING_REGISTERS,
+                                  input_registers=INPUT_REGISTERS)
+    name = next(iter(INPUT_REGISTERS))
+    handle = datastore.get_handle(FC_IR, name)
+    names = [(FC_IR, key) for key in INPUT_REGISTERS]
+    many = dict.fromkeys(names, 0x1234)
+    group = datastore.get_group(names)
+    group_values = [0x1234] * len(names)
+
+    cases = {
+        'datastore.handle_get': handle.get,
+        'datastore.handle_set': lambda: handle.set(0x1234),
+        'datastore.name_get': lambda: datastore.get_ir_state(name),
+        'datastore.name_set': lambda: datastore.set_ir_state(name, 0x1234),
+        'datastore.set_many': lambda: datastore.set_many(many),
+        'datastore.get_many': lambda: datastore.get_many(names),
+        'datastore.group_write': lambda: group.write(group_values),
+        'datastore.group_read': group.read,
+    }
+
+    def read(filename: str):
+        return lambda: datastore.get_file_data(filename)
+
+    def read_cold(filename: str, fc: int, key: str):
+        toggle = datastore.get_handle(fc, key)
+        bit = fc == FC_CO or fc == peg_das.FC_DI
+
+        def case():
+            toggle.set(not toggle.get() if bit else (toggle.get() + 1) & 0xFFFF)
+            return datastore.get_file_data(filename)
+
+        return case
+
+    # soubory se pri nezmenenem obsahu vraci z cache, studene cteni predchazi zmena prvniho registru prostoru
+    registers = {FC_CO: COILS, peg_das.FC_DI: DIGITAL_INPUTS, FC_HR: HOLDING_REGISTERS, FC_IR: INPUT_REGISTERS}
+    files = dict(peg_das.JSON_FILES)
+    files[peg_das.JSON_SNAPSHOT_FILE] = (FC_IR, None)
+    for filename, (fc, _) in files.items():
+        cases['file.' + filename] = read(filename)
+        cases['file.' + filename + '.cold'] = read_cold(filename, fc, next(iter(registers[fc])))
+    for filename in ('index.html', 'readdata.js'):
+        cases['file.' + filename] = read(filename)
+    return cases
+
+
+def execution_cases() -> dict:
+    """
+    Případy měření výkonné funkce nad simulovanými periferiemi bez vláken.
+
+    Returns
+    -------
+    cases : dict
+        {název: funkce bez parametrů}.
+    """
+    try:
+        from peg_hal import SimulatedBackend
+        from peg_dio import Dio
+        from peg_aio import Aio
+        from peg_exe import Execution
+    except (ImportError, ModuleNotFoundError):
+        from src.peg_hal import SimulatedBackend
+        from src.peg_dio import Dio
+        from src.peg_aio import Aio
+        from src.peg_exe import Execution
+
+    hal = SimulatedBackend()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        execution = Execution(threaded=False, dio=Dio(hal=hal), aio=Aio(hal=hal))
+    return {
+        'execution.execute': execution.execute,
+        'execution.digital': execution.execute_digital,
+        'execution.analog': execution.execute_analog,
+    }
+
+
+def message_cases() -> dict:
+    """
+    Případy měření výpisu hlášení. Výstup se při měření přesměruje do os.devnull.
+
+    Returns
+    -------
+    cases : dict
+        {název: funkce bez parametrů}.
+    """
+    return {
+        'msg.infomsg': lambda: peg_msg.infomsg("Mereni vypisu hlaseni\ndruhy radek"),
+        'msg.validmsg': lambda: peg_msg.validmsg("Mereni vypisu hlaseni"),
+        'msg.warningmsg': lambda: peg_msg.warningmsg("Mereni vypisu hlaseni", 12),
+    }
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Měření a porovnání
+# ----------------------------------------------------------------------------------------------------------------------
+def measure(function, min_time: float = BENCHMARK_MIN_TIME, repeat: int = BENCHMARK_REPEAT) -> dict:
+    """
+    Měření doby jednoho volání funkce.
+
+    Parameters
+    ----------
+    function : callable
+        měřená funkce bez parametrů,
+    min_time : float
+        nejkratší doba jednoho opakování v sekundách,
+    repeat : int
+        počet opakování.
+
+    Returns
+    -------
+    result : dict
+        {'ns': nejkratší doba volání, 'median': medián doby volání, 'number': počet volání v opakování,
+        'repeat': počet opakování}, doby v ns.
+    """
+    timer = timeit.Timer(function)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number = number * 2
+    times = sorted(duration / number * 1e9 for duration in timer.repeat(repeat=repeat, number=number))
+    return {'ns': times[0], 'median': times[len(times) // 2], 'number': number, 'repeat': repeat}
+
+
+def run(pattern: str = '', min_time: float = BENCHMARK_MIN_TIME, repeat: int = BENCHMARK_REPEAT) -> dict:
+    """
+    Spuštění všech případů měření.
+
+    Parameters
+    ----------
+    pattern : str
+        měří se jen případy, jejichž název obsahuje tento text,
+    min_time : float
+        nejkratší doba jednoho opakování v sekundách,
+    repeat : int
+        počet opakování.
+
+    Returns
+    -------
+    report : dict
+        {'version', 'timestamp', 'python', 'machine', 'results': {název: výsledek measure}}.
+    """
+    cases = {}
+    for factory in (datastore_cases, execution_cases, message_cases):
+        cases.update(factory())
+
+    results = {}
+    with open(os.devnull, 'w') as devnull:
+        for name, function in cases.items():
+            if pattern not in name:
+                continue
+            if name.startswith('msg.'):
+                with contextlib.redirect_stdout(devnull):
+                    results[name] = measure(function, min_time, repeat)
+            else:
+                results[name] = measure(function, min_time, repeat)
+            peg_msg.infomsg("{0: <32} {1:12.1f} ns/volani".format(name, results[name]['ns']))
+
+    return {
+        'version': BENCHMARK_VERSION,
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+
+def compare(baseline: dict, report: dict, threshold: float = REGRESSION_THRESHOLD) -> list:
+    """
+    Porovnání výsledků se základem.
+
+    Parameters
+    ----------
+    baseline : dict
+        výsledky základu ve formátu funkce run,
+    report : dict
+        porovnávané výsledky ve formátu funkce run,
+    threshold : float
+        poměrný práh zpomalení, např. 0.1 pro 10 %.
+
+    Returns
+    -------
+    regressions : list
+        zpomalená měření [(název, doba základu v ns, doba v ns, poměr)].
+    """
+    regressions = []
+    for name, result in report['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            peg_msg.infomsg("{0: <32} {1:12.1f} ns/volani, bez zakladu".format(name, result['ns']))
+            continue
+        ratio = result['ns'] / base['ns'] if base['ns'] > 0 else 1.0
+        text = "{0: <32} {1:12.1f} -> {2:12.1f} ns/volani {3:+7.1%}".format(name, base['ns'], result['ns'], ratio - 1)
+        if ratio > 1 + threshold:
+            peg_msg.errormsg(text)
+            regressions.append((name, base['ns'], result['ns'], ratio))
+        elif ratio < 1 - threshold:
+            peg_msg.validmsg(text)
+        else:
+            peg_msg.infomsg(text)
+    return regressions
+
+
+def main(argv: list) -> int:
+    """
+    Spuštění měření z příkazové řádky, viz popis modulu.
+
+    Parameters
+    ----------
+    argv : list
+        parametry příkazové řádky.
+
+    Returns
+    -------
+    errcode : int
+        0 bez zpomalení, 1 při zpomalení proti základu, 2 při chybě parametrů.
+    """
+    try:
+        opts, _ = getopt.getopt(argv, "o:c:t:f:", ["output=", "compare=", "threshold=", "filter="])
+    except getopt.GetoptError:
+        peg_msg.errormsg("Nepodarilo precist parametry prikazove radky.")
+        return 2
+
+    output = None
+    baseline = None
+    threshold = REGRESSION_THRESHOLD
+    pattern = ''
+    for opt, arg in opts:
+        if opt in ("-o", "--output"):
+            output = arg
+        elif opt in ("-c", "--compare"):
+            with open(arg, 'r', encoding='utf-8') as file:
+                baseline = json.load(file)
+        elif opt in ("-t", "--threshold"):
+            threshold = float(arg)
+        elif opt in ("-f", "--filter"):
+            pattern = arg
+
+    report = run(pattern)
+    if output:
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        peg_msg.validmsg("Vysledky ulozeny do souboru {0}".format(output))
+
+    if baseline is None:
+        return 0
+    peg_msg.infomsg("Porovnani se zakladem {0}, prah {1:.0%}".format(baseline.get('timestamp'), threshold))
+    regressions = compare(baseline, report, threshold)
+    if regressions:
+        peg_msg.errormsg("Zpomaleni proti zakladu: {0}".format(", ".join(item[0] for item in regressions)))
+        return 1
+    peg_msg.validmsg("Bez zpomaleni proti zakladu")
+    return 0
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Spuštění měření
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    peg_msg.infomsg("Srovnavaci mereni vykonu")
+    peg_msg.infomsg("========================")
+
+    sys.exit(main(sys.argv[1:]))
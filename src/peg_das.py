@@ -10,12 +10,44 @@
 # datovy prostor slave
 from pymodbus.datastore import ModbusSlaveContext
 
-# bloky registru, sequential = bez mezer
-from pymodbus.datastore import ModbusSequentialDataBlock
+# zaklad bloku registru
+from pymodbus.datastore.store import BaseModbusDataBlock
+
+# kompaktni ulozeni registru
+from array import array
+
+# prevod vicewordovych hodnot
+import struct
 
 # export json
 import json
 
+# trvale ulozeni registru v souboru mapovanem do pameti
+import os
+import mmap
+import zlib
+
+# mereni doby volani pro benchmark
+import timeit
+
+# casova znacka pro identifikaci verze dat
+import time
+
+# zamek zapisu do bloku dat
+import threading
+
+# zamek bloku dat sdileny s procesem serveru
+import multiprocessing
+
+# obnova stavu zapisu v procesu vzniklem forkem
+import weakref
+
+# zkraceni intervalu prepinani vlaken pri zatezovem testu
+import sys
+
+# docasny adresar pro test trvaleho ulozeni
+import tempfile
+
 # hlaseni na konzoli
 try:
     import peg_msg
@@ -25,6 +57,70 @@ except ImportError:
 # ----------------------------------------------------------------------------------------------------------------------
 # Konstanty modulu
 # ----------------------------------------------------------------------------------------------------------------------
+# kody funkci modbus jednotlivych pametovych prostoru
+FC_CO = 0x01
+FC_DI = 0x02
+FC_HR = 0x03
+FC_IR = 0x04
+
+# soubory json s obsahem pametovych prostoru a pripony nazvu registru
+JSON_FILES = {
+    'co.json': (FC_CO, '_co'),
+    'di.json': (FC_DI, '_di'),
+    'hr.json': (FC_HR, '_hr'),
+    'ir.json': (FC_IR, '_ir'),
+}
+
+# soubor json se soucasnym obsahem vsech pametovych prostoru
+JSON_SNAPSHOT_FILE = 'all.json'
+
+# pocet pokusu o ziskani konzistentniho snimku vsech bloku
+SNAPSHOT_RETRIES = 5
+
+# datove typy registru: (kod struct pro kodovani, kod struct pro dekodovani, pocet 16 bit slov)
+# celociselne hodnoty se pred kodovanim orezavaji na sirku typu, proto se koduji vzdy bez znamenka
+REGISTER_TYPES = {
+    'uint16': ('H', 'H', 1),
+    'int16': ('H', 'h', 1),
+    'uint32': ('I', 'I', 2),
+    'int32': ('I', 'i', 2),
+    'float32': ('f', 'f', 2),
+}
+
+# poradi slov vicewordovych hodnot, 'little' = nizsi slovo na nizsi adrese
+WORD_ORDERS = {
+    'little': '<',
+    'big': '>',
+}
+
+# nejvetsi mezera mezi definovanymi adresami, ktera se jeste uklada uvnitr jednoho segmentu
+SEGMENT_GAP = 4
+
+# velikost stranky adresáře segmentů jako mocnina 2 (2**6 = 64 adres)
+SEGMENT_PAGE_BITS = 6
+
+# nejvetsi pocet predpripravenych planu cteni a zapisu v jednom bloku
+SEGMENT_PLAN_CACHE = 256
+
+# hlavicka souboru trvale ulozeneho bloku: znacka, kontrolni soucet rozlozeni segmentu, pocet registru, rezerva
+PERSIST_MAGIC = b'PEGD'
+PERSIST_HEADER = struct.Struct('<4sIII')
+
+# soubory trvale ulozenych bloku, civky a digitalni vstupy se z bezpecnostnich duvodu neukladaji
+PERSIST_FILES = {
+    'hr.bin': FC_HR,
+    'ir.bin': FC_IR,
+}
+
+# stav bloku (sekvencni cislo, verze obsahu) jako dvojice uint32, ve sdilene pameti zarovnano na 8 bytu
+STATE_SEQUENCE = 0
+STATE_VERSION = 1
+STATE_SIZE = 8
+STATE_MASK = 0xFFFFFFFF
+
+# rozbaleni bytu na 8 bytu s hodnotou 0/1 (LSB prvni, stejne poradi jako v pdu modbus)
+BIT_TABLE = [bytes((byte >> bit) & 0x01 for bit in range(8)) for byte in range(256)]
+
 DEFAULT_IDENTIFICATION = {
     "VendorName": "PEG spol. s r.o.",
     "ProductCode": "PYxxx",
@@ -122,6 +218,70 @@ TEMPLATE_READDATA_JS = """{{% extends 'base_diagnostics.js' %}}
 # ----------------------------------------------------------------------------------------------------------------------
 # Datové třídy modulu
 # ----------------------------------------------------------------------------------------------------------------------
+class RegisterCodec:
+    """
+    Předkompilovaný převod hodnoty daného typu na 16 bit slova registrů a zpět.
+    """
+    __slots__ = ('type', 'word_order', 'width', '__encoder', '__decoder', '__words', '__mask')
+
+    def __init__(self, register_type: str = 'uint16', word_order: str = 'little'):
+        """
+        Založení převodu pro datový typ a pořadí slov.
+
+        Parameters
+        ----------
+        register_type : str
+            datový typ hodnoty, jeden z klíčů REGISTER_TYPES,
+        word_order : str
+            pořadí slov, 'little' (nižší slovo na nižší adrese) nebo 'big'.
+        """
+        if register_type not in REGISTER_TYPES or word_order not in WORD_ORDERS:
+            raise ValueError('Neznamy typ registru {0} nebo poradi slov {1}.'.format(register_type, word_order))
+        encode_code, decode_code, width = REGISTER_TYPES[register_type]
+        order = WORD_ORDERS[word_order]
+        self.type = register_type
+        self.word_order = word_order
+        self.width = width
+        self.__encoder = struct.Struct(order + encode_code)
+        self.__decoder = struct.Struct(order + decode_code)
+        self.__words = struct.Struct(order + 'H' * width)
+        self.__mask = None if decode_code == 'f' else (1 << (16 * width)) - 1
+
+    def encode(self, value) -> tuple:
+        """
+        Převod hodnoty na slova registrů. Celočíselné hodnoty se ořezávají na šířku typu.
+
+        Parameters
+        ----------
+        value : int or float
+            převáděná hodnota.
+
+        Returns
+        -------
+        words : tuple
+            slova registrů v pořadí podle adresy.
+        """
+        if self.__mask is None:
+            return self.__words.unpack(self.__encoder.pack(value))
+        return self.__words.unpack(self.__encoder.pack(int(value) & self.__mask))
+
+    def decode(self, words) -> int or float:
+        """
+        Převod slov registrů na hodnotu.
+
+        Parameters
+        ----------
+        words : sequence
+            slova registrů v pořadí podle adresy.
+
+        Returns
+        -------
+        value : int or float
+            hodnota registru.
+        """
+        return self.__decoder.unpack(self.__words.pack(*words))[0]
+
+
 class DataStoreInfo:
     """
     Třída pro správu informací o paměťovém prostoru
@@ -134,6 +294,8 @@ class DataStoreInfo:
             '<název registru>': {
                 'address': <logická adresa registru>,
                 'description': <popis registru>,
+                'type': <nepovinný datový typ, viz REGISTER_TYPES, v základu 'uint16'>,
+                'word_order': <nepovinné pořadí slov 'little' nebo 'big', v základu 'little'>,
             },
         }
 
@@ -148,13 +310,20 @@ class DataStoreInfo:
         # detailni informace pomoci slovniku
         self.__descr = descr
 
+        # predkompilovane prevody hodnot podle typu
+        self.__codecs = {}
+        for key in self.__descr:
+            self.__codecs[key] = RegisterCodec(register_type=self.__descr[key].get('type', 'uint16'),
+                                               word_order=self.__descr[key].get('word_order', 'little'))
+
         # zjistovani pocatecni adresy = minimalni adresa
-        # zjisteni celkove delky pameti pro cteni = maximalni adresa - minimalni adresa
+        # zjisteni celkove delky pameti pro cteni = maximalni adresa posledniho slova - minimalni adresa
         for key in self.__descr:
             if self.__descr[key]['address'] < self.__start_address:
                 self.__start_address = self.__descr[key]['address']
-            if self.__descr[key]['address'] > self.__count:
-                self.__count = self.__descr[key]['address']
+            last_address = self.__descr[key]['address'] + self.__codecs[key].width - 1
+            if last_address > self.__count:
+                self.__count = last_address
 
         self.__count = self.__count - self.__start_address + 1
 
@@ -162,6 +331,18 @@ class DataStoreInfo:
         if self.__start_address < 0 or self.__count < 0:
             raise ValueError('Inicializacni data obsahuji zapornou adresu nebo neplatny pocet.')
 
+        # seskupeni definovanych adres do souvislych segmentu, mezery do SEGMENT_GAP se ukladaji v segmentu
+        self.__segments = []
+        ranges = sorted((self.__descr[key]['address'], self.__descr[key]['address'] + self.__codecs[key].width)
+                        for key in self.__descr)
+        for start, stop in ranges:
+            if self.__segments and start - self.__segments[-1][1] <= SEGMENT_GAP:
+                if stop > self.__segments[-1][1]:
+                    self.__segments[-1][1] = stop
+            else:
+                self.__segments.append([start, stop])
+        self.__segments = [(start, stop - start) for start, stop in self.__segments]
+
     def getstartaddress(self) -> int:
         """
         Funkce vrati pocatecni logickou adresu pametoveho uloziste.
@@ -184,6 +365,17 @@ class DataStoreInfo:
         """
         return self.__count
 
+    def getsegments(self) -> list:
+        """
+        Funkce vrati souvisle useky definovanych adres pametoveho uloziste.
+
+        Returns
+        -------
+        segments : list
+            seznam dvojic (pocatecni logicka adresa, pocet registru) serazeny podle adresy.
+        """
+        return self.__segments
+
     def getlist(self):
         """
         Funkce vrati seznam jmen registru.
@@ -214,6 +406,22 @@ class DataStoreInfo:
         else:
             return -1
 
+    def getcodec(self, name: str):
+        """
+        Ziskani predkompilovaneho prevodu hodnoty registru na slova.
+
+        Parameters
+        ----------
+        name : str
+            nazev registru,
+
+        Returns
+        -------
+        codec : RegisterCodec
+            prevod hodnoty nebo None, pokud registr neexistuje.
+        """
+        return self.__codecs.get(name)
+
     def getdescription(self, name: str):
         """
         Ziskani popisu dat.
@@ -234,6 +442,813 @@ class DataStoreInfo:
             return "NA"
 
 
+class DataBlock(BaseModbusDataBlock):
+    """
+    Kompaktní blok dat s počítadlem verze obsahu a sekvenčním zámkem.
+
+    Blok pokrývá adresy od počáteční adresy po poslední definovanou adresu, ale ukládá pouze souvislé segmenty
+    definovaných adres. Segmenty jsou v úložišti za sebou podle adresy, paměť tak roste s počtem registrů, ne
+    s rozsahem adres. Segment adresy se najde přes adresář stránek adres v konstantním čase. Čtení mezery mezi
+    segmenty vrací nuly, zápis do mezery se ignoruje.
+
+    Registry jsou uloženy v poli array('H'), bity jsou zabaleny po osmi do bytearray (bit 0 na nejnižším bitu
+    prvního bytu, stejně jako v pdu modbus). Čtení vrací kompaktní kopii úseku, ne seznam objektů int.
+
+    Verze se zvyšuje při každém zápisu, který skutečně změní hodnotu, a to bez ohledu na to, zda zapisuje aplikace
+    nebo klient modbus serveru. Podle verze lze poznat, že se obsah bloku od posledního čtení nezměnil.
+
+    Zápisy jsou vzájemně vyloučeny zámkem bloku, čtení zámek nepoužívá. Zapisující vlákno před zápisem nastaví
+    sekvenční číslo na liché a po zápisu na sudé. Čtení se opakuje, dokud nezíská kopii při sudém a nezměněném
+    sekvenčním čísle. Více zápisů uzavřených mezi begin_write() a end_write() tak čtenář vidí jako jeden
+    nedělitelný zápis (např. obě slova 32 bit hodnoty).
+    """
+
+    def __init__(self, address: int, count: int, bits: bool = False, segments: list = None):
+        """
+        Založení bloku dat s nulovými hodnotami.
+
+        Parameters
+        ----------
+        address : int
+            počáteční logická adresa bloku,
+        count : int
+            počet adres bloku včetně mezer,
+        bits : bool
+            True pro blok bitů (cívky, digitální vstupy), False pro blok 16 bit registrů,
+        segments : list
+            seznam dvojic (počáteční logická adresa, počet) ukládaných úseků seřazený podle adresy, v základu
+            jeden úsek přes celý blok.
+        """
+        self.address = address
+        self.count = count
+        self.bits = bits
+
+        # segmenty (pocatecni adresa, koncova adresa, poloha v ulozisti)
+        if segments is None:
+            segments = [(address, count)]
+        self.segments = []
+        self.size = 0
+        for start, length in segments:
+            self.segments.append((start, start + length, self.size))
+            self.size = self.size + length
+        # adresar stranek adres se segmenty, ktere do stranky zasahuji
+        self.__pages = {}
+        for segment in self.segments:
+            for page in range(segment[0] >> SEGMENT_PAGE_BITS, ((segment[1] - 1) >> SEGMENT_PAGE_BITS) + 1):
+                self.__pages[page] = self.__pages.get(page, ()) + (segment,)
+        self.__plans = {}
+
+        if bits:
+            self.default_value = False
+            self.values = bytearray((self.size + 7) // 8)
+        else:
+            self.default_value = 0
+            self.values = array('H', bytes(2 * self.size))
+        # sekvencni cislo a verze obsahu, pri sdileni s jinym procesem lezi ve sdilene pameti
+        self.__state = array('I', [0, 0])
+        self.__lock = threading.RLock()
+        self.__depth = 0
+        self.__owner = None
+        self.__changes = []
+        # funkce volana po zmene obsahu: on_change(poloha v ulozisti, puvodni hodnoty, nove hodnoty)
+        self.on_change = None
+        # uloziste mapovane ze souboru
+        self.mapped = False
+        self.__mapping = None
+        self.__synced = 0
+        # stav, zamek a pripadne i uloziste ve sdilene pameti
+        self.shared = False
+
+    @property
+    def version(self) -> int:
+        """
+        Verze obsahu bloku, zvyšuje se při každé změně obsahu (modulo 2^32).
+        """
+        return self.__state[STATE_VERSION]
+
+    @property
+    def sequence(self) -> int:
+        """
+        Sekvenční číslo zámku, liché během zápisu (modulo 2^32).
+        """
+        return self.__state[STATE_SEQUENCE]
+
+    def __changed(self):
+        """
+        Zvyseni verze obsahu po zmene.
+        """
+        self.__state[STATE_VERSION] = (self.__state[STATE_VERSION] + 1) & STATE_MASK
+
+    def __str__(self):
+        """
+        Textovy popis bloku.
+
+        Returns
+        -------
+        text : str
+            popis bloku.
+        """
+        return "DataBlock({0}, {1}, bits={2}, segments={3})".format(self.address, self.count, self.bits,
+                                                                    len(self.segments))
+
+    def __iter__(self):
+        """
+        Iterace pres dvojice (logicka adresa, hodnota).
+
+        Returns
+        -------
+        iterator : iterator
+            iterator dvojic adresa, hodnota.
+        """
+        return enumerate(self.getValues(self.address, self.count), self.address)
+
+    def reset(self):
+        """
+        Vynulovani obsahu bloku.
+
+        Returns
+        -------
+            None
+        """
+        self.setValues(self.address, [0] * self.count)
+
+    def validate(self, address, count=1):
+        """
+        Kontrola, zda pozadovany usek lezi v bloku. Usek muze zasahovat do mezer mezi segmenty.
+
+        Parameters
+        ----------
+        address : int
+            pocatecni logicka adresa,
+        count : int
+            pocet hodnot.
+
+        Returns
+        -------
+        valid : bool
+            True pokud usek lezi v bloku.
+        """
+        return self.address <= address and address + count <= self.address + self.count
+
+    def locate(self, address: int) -> int:
+        """
+        Nalezeni polohy adresy v ulozisti bloku.
+
+        Parameters
+        ----------
+        address : int
+            logicka adresa.
+
+        Returns
+        -------
+        index : int
+            poloha hodnoty v ulozisti nebo -1, pokud adresa lezi v mezere nebo mimo blok.
+        """
+        for start, stop, offset in self.__pages.get(address >> SEGMENT_PAGE_BITS, ()):
+            if start <= address < stop:
+                return offset + address - start
+        return -1
+
+    def map(self, path: str) -> bool:
+        """
+        Přesun úložiště registrů do souboru mapovaného do paměti. Pokud soubor obsahuje blok se stejným rozložením
+        segmentů, hodnoty se z něj bez dalšího zpracování obnoví. Jinak se soubor založí znovu s aktuálním obsahem
+        bloku.
+
+        Zápis do bloku pak mění pouze mapovanou paměť, na disk se obsah ukládá funkcí sync(). Jádro může změněné
+        stránky zapsat i dříve, interval volání sync() tedy určuje nejvyšší možnou ztrátu dat.
+
+        Parameters
+        ----------
+        path : str
+            cesta k souboru bloku.
+
+        Returns
+        -------
+        restored : bool
+            True pokud byly hodnoty obnoveny ze souboru.
+        """
+        if self.bits:
+            raise ValueError('Blok bitu nelze ukladat do souboru.')
+        if self.shared:
+            raise ValueError('Sdileny blok nelze dodatecne ukladat do souboru.')
+        if self.mapped:
+            return True
+
+        layout = zlib.crc32(repr((self.address, self.count, self.segments)).encode())
+        length = PERSIST_HEADER.size + 2 * self.size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != length:
+                os.ftruncate(fd, length)
+            mapping = mmap.mmap(fd, length)
+        finally:
+            os.close(fd)
+
+        magic, file_layout, size, _ = PERSIST_HEADER.unpack_from(mapping, 0)
+        restored = magic == PERSIST_MAGIC and file_layout == layout and size == self.size
+        values = memoryview(mapping)[PERSIST_HEADER.size:].cast('H')
+
+        self.begin_write()
+        try:
+            old_values = self.values
+            if not restored:
+                values[:] = old_values
+                PERSIST_HEADER.pack_into(mapping, 0, PERSIST_MAGIC, layout, self.size, 0)
+            self.values = values
+            self.mapped = True
+            self.__mapping = mapping
+            new_values = array('H', values.tobytes())
+            if old_values != new_values:
+                self.__changed()
+                self.__changes.append((0, old_values, new_values))
+        finally:
+            self.end_write()
+
+        self.sync(force=True)
+        return restored
+
+    def sync(self, force: bool = False) -> bool:
+        """
+        Uložení změněného obsahu mapovaného úložiště na disk (msync). Bez změny obsahu od posledního uložení se
+        nic nezapisuje.
+
+        Parameters
+        ----------
+        force : bool
+            uložení i bez změny obsahu.
+
+        Returns
+        -------
+        synced : bool
+            True pokud byl obsah uložen.
+        """
+        version = self.__state[STATE_VERSION]
+        if self.__mapping is None or (self.__synced == version and not force):
+            return False
+        self.__mapping.flush()
+        self.__synced = version
+        return True
+
+    def share(self, state: memoryview, values: memoryview = None, lock=None):
+        """
+        Přesun stavu bloku (sekvenční číslo, verze) a úložiště do sdílené paměti, aby blok mohl číst i zapisovat
+        proces vzniklý následným forkem. Úložiště mapované ze souboru je sdílené již samo (MAP_SHARED), přesouvá se
+        proto jen úložiště v paměti procesu. Funkci je nutné volat před založením dalšího procesu a dalších vláken
+        pracujících s blokem.
+
+        Odběratelé změn (on_change) jsou voláni jen v procesu, který zápis provedl. Proces vzniklý forkem může
+        zdědit rozpracovaný zápis jiného vlákna rodiče (hloubku vnoření, vlastníka, seznam změn), stav zápisu se proto
+        po forku v potomkovi vždy nuluje.
+
+        Parameters
+        ----------
+        state : memoryview
+            sdílená paměť STATE_SIZE bytů pro stav bloku,
+        values : memoryview
+            sdílená paměť pro úložiště, len(values) bytů registrů nebo bitů, u mapovaného bloku None,
+        lock :
+            zámek zápisu sdílený mezi procesy, např. multiprocessing.RLock().
+
+        Returns
+        -------
+            None
+        """
+        if self.shared:
+            return
+
+        old_lock = self.__lock
+        old_lock.acquire()
+        try:
+            shared_state = state.cast('I')
+            shared_state[STATE_SEQUENCE] = self.__state[STATE_SEQUENCE]
+            shared_state[STATE_VERSION] = self.__state[STATE_VERSION]
+            if not self.mapped:
+                if not self.bits:
+                    values = values.cast('H')
+                values[:] = self.values
+                self.values = values
+                self.mapped = True
+            self.__state = shared_state
+            if lock is not None:
+                self.__lock = lock
+            self.shared = True
+        finally:
+            old_lock.release()
+
+        reference = weakref.WeakMethod(self._after_fork)
+        os.register_at_fork(after_in_child=lambda: reference() is not None and reference()())
+
+    def _after_fork(self):
+        """
+        Vynulování stavu zápisu v procesu vzniklém forkem. Vlákno rodiče, které v okamžiku forku zapisovalo, v potomkovi
+        neexistuje a zápis nikdy neukončí. Sdílený zámek a sekvenční číslo zápis ukončí v rodiči.
+
+        Returns
+        -------
+            None
+        """
+        self.__depth = 0
+        self.__owner = None
+        self.__changes = []
+
+    def share_size(self) -> int:
+        """
+        Velikost sdílené paměti úložiště bloku pro funkci share().
+
+        Returns
+        -------
+        size : int
+            počet bytů, u bloku mapovaného ze souboru 0.
+        """
+        if self.mapped:
+            return 0
+        return memoryview(self.values).nbytes
+
+    def __plan(self, address: int, count: int):
+        """
+        Rozdeleni useku adres na casti ulozene v segmentech. Plany se uchovavaji pro opakovane dotazy.
+
+        Parameters
+        ----------
+        address : int
+            pocatecni logicka adresa,
+        count : int
+            pocet hodnot.
+
+        Returns
+        -------
+        plan : tuple
+            (prvni poloha v ulozisti, koncova poloha v ulozisti, casti), kde casti jsou trojice
+            (poloha ve vysledku, poloha v ulozisti, pocet). Prazdny usek ma prvni polohu rovnu koncove.
+        """
+        key = (address, count)
+        plan = self.__plans.get(key)
+        if plan is not None:
+            return plan
+
+        pieces = []
+        stop = address + count
+        for start, end, offset in self.segments:
+            if end <= address or start >= stop:
+                continue
+            first = max(start, address)
+            pieces.append((first - address, offset + first - start, min(end, stop) - first))
+        if pieces:
+            plan = (pieces[0][1], pieces[-1][1] + pieces[-1][2], tuple(pieces))
+        else:
+            plan = (0, 0, ())
+
+        if len(self.__plans) >= SEGMENT_PLAN_CACHE:
+            self.__plans.clear()
+        self.__plans[key] = plan
+        return plan
+
+    def get(self, index: int) -> int:
+        """
+        Cteni jedne hodnoty bez kopie useku. Jedna hodnota nemuze byt roztrzena, sekvencni zamek neni potreba.
+
+        Parameters
+        ----------
+        index : int
+            poloha hodnoty v ulozisti bloku, viz locate().
+
+        Returns
+        -------
+        value : int
+            hodnota registru nebo bitu (0, 1).
+        """
+        if self.bits:
+            return (self.values[index >> 3] >> (index & 0x07)) & 0x01
+        return self.values[index]
+
+    def begin_write(self):
+        """
+        Začátek nedělitelného zápisu. Volání lze vnořovat, sekvenční číslo se mění jen na nejvyšší úrovni.
+
+        Returns
+        -------
+            None
+        """
+        self.__lock.acquire()
+        self.__depth = self.__depth + 1
+        if self.__depth == 1:
+            self.__owner = threading.get_ident()
+            self.__state[STATE_SEQUENCE] = (self.__state[STATE_SEQUENCE] + 1) & STATE_MASK
+
+    def end_write(self):
+        """
+        Konec nedělitelného zápisu. Po ukončení nejvyšší úrovně se odberatelům rozešlou všechny změny zápisu.
+
+        Returns
+        -------
+            None
+        """
+        changes = None
+        if self.__depth == 1:
+            self.__state[STATE_SEQUENCE] = (self.__state[STATE_SEQUENCE] + 1) & STATE_MASK
+            self.__owner = None
+            changes = self.__changes
+            self.__changes = []
+        self.__depth = self.__depth - 1
+        self.__lock.release()
+
+        if changes and self.on_change is not None:
+            for start, old_values, values in changes:
+                self.on_change(start, old_values, values)
+
+    def getValues(self, address, count=1):
+        """
+        Konzistentní čtení hodnot bloku bez zámku. Adresy v mezerách mezi segmenty vrací nulu.
+
+        Parameters
+        ----------
+        address : int
+            počáteční logická adresa čtení,
+        count : int
+            počet čtených hodnot.
+
+        Returns
+        -------
+        values : array or bytes
+            kopie hodnot, která odpovídá stavu mezi dvěma zápisy. Registry jako array('H'), bity jako bytes
+            s hodnotami 0/1.
+        """
+        plan = self.__plans.get((address, count)) or self.__plan(address, count)
+        first, last, pieces = plan
+        values = self.__copy(first, last)
+        # usek lezi cely v jednom segmentu
+        if len(pieces) == 1 and pieces[0][2] == count:
+            return values
+
+        if self.bits:
+            result = bytearray(count)
+        else:
+            result = array('H', bytes(2 * count))
+        for start, index, length in pieces:
+            result[start:start + length] = values[index - first:index - first + length]
+        return bytes(result) if self.bits else result
+
+    def read(self) -> array or bytes:
+        """
+        Konzistentní čtení celého úložiště bloku bez zámku, tj. hodnot všech segmentů za sebou.
+
+        Returns
+        -------
+        values : array or bytes
+            kopie hodnot úložiště. Registry jako array('H'), bity jako bytes s hodnotami 0/1.
+        """
+        return self.__copy(0, self.size)
+
+    def __copy(self, first: int, last: int):
+        """
+        Kopie useku uloziste pod sekvencnim zamkem.
+
+        Parameters
+        ----------
+        first : int
+            prvni poloha v ulozisti,
+        last : int
+            koncova poloha v ulozisti (necte se).
+
+        Returns
+        -------
+        values : array or bytes
+            kopie hodnot, bity rozbalene na bytes s hodnotami 0/1.
+        """
+        if self.bits:
+            # kopie dotcenych bytu, rozbaleni na bity az mimo sekvencni zamek
+            low = first >> 3
+            high = (last + 7) >> 3
+        else:
+            low = first
+            high = last
+        state = self.__state
+        while True:
+            sequence = state[STATE_SEQUENCE]
+            if not sequence & 1:
+                raw = self.values[low:high]
+                if self.mapped:
+                    # rez mapovane pameti neni kopie
+                    raw = raw.tobytes()
+                if state[STATE_SEQUENCE] == sequence:
+                    break
+            elif self.__owner == threading.get_ident():
+                # cteni uvnitr vlastniho zapisu
+                raw = self.values[low:high]
+                if self.mapped:
+                    raw = raw.tobytes()
+                break
+            else:
+                # uvolneni GIL pro zapisujici vlakno
+                time.sleep(0)
+
+        if not self.bits:
+            return array('H', raw) if self.mapped else raw
+        offset = first & 0x07
+        return b''.join(map(BIT_TABLE.__getitem__, raw))[offset:offset + last - first]
+
+    def setValues(self, address, values):
+        """
+        Zápis hodnot do bloku. Hodnoty pro adresy v mezerách mezi segmenty se ignorují. Verze bloku se zvýší pouze
+        při změně obsahu. Při změně obsahu se po ukončení zápisu zavolá funkce on_change, pokud je nastavena.
+        Volání probíhá ve vlákně, které zápis provedlo.
+
+        Parameters
+        ----------
+        address : int
+            počáteční logická adresa zápisu,
+        values : list
+            zapisované hodnoty, u bitů se zapíše 1 pro pravdivou hodnotu.
+
+        Returns
+        -------
+            None
+        """
+        if not isinstance(values, (list, tuple, array)):
+            values = [values]
+        if self.bits:
+            values = [0x01 if value else 0x00 for value in values]
+        else:
+            values = array('H', values)
+        pieces = (self.__plans.get((address, len(values))) or self.__plan(address, len(values)))[2]
+
+        self.begin_write()
+        try:
+            for start, index, length in pieces:
+                new_values = values[start:start + length]
+                if self.bits:
+                    old_values = [self.get(position) for position in range(index, index + length)]
+                    if old_values == new_values:
+                        continue
+                    for position, value in zip(range(index, index + length), new_values):
+                        if value:
+                            self.values[position >> 3] |= 1 << (position & 0x07)
+                        else:
+                            self.values[position >> 3] &= ~(1 << (position & 0x07))
+                else:
+                    old_values = self.values[index:index + length]
+                    if self.mapped:
+                        old_values = array('H', old_values.tobytes())
+                    if old_values == new_values:
+                        continue
+                    self.values[index:index + length] = new_values
+                self.__changed()
+                if self.on_change is not None:
+                    self.__changes.append((index, old_values, new_values))
+        finally:
+            self.end_write()
+
+    def write(self, index: int, value: int):
+        """
+        Rychlý zápis jednoho slova nebo bitu na polohu úložiště bez plánu zápisu a převodu hodnot. Nezměněná hodnota
+        se nezapisuje a blok se nezamyká. Změna se odběratelům předá stejně jako u setValues().
+
+        Parameters
+        ----------
+        index : int
+            poloha v úložišti (DataBlock.locate),
+        value : int
+            slovo registru 0-65535 nebo hodnota bitu 0/1.
+
+        Returns
+        -------
+            None
+        """
+        values = self.values
+        if self.bits:
+            byte = index >> 3
+            mask = 1 << (index & 0x07)
+            if (values[byte] & mask > 0) == (value > 0):
+                return
+        elif values[index] == value:
+            return
+
+        self.begin_write()
+        try:
+            if self.bits:
+                old_value = 0x01 if values[byte] & mask else 0x00
+                if value:
+                    values[byte] |= mask
+                else:
+                    values[byte] &= ~mask
+            else:
+                old_value = values[index]
+                values[index] = value
+            if old_value != value:
+                self.__changed()
+                if self.on_change is not None:
+                    self.__changes.append((index, [old_value], [value]))
+        finally:
+            self.end_write()
+
+
+class RegisterHandle:
+    """
+    Předpřipravený přístup k jednomu registru nebo bitu datového prostoru.
+
+    Objekt se získá jednou podle jména registru a dále už čtení a zápis neprovádí vyhledávání jména ani přepočet
+    adresy. Odkazuje přímo na blok dat, ve kterém registr leží. Hodnoty vícewordových typů (uint32, int32, float32)
+    se čtou i zapisují celé jedním přístupem k bloku.
+    """
+    __slots__ = ('name', 'fc', 'address', 'width', 'codec', '__block', '__values', '__index', '__bit', '__byte',
+                 '__mask')
+
+    def __init__(self, name: str, fc: int, address: int, block: DataBlock, codec: RegisterCodec = None):
+        """
+        Založení odkazu na registr.
+
+        Parameters
+        ----------
+        name : str
+            název registru,
+        fc : int
+            kód funkce modbus pametoveho prostoru (FC_CO, FC_DI, FC_HR, FC_IR),
+        address : int
+            fyzická adresa registru (logická adresa - 1),
+        block : DataBlock
+            blok dat, ve kterém registr leží,
+        codec : RegisterCodec
+            převod hodnoty na slova registru, None pro bity a registry uint16.
+        """
+        self.name = name
+        self.fc = fc
+        self.address = address
+        # registry uint16 se neprevadi
+        if codec is not None and codec.type == 'uint16':
+            codec = None
+        self.codec = codec
+        self.width = 1 if codec is None else codec.width
+        self.__block = block
+        self.__values = block.values
+        # blok je adresovan logickou adresou, registr lezi vzdy cely v jednom segmentu
+        self.__index = block.locate(address + 1)
+        self.__bit = block.bits
+        # poloha bitu v zabalenem bloku
+        self.__byte = self.__index >> 3
+        self.__mask = 1 << (self.__index & 0x07)
+
+    def rebind(self):
+        """
+        Obnovení odkazu na úložiště bloku po jeho přesunu do souboru nebo sdílené paměti (DataBlock.map,
+        DataBlock.share).
+
+        Returns
+        -------
+            None
+        """
+        self.__values = self.__block.values
+
+    def get(self):
+        """
+        Čtení hodnoty registru.
+
+        Returns
+        -------
+        value : bool or int or float
+            stav bitu jako bool nebo hodnota registru podle jeho typu (v základu uint16 0-65535).
+        """
+        if self.__bit:
+            return (self.__values[self.__byte] & self.__mask) > 0
+        if self.codec is None:
+            return self.__values[self.__index]
+        if self.width == 1:
+            return self.codec.decode((self.__values[self.__index],))
+        # vicewordova hodnota se cte konzistentne pres sekvencni zamek bloku
+        return self.codec.decode(self.__block.getValues(self.address + 1, self.width))
+
+    def set(self, value):
+        """
+        Zápis hodnoty registru. U celočíselných typů se zapíše vždy tolik nejnižších bitů hodnoty, kolik odpovídá
+        šířce typu (u uint16 LSB 16 bitů).
+
+        Parameters
+        ----------
+        value : bool or int or float
+            nastavovaný stav bitu nebo hodnota registru.
+
+        Returns
+        -------
+            None
+        """
+        if self.__bit:
+            self.__block.write(self.__index, 0x01 if value else 0x00)
+        elif self.codec is None:
+            self.__block.write(self.__index, value & 0xFFFF)
+        elif self.width == 1:
+            self.__block.write(self.__index, self.codec.encode(value)[0])
+        else:
+            self.__block.setValues(self.address + 1, self.codec.encode(value))
+
+
+class RegisterGroup:
+    """
+    Předkompilovaná skupina registrů a bitů pro opakované hromadné čtení a zápis v pevném pořadí.
+
+    Při založení se registry seskupí podle paměťového prostoru a připraví se úseky adres pro čtení a souvislé úseky
+    pro zápis. Funkce read() a write() pak pracují jen se seznamy hodnot ve stejném pořadí jako jména skupiny,
+    bez vyhledávání jmen, řazení a seskupování při každém volání.
+    """
+
+    def __init__(self, names: list, handles: list, blocks: dict):
+        """
+        Založení skupiny.
+
+        Parameters
+        ----------
+        names : list
+            seznam dvojic (kód funkce, jméno registru),
+        handles : list
+            odkazy na registry ve stejném pořadí, None pro neexistující registr,
+        blocks : dict
+            bloky dat podle kódu funkce.
+        """
+        self.names = list(names)
+        self.__defaults = [0 if name[0] == FC_HR or name[0] == FC_IR else False for name in self.names]
+
+        groups = {}
+        for position, handle in enumerate(handles):
+            if handle is not None:
+                groups.setdefault(handle.fc, []).append((handle.address, position, handle))
+
+        # plan cteni: (blok, pocatecni logicka adresa, pocet, bity, [(poradi, posun, prevod, sirka)])
+        self.__read_plan = []
+        # plan zapisu: (blok, bity, [(pocatecni logicka adresa, [(poradi, prevod)])])
+        self.__write_plan = []
+        for fc, group in groups.items():
+            group.sort(key=lambda item: item[0])
+            bits = fc == FC_CO or fc == FC_DI
+            start = group[0][0]
+            count = max(address + handle.width for address, position, handle in group) - start
+            items = [(position, address - start, handle.codec, handle.width) for address, position, handle in group]
+            self.__read_plan.append((blocks[fc], start + 1, count, bits, items))
+
+            runs = []
+            stop = None
+            for address, position, handle in group:
+                # opakovany registr se zapise pouze jednou
+                if stop is not None and address < stop:
+                    continue
+                if address == stop:
+                    runs[-1][1].append((position, handle.codec))
+                else:
+                    runs.append((address + 1, [(position, handle.codec)]))
+                stop = address + handle.width
+            self.__write_plan.append((blocks[fc], bits, runs))
+
+    def read(self) -> list:
+        """
+        Čtení hodnot skupiny, z každého paměťového prostoru jedním voláním getValues.
+
+        Returns
+        -------
+        values : list
+            hodnoty v pořadí jmen skupiny, bity jako bool, registry podle typu. Pro neexistující jméno False nebo 0.
+        """
+        result = list(self.__defaults)
+        for block, start, count, bits, items in self.__read_plan:
+            vals = block.getValues(start, count)
+            if bits:
+                for position, offset, codec, width in items:
+                    result[position] = vals[offset] > 0
+            else:
+                for position, offset, codec, width in items:
+                    if codec is None:
+                        result[position] = vals[offset]
+                    else:
+                        result[position] = codec.decode(vals[offset:offset + width])
+        return result
+
+    def write(self, values: list):
+        """
+        Zápis hodnot skupiny. Zápis do každého paměťového prostoru je pro čtenáře nedělitelný.
+
+        Parameters
+        ----------
+        values : list
+            hodnoty v pořadí jmen skupiny, hodnoty neexistujících jmen se ignorují.
+
+        Returns
+        -------
+            None
+        """
+        for block, bits, runs in self.__write_plan:
+            block.begin_write()
+            try:
+                for address, items in runs:
+                    words = []
+                    for position, codec in items:
+                        if bits:
+                            words.append(0x01 if values[position] else 0x00)
+                        elif codec is None:
+                            words.append(values[position] & 0xFFFF)
+                        else:
+                            words.extend(codec.encode(values[position]))
+                    block.setValues(address, words)
+            finally:
+                block.end_write()
+
+
 # ----------------------------------------------------------------------------------------------------------------------
 # Hlavní třída modulu
 # ----------------------------------------------------------------------------------------------------------------------
@@ -261,10 +1276,13 @@ class DataStore:
             '<název registru>': {
                 'address': <logická adresa registru>,
                 'description': <popis registru>,
+                'type': <nepovinný datový typ, viz REGISTER_TYPES>,
+                'word_order': <nepovinné pořadí slov 'little' nebo 'big'>,
             },
         }
 
         Počáteční hodnota fyzické adresy je 0, logická adresa je o 1 větší. Slovníky používají logickou adresu.
+        Vícewordové hodnoty zabírají registry od uvedené adresy výše.
         """
 
         # tvorba pameti
@@ -282,13 +1300,64 @@ class DataStore:
         self.__hr = DataStoreInfo(descr=holding_registers)
 
         # tvorba obsahu pametoveho prostoru modbusu
+        blocks = {
+            FC_DI: DataBlock(self.__di.getstartaddress(), self.__di.getlen(), bits=True,
+                             segments=self.__di.getsegments()),
+            FC_CO: DataBlock(self.__co.getstartaddress(), self.__co.getlen(), bits=True,
+                             segments=self.__co.getsegments()),
+            FC_IR: DataBlock(self.__ir.getstartaddress(), self.__ir.getlen(), segments=self.__ir.getsegments()),
+            FC_HR: DataBlock(self.__hr.getstartaddress(), self.__hr.getlen(), segments=self.__hr.getsegments()),
+        }
         self.__slave_context = ModbusSlaveContext(
-            di=ModbusSequentialDataBlock(self.__di.getstartaddress(), [0] * self.__di.getlen()),
-            co=ModbusSequentialDataBlock(self.__co.getstartaddress(), [0] * self.__co.getlen()),
-            ir=ModbusSequentialDataBlock(self.__ir.getstartaddress(), [0] * self.__ir.getlen()),
-            hr=ModbusSequentialDataBlock(self.__hr.getstartaddress(), [0] * self.__hr.getlen()),
+            di=blocks[FC_DI],
+            co=blocks[FC_CO],
+            ir=blocks[FC_IR],
+            hr=blocks[FC_HR],
             zero_mode=False
         )
+        self.__blocks = blocks
+
+        # predkompilovany index odkazu na registry podle jmena
+        self.__handles = {}
+        for fc, info in ((FC_CO, self.__co), (FC_DI, self.__di), (FC_HR, self.__hr), (FC_IR, self.__ir)):
+            self.__handles[fc] = {}
+            for key in info.getlist():
+                self.__handles[fc][key] = RegisterHandle(name=key,
+                                                         fc=fc,
+                                                         address=info.getaddress(key) - 1,
+                                                         block=blocks[fc],
+                                                         codec=info.getcodec(key))
+        self.__handle_index = {}
+        for fc in self.__handles:
+            for key in self.__handles[fc]:
+                self.__handle_index[(fc, key)] = self.__handles[fc][key]
+        # predpripravene klice a pozice hodnot pro export json, cache obsahu souboru podle verze bloku
+        self.__json_keys = {}
+        for fc, suffix in JSON_FILES.values():
+            self.__json_keys[fc] = []
+            for key in self.__handles[fc]:
+                handle = self.__handles[fc][key]
+                self.__json_keys[fc].append((key + suffix, blocks[fc].locate(handle.address + 1), handle))
+        self.__json_cache = {}
+        self.__boot_id = "{0:x}".format(int(time.time() * 1000))
+
+        # odberatele zmen hodnot registru {fc: {poloha v ulozisti bloku: [(id, jmeno, funkce, odkaz na registr)]}}
+        self.__subscribers = {}
+        self.__subscription_count = 0
+        self.__subscription_lock = threading.Lock()
+        # rozesilani zmen je na bloku nastaveno jen pri existujicim odberu, zapis bez odberatelu tak zmeny neshromazduje
+        self.__dispatchers = {}
+        for fc in blocks:
+            self.__subscribers[fc] = {}
+            self.__dispatchers[fc] = self.__get_change_dispatcher(fc)
+
+        # sdilena pamet bloku pro proces serveru
+        self.__shared_memory = None
+
+        self.__co_handles = self.__handles[FC_CO]
+        self.__di_handles = self.__handles[FC_DI]
+        self.__hr_handles = self.__handles[FC_HR]
+        self.__ir_handles = self.__handles[FC_IR]
 
     def get_context(self):
         """
@@ -301,6 +1370,390 @@ class DataStore:
         """
         return self.__slave_context
 
+    def persist(self, path: str) -> bool:
+        """
+        Zapnutí trvalého uložení holding a vstupních registrů v souborech mapovaných do paměti v adresáři path.
+        Hodnoty uložené při minulém běhu se ihned obnoví. Cívky a digitální vstupy se neukládají, po startu jsou
+        vždy vypnuté.
+
+        Parameters
+        ----------
+        path : str
+            adresář souborů úložiště, při neexistenci se založí.
+
+        Returns
+        -------
+        restored : bool
+            True pokud byly obnoveny hodnoty všech ukládaných bloků.
+        """
+        restored = True
+        try:
+            os.makedirs(path, exist_ok=True)
+            for filename, fc in PERSIST_FILES.items():
+                if self.__blocks[fc].map(os.path.join(path, filename)):
+                    peg_msg.validmsg("Obnoveni registru ze souboru {0}".format(filename))
+                else:
+                    peg_msg.warningmsg("Zalozeni noveho souboru registru {0}".format(filename))
+                    restored = False
+        except OSError as err:
+            peg_msg.errormsg("Nepodarilo se zapnout trvale ulozeni registru: {0}".format(err))
+            restored = False
+
+        for handle in self.__handle_index.values():
+            handle.rebind()
+        return restored
+
+    @property
+    def shared(self) -> bool:
+        """
+        Informace, zda jsou bloky dat ve sdílené paměti a servery tak mohou zapisovat z jiného procesu.
+        """
+        return self.__shared_memory is not None
+
+    def share(self) -> bool:
+        """
+        Přesun všech bloků dat do sdílené paměti, aby datový prostor mohl používat i proces serverů vzniklý
+        následným forkem. Funkci je nutné volat po persist() a před založením procesu serverů a vláken, která
+        s datovým prostorem pracují.
+
+        Sdílená paměť je anonymní mapování MAP_SHARED, proces serverů ji dědí forkem. Nemá jméno, takže při pádu
+        programu nezůstane v /dev/shm a není ji nutné uvolňovat.
+
+        Returns
+        -------
+        shared : bool
+            True pokud jsou bloky sdílené.
+        """
+        if self.__shared_memory is not None:
+            return True
+
+        layout = []
+        size = 0
+        for fc in (FC_CO, FC_DI, FC_HR, FC_IR):
+            block = self.__blocks[fc]
+            values_size = block.share_size()
+            layout.append((block, size, size + STATE_SIZE, values_size))
+            # zarovnani dalsiho stavu na 8 bytu
+            size = size + STATE_SIZE + ((values_size + STATE_SIZE - 1) // STATE_SIZE) * STATE_SIZE
+
+        try:
+            memory = mmap.mmap(-1, size, flags=mmap.MAP_SHARED)
+        except (OSError, AttributeError) as err:
+            peg_msg.errormsg("Nepodarilo se zalozit sdilenou pamet datoveho prostoru: {0}".format(err))
+            return False
+
+        buffer = memoryview(memory)
+        for block, state_offset, values_offset, values_size in layout:
+            values = buffer[values_offset:values_offset + values_size] if values_size else None
+            block.share(state=buffer[state_offset:state_offset + STATE_SIZE],
+                        values=values,
+                        lock=multiprocessing.RLock())
+        for handle in self.__handle_index.values():
+            handle.rebind()
+        self.__shared_memory = memory
+        reference = weakref.WeakMethod(self._after_fork)
+        os.register_at_fork(after_in_child=lambda: reference() is not None and reference()())
+        peg_msg.validmsg("Datovy prostor ve sdilene pameti, {0} bytu".format(size))
+        return True
+
+    def _after_fork(self):
+        """
+        Zrušení odběru změn v procesu vzniklém forkem. Odběratelé patří objektům rodiče (vlákna, zámky, ovladače),
+        které v potomkovi nepracují, a zámek odběratelů mohlo v okamžiku forku držet jiné vlákno rodiče. Zápisy
+        v potomkovi proto žádné odběratele nevolají.
+
+        Returns
+        -------
+            None
+        """
+        self.__subscription_lock = threading.Lock()
+        for fc in self.__subscribers:
+            # rozesilaci funkce drzi odkaz na slovnik, vyprazdni se na miste
+            self.__subscribers[fc].clear()
+            self.__blocks[fc].on_change = None
+
+    def sync(self) -> bool:
+        """
+        Uložení změněných trvale ukládaných registrů na disk. Funkci je vhodné volat periodicky z hlavní smyčky
+        programu a při jeho ukončení.
+
+        Returns
+        -------
+        synced : bool
+            True pokud se zapisoval alespoň jeden blok.
+        """
+        synced = False
+        for fc in PERSIST_FILES.values():
+            try:
+                synced = self.__blocks[fc].sync() or synced
+            except (OSError, ValueError) as err:
+                peg_msg.errormsg("Nepodarilo se ulozit registry na disk: {0}".format(err))
+        return synced
+
+    def get_handle(self, fc: int, name: str):
+        """
+        Získání předpřipraveného odkazu na registr. Odkaz je vhodné získat jednou a dále opakovaně používat jeho funkce
+        get() a set(), které již neprovádí vyhledávání podle jména.
+
+        Parameters
+        ----------
+        fc : int
+            kód funkce modbus pametoveho prostoru (FC_CO, FC_DI, FC_HR, FC_IR),
+        name : str
+            jméno registru,
+
+        Returns
+        -------
+        handle : RegisterHandle
+            odkaz na registr nebo None, pokud registr s timto jmenem neexistuje.
+        """
+        if fc in self.__handles:
+            return self.__handles[fc].get(name)
+        else:
+            return None
+
+    def get_group(self, names: list) -> RegisterGroup:
+        """
+        Získání předkompilované skupiny registrů pro opakované hromadné čtení a zápis v pevném pořadí. Skupinu je
+        vhodné získat jednou a dále opakovaně používat její funkce read() a write().
+
+        Parameters
+        ----------
+        names : list
+            seznam dvojic (kód funkce, jméno registru), např. [(FC_DI, 'POWER_SW1'), (FC_IR, 'COUNTER')].
+
+        Returns
+        -------
+        group : RegisterGroup
+            skupina registrů, neexistující jména se při čtení vrací jako False nebo 0 a při zápisu ignorují.
+        """
+        handles = []
+        for key in names:
+            handle = self.__handle_index.get(key)
+            if handle is None:
+                peg_msg.warningmsg("Skupina obsahuje neexistujici registr {0}".format(key))
+            handles.append(handle)
+        return RegisterGroup(names=names, handles=handles, blocks=self.__blocks)
+
+    def subscribe(self, names: list, callback) -> int:
+        """
+        Přihlášení k odběru změn hodnot registrů. Funkce callback se zavolá při každé změně hodnoty některého
+        z registrů, ať už zapisuje aplikace nebo klient modbus serveru. Volání probíhá ve vlákně, které zápis
+        provedlo, proto má být funkce krátká a nesmí blokovat.
+
+        Funkce je volána jako callback(fc, name, value), kde value je bool u bitů a hodnota podle typu registru
+        u registrů. U vícewordových registrů se funkce volá jednou za zápis, i když se změnilo více slov.
+
+        Odběr platí jen v procesu, který se přihlásil. Zápisy klientů serverů v odděleném procesu (share(),
+        ServerProcess) se odběrateli nehlásí a změny je nutné zjistit čtením registrů. Proces vzniklý forkem
+        odběratele rodiče nevolá.
+
+        Parameters
+        ----------
+        names : list
+            seznam dvojic (kód funkce, jméno registru), např. [(FC_CO, 'POWER_SW1'), (FC_HR, 'CP_DUTY1')],
+        callback : callable
+            funkce volaná při změně hodnoty.
+
+        Returns
+        -------
+        subscription : int
+            identifikátor odběru pro funkci unsubscribe.
+        """
+        with self.__subscription_lock:
+            self.__subscription_count = self.__subscription_count + 1
+            subscription = self.__subscription_count
+            for key in names:
+                handle = self.__handle_index.get(key)
+                if handle is None:
+                    peg_msg.warningmsg("Odber zmen neexistujiciho registru {0}".format(key))
+                    continue
+                start = self.__blocks[handle.fc].locate(handle.address + 1)
+                # seznam se pri zmene nahrazuje novym, aby jej bylo mozne bez zamku prochazet z jinych vlaken
+                for index in range(start, start + handle.width):
+                    items = self.__subscribers[handle.fc].get(index, [])
+                    self.__subscribers[handle.fc][index] = items + [(subscription, handle.name, callback, handle)]
+                self.__blocks[handle.fc].on_change = self.__dispatchers[handle.fc]
+        return subscription
+
+    def unsubscribe(self, subscription: int):
+        """
+        Odhlášení odběru změn hodnot registrů.
+
+        Parameters
+        ----------
+        subscription : int
+            identifikátor odběru vrácený funkcí subscribe.
+
+        Returns
+        -------
+            None
+        """
+        with self.__subscription_lock:
+            for fc in self.__subscribers:
+                for index in list(self.__subscribers[fc]):
+                    items = [item for item in self.__subscribers[fc][index] if item[0] != subscription]
+                    if items:
+                        self.__subscribers[fc][index] = items
+                    else:
+                        del self.__subscribers[fc][index]
+                if not self.__subscribers[fc]:
+                    self.__blocks[fc].on_change = None
+
+    def __get_change_dispatcher(self, fc: int):
+        """
+        Vytvoreni funkce, ktera rozesila zmeny obsahu bloku odberatelum.
+
+        Parameters
+        ----------
+        fc : int
+            kod funkce modbus pametoveho prostoru.
+
+        Returns
+        -------
+        dispatcher : callable
+            funkce on_change pro blok dat.
+        """
+        subscribers = self.__subscribers[fc]
+        bit = fc == FC_CO or fc == FC_DI
+
+        def dispatch(start: int, old_values: list, new_values: list):
+            if not subscribers:
+                return
+            notified = None
+            for offset in range(len(new_values)):
+                items = subscribers.get(start + offset)
+                if items is None or old_values[offset] == new_values[offset]:
+                    continue
+                for subscription, name, callback, handle in items:
+                    if bit:
+                        value = new_values[offset] > 0
+                    elif handle.codec is None:
+                        value = new_values[offset]
+                    elif handle.width == 1:
+                        value = handle.codec.decode((new_values[offset],))
+                    else:
+                        # vicewordovy registr se oznami jednou celou hodnotou
+                        if notified is None:
+                            notified = set()
+                        if (subscription, name) in notified:
+                            continue
+                        notified.add((subscription, name))
+                        value = handle.get()
+                    try:
+                        callback(fc, name, value)
+                    except Exception as err:
+                        peg_msg.errormsg("Chyba odberatele zmen registru {0}: {1}".format(name, err))
+
+        return dispatch
+
+    def set_many(self, values: dict):
+        """
+        Hromadné nastavení hodnot registrů a bitů. Registry jsou seskupeny podle kódu funkce, seřazeny podle adresy
+        a každý souvislý úsek adres se zapíše jedním voláním setValues.
+
+        Klíčem slovníku je dvojice (kód funkce, jméno registru), např. (FC_IR, 'COUNTER'). Neexistující registry jsou
+        přeskočeny. Hodnoty registrů se převádí podle jejich typu, u uint16 se zapíše vždy LSB 16 bitů hodnoty.
+
+        Parameters
+        ----------
+        values : dict
+            slovník {(fc, name): hodnota}.
+
+        Returns
+        -------
+            None
+        """
+        index = self.__handle_index
+
+        # jednotlivy zapis nepotrebuje seskupovani
+        if len(values) == 1:
+            for key, value in values.items():
+                handle = index.get(key)
+                if handle is not None:
+                    handle.set(value)
+            return
+
+        groups = {FC_CO: [], FC_DI: [], FC_HR: [], FC_IR: []}
+        for key, value in values.items():
+            handle = index.get(key)
+            if handle is None:
+                continue
+            fc = handle.fc
+            if fc == FC_CO or fc == FC_DI:
+                groups[fc].append((handle.address, 0x01 if value else 0x00))
+            elif handle.codec is None:
+                groups[fc].append((handle.address, value & 0xFFFF))
+            else:
+                for offset, word in enumerate(handle.codec.encode(value)):
+                    groups[fc].append((handle.address + offset, word))
+
+        for fc, group in groups.items():
+            if not group:
+                continue
+            block = self.__blocks[fc]
+            group.sort()
+            # zapis souvislych useku, blok je adresovan logickou adresou, vsechny useky bloku jako jeden zapis
+            block.begin_write()
+            try:
+                start = group[0][0]
+                run = [group[0][1]]
+                for address, value in group[1:]:
+                    if address == start + len(run):
+                        run.append(value)
+                    else:
+                        block.setValues(start + 1, run)
+                        start = address
+                        run = [value]
+                block.setValues(start + 1, run)
+            finally:
+                block.end_write()
+
+    def get_many(self, names: list) -> dict:
+        """
+        Hromadné čtení hodnot registrů a bitů. Z každého paměťového prostoru se čte jedním voláním getValues úsek
+        od nejnižší po nejvyšší požadovanou adresu.
+
+        Parameters
+        ----------
+        names : list
+            seznam dvojic (kód funkce, jméno registru), např. [(FC_HR, 'CP_DUTY1'), (FC_CO, 'POWER_SW1')].
+
+        Returns
+        -------
+        values : dict
+            slovník {(fc, name): hodnota}. Bity jsou vraceny jako bool, registry podle typu (uint16 jako int
+            0-65535). Pro neexistující jméno se vrací False nebo 0.
+        """
+        index = self.__handle_index
+        groups = {}
+        result = {}
+        for key in names:
+            handle = index.get(key)
+            if handle is None:
+                result[key] = 0 if key[0] == FC_HR or key[0] == FC_IR else False
+                continue
+            if handle.fc in groups:
+                groups[handle.fc].append((handle.address, key, handle))
+            else:
+                groups[handle.fc] = [(handle.address, key, handle)]
+
+        for fc, group in groups.items():
+            start = min(item[0] for item in group)
+            count = max(item[0] + item[2].width for item in group) - start
+            vals = self.__blocks[fc].getValues(start + 1, count)
+            if fc == FC_CO or fc == FC_DI:
+                for address, key, handle in group:
+                    result[key] = vals[address - start] > 0
+            else:
+                for address, key, handle in group:
+                    if handle.codec is None:
+                        result[key] = vals[address - start]
+                    else:
+                        result[key] = handle.codec.decode(vals[address - start:address - start + handle.width])
+
+        return result
+
     def get_di_state(self, name: str) -> bool:
         """
         Získání stavu digitálního vstupu dle jeho jména.
@@ -315,9 +1768,8 @@ class DataStore:
         state : bool
             stav digitálního vstupu, při neexistenci jména False.
         """
-        # získání fyzické adresy datového místa
-        address = self.__di.getaddress(name=name) - 1
-        return address >= 0 and self.__slave_context.getValues(0x02, address)[0] > 0
+        handle = self.__di_handles.get(name)
+        return handle is not None and handle.get()
 
     def get_co_state(self, name: str) -> bool:
         """
@@ -333,9 +1785,8 @@ class DataStore:
         state : bool
             stav cívky, při neexistenci jména False.
         """
-        # získání fyzické adresy datového místa
-        address = self.__co.getaddress(name=name) - 1
-        return address >= 0 and self.__slave_context.getValues(0x01, address)[0] > 0
+        handle = self.__co_handles.get(name)
+        return handle is not None and handle.get()
 
     def get_ir_state(self, name: str) -> int:
         """
@@ -348,13 +1799,12 @@ class DataStore:
 
         Returns
         -------
-        state : int
-            vždy hodnota 0-65535, pro neexistující jméno vrací 0.
+        state : int or float
+            hodnota podle typu registru (uint16 0-65535), pro neexistující jméno vrací 0.
         """
-        # získání fyzické adresy datového místa
-        address = self.__ir.getaddress(name=name) - 1
-        if address >= 0:
-            return self.__slave_context.getValues(0x04, address)[0]
+        handle = self.__ir_handles.get(name)
+        if handle is not None:
+            return handle.get()
         else:
             return 0
 
@@ -369,13 +1819,12 @@ class DataStore:
 
         Returns
         -------
-        state : int
-            vždy hodnota 0-65535, pro neexistující jméno vrací 0.
+        state : int or float
+            hodnota podle typu registru (uint16 0-65535), pro neexistující jméno vrací 0.
         """
-        # získání fyzické adresy datového místa
-        address = self.__hr.getaddress(name=name) - 1
-        if address >= 0:
-            return self.__slave_context.getValues(0x03, address)[0]
+        handle = self.__hr_handles.get(name)
+        if handle is not None:
+            return handle.get()
         else:
             return 0
 
@@ -395,13 +1844,9 @@ class DataStore:
         -------
             None
         """
-        # získání fyzické adresy datového místa
-        address = self.__di.getaddress(name=name) - 1
-        if address >= 0:
-            if state:
-                self.__slave_context.setValues(0x02, address, values=[0x01])
-            else:
-                self.__slave_context.setValues(0x02, address, values=[0x00])
+        handle = self.__di_handles.get(name)
+        if handle is not None:
+            handle.set(state)
 
     def set_co_state(self, name: str, state: bool):
         """
@@ -419,61 +1864,55 @@ class DataStore:
         -------
             None
         """
-        # získání fyzické adresy datového místa
-        address = self.__co.getaddress(name=name) - 1
-        if address >= 0:
-            if state:
-                self.__slave_context.setValues(0x01, address, values=[0x01])
-            else:
-                self.__slave_context.setValues(0x01, address, values=[0x00])
+        handle = self.__co_handles.get(name)
+        if handle is not None:
+            handle.set(state)
 
     def set_ir_state(self, name: str, value: int):
         """
         Nastavení hodnoty vstupního registru dle jeho jména.
 
-        Hodnoty musí být z platného rozsahu 0-65535. Při platném jméně se zapíše vždy LSB 16 bitů hodnoty.
+        Hodnota se převádí podle typu registru. U uint16 musí být z rozsahu 0-65535, při platném jméně se zapíše vždy
+        LSB 16 bitů hodnoty.
 
         Parameters
         ----------
         name : str
             Jméno vstupního registru,
 
-        value: int
+        value: int or float
             nastavovaná hodnota.
 
         Returns
         -------
             None
         """
-        # získání fyzické adresy datového místa
-        address = self.__ir.getaddress(name=name) - 1
-        if address >= 0:
-            value = value & 0xFFFF
-            self.__slave_context.setValues(0x04, address, values=[value])
+        handle = self.__ir_handles.get(name)
+        if handle is not None:
+            handle.set(value)
 
     def set_hr_state(self, name: str, value: int):
         """
         Nastavení hodnoty paměťového registru dle jeho jména.
 
-        Hodnoty musí být z platného rozsahu 0-65535. Při platném jméně se zapíše vždy LSB 16 bitů hodnoty.
+        Hodnota se převádí podle typu registru. U uint16 musí být z rozsahu 0-65535, při platném jméně se zapíše vždy
+        LSB 16 bitů hodnoty.
 
         Parameters
         ----------
         name : str
             Jméno paměťového registru,
 
-        value: int
+        value: int or float
             nastavovaná hodnota.
 
         Returns
         -------
             None
         """
-        # získání fyzické adresy datového místa
-        address = self.__hr.getaddress(name=name) - 1
-        if address >= 0:
-            value = value & 0xFFFF
-            self.__slave_context.setValues(0x03, address, values=[value])
+        handle = self.__hr_handles.get(name)
+        if handle is not None:
+            handle.set(value)
 
     def get_product_identification(self):
         """
@@ -500,44 +1939,30 @@ class DataStore:
         filedata : str
             obsah souboru nebo prazdny retezec.
         """
-        valsdict = {}
-
-        if filename == "co.json":
-            memory = self.get_context()
-            vals = memory.getValues(0x01,
-                                    self.__co.getstartaddress() - 1,
-                                    self.__co.getlen())
-
-            for key in self.__co.getlist():
-                valsdict[key + '_co'] = int(vals[self.__co.getaddress(key) - self.__co.getstartaddress()])
-            filedata = json.dumps(valsdict, ensure_ascii=False, indent=2, sort_keys=False)
-        elif filename == "di.json":
-            memory = self.get_context()
-            vals = memory.getValues(0x02,
-                                    self.__di.getstartaddress() - 1,
-                                    self.__di.getlen())
-
-            for key in self.__di.getlist():
-                valsdict[key + '_di'] = int(vals[self.__di.getaddress(key) - self.__di.getstartaddress()])
-            filedata = json.dumps(valsdict, ensure_ascii=False, indent=2, sort_keys=False)
-        elif filename == "hr.json":
-            memory = self.get_context()
-            vals = memory.getValues(0x03,
-                                    self.__hr.getstartaddress() - 1,
-                                    self.__hr.getlen())
-
-            for key in self.__hr.getlist():
-                valsdict[key + '_hr'] = vals[self.__hr.getaddress(key) - self.__hr.getstartaddress()]
-            filedata = json.dumps(valsdict, ensure_ascii=False, indent=2, sort_keys=False)
-        elif filename == "ir.json":
-            memory = self.get_context()
-            vals = memory.getValues(0x04,
-                                    self.__ir.getstartaddress() - 1,
-                                    self.__ir.getlen())
-
-            for key in self.__ir.getlist():
-                valsdict[key + '_ir'] = vals[self.__ir.getaddress(key) - self.__ir.getstartaddress()]
+        if filename in JSON_FILES:
+            fc = JSON_FILES[filename][0]
+            block = self.__blocks[fc]
+            # verze se cte pred obsahem, soubeh se zapisem vede nanejvys ke zbytecne obnove cache
+            version = block.version
+            cached = self.__json_cache.get(filename)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+            vals = block.read()
+            valsdict = {}
+            for key, index, handle in self.__json_keys[fc]:
+                valsdict[key] = self.__json_value(vals, index, handle)
             filedata = json.dumps(valsdict, ensure_ascii=False, indent=2, sort_keys=False)
+            self.__json_cache[filename] = (version, filedata)
+        elif filename == JSON_SNAPSHOT_FILE:
+            versions = tuple(self.__blocks[JSON_FILES[key][0]].version for key in JSON_FILES)
+            cached = self.__json_cache.get(filename)
+            if cached is not None and cached[0] == versions:
+                return cached[1]
+
+            versions, valsdict = self.__snapshot()
+            filedata = json.dumps(valsdict, ensure_ascii=False, separators=(',', ':'), sort_keys=False)
+            self.__json_cache[filename] = (versions, filedata)
         elif filename == "index.html":
             filedata = self.__get_html_index()
         elif filename == "readdata.js":
@@ -547,6 +1972,99 @@ class DataStore:
 
         return filedata
 
+    def snapshot(self) -> dict:
+        """
+        Současné čtení obsahu všech paměťových prostorů. Bloky se zkopírují v jednom průchodu a pokud se během
+        kopírování změní verze některého bloku, čtení se opakuje. Po vyčerpání opakování se bloky čtou pod zámky
+        zápisu. Vrácený snímek tak vždy odpovídá jednomu okamžiku.
+
+        Returns
+        -------
+        snapshot : dict
+            slovník hodnot všech registrů, klíčem je jméno registru s příponou tabulky (např. 'COUNTER_ir').
+        """
+        return self.__snapshot()[1]
+
+    def __snapshot(self):
+        """
+        Funkce vrati snimek obsahu vsech bloku spolu s verzemi bloku, ke kterym snimek nalezi.
+
+        Returns
+        -------
+        versions, snapshot : tuple, dict
+            verze bloku (co, di, hr, ir) a slovnik hodnot vsech registru.
+        """
+        fcs = [JSON_FILES[filename][0] for filename in JSON_FILES]
+        blocks = [self.__blocks[fc] for fc in fcs]
+        for _ in range(SNAPSHOT_RETRIES):
+            versions = tuple(block.version for block in blocks)
+            vals = [block.read() for block in blocks]
+            if versions == tuple(block.version for block in blocks):
+                break
+        else:
+            # trvaly soubeh se zapisem, cteni pod zamky vsech bloku; zapisy drzi vzdy jen jeden blok, pevne poradi
+            # zamykani proto nevede k uvaznuti
+            for block in blocks:
+                block.begin_write()
+            try:
+                versions = tuple(block.version for block in blocks)
+                vals = [block.read() for block in blocks]
+            finally:
+                for block in reversed(blocks):
+                    block.end_write()
+
+        snapshot = {}
+        for fc, blockvals in zip(fcs, vals):
+            for key, index, handle in self.__json_keys[fc]:
+                snapshot[key] = self.__json_value(blockvals, index, handle)
+        return versions, snapshot
+
+    @staticmethod
+    def __json_value(vals, index: int, handle: RegisterHandle):
+        """
+        Prevod hodnoty registru z kopie obsahu bloku pro export json.
+
+        Parameters
+        ----------
+        vals : sequence
+            kopie obsahu uloziste bloku,
+        index : int
+            poloha registru v ulozisti bloku,
+        handle : RegisterHandle
+            odkaz na registr s informaci o jeho typu,
+
+        Returns
+        -------
+        value : int or float
+            cela hodnota registru.
+        """
+        if handle.codec is None:
+            return int(vals[index])
+        return handle.codec.decode(vals[index:index + handle.width])
+
+    def get_file_etag(self, filename: str):
+        """
+        Vraci znacku verze (ETag) obsahu souboru json. Znacka se meni pri kazde zmene obsahu prislusneho bloku dat
+        a pri kazdem spusteni programu.
+
+        Parameters
+        ----------
+        filename : str
+            nazev souboru,
+
+        Returns
+        -------
+        etag : str
+            znacka verze obsahu nebo None, pokud soubor nema verzi.
+        """
+        if filename in JSON_FILES:
+            return "{0}-{1}".format(self.__boot_id, self.__blocks[JSON_FILES[filename][0]].version)
+        elif filename == JSON_SNAPSHOT_FILE:
+            versions = [str(self.__blocks[JSON_FILES[key][0]].version) for key in JSON_FILES]
+            return "{0}-{1}".format(self.__boot_id, "-".join(versions))
+        else:
+            return None
+
     def __get_html_index(self):
         """
         Funkce generuje retezec odpovidajici webove strance index.html.
@@ -673,7 +2191,8 @@ class DataStore:
             inival = self.get_ir_state(name=name)
             self.set_ir_state(name=name, value=(~self.__ir.getaddress(name=name)))
             newval = self.get_ir_state(name=name)
-            if newval == (~self.__ir.getaddress(name=name) & 0xFFFF):
+            codec = self.__ir.getcodec(name=name)
+            if newval == codec.decode(codec.encode(~self.__ir.getaddress(name=name))):
                 peg_msg.validmsg("\t{0} : {1} -> {2}".format(name, inival, newval))
             else:
                 peg_msg.errormsg("\t{0} : {1} -> {2}".format(name, inival, newval))
@@ -684,7 +2203,8 @@ class DataStore:
             inival = self.get_hr_state(name=name)
             self.set_hr_state(name=name, value=(self.__hr.getaddress(name=name)))
             newval = self.get_hr_state(name=name)
-            if newval == (self.__hr.getaddress(name=name) & 0xFFFF):
+            codec = self.__hr.getcodec(name=name)
+            if newval == codec.decode(codec.encode(self.__hr.getaddress(name=name))):
                 peg_msg.validmsg("\t{0} : {1} -> {2}".format(name, inival, newval))
             else:
                 peg_msg.errormsg("\t{0} : {1} -> {2}".format(name, inival, newval))
@@ -707,6 +2227,401 @@ class DataStore:
         peg_msg.warningmsg("Tisk souboru hr.json")
         peg_msg.infomsg(self.get_file_data('hr.json'))
 
+        peg_msg.warningmsg("Tisk souboru all.json")
+        peg_msg.infomsg(self.get_file_data('all.json'))
+
+    def benchmark(self, number: int = 100000) -> dict:
+        """
+        Mereni doby jednoho volani cteni a zapisu registru. Porovnava se puvodni pristup pres vyhledani adresy
+        a ModbusSlaveContext, pristup podle jmena (get_ir_state, set_ir_state) a predpripraveny odkaz RegisterHandle.
+
+        Parameters
+        ----------
+        number : int
+            pocet opakovani kazdeho mereni.
+
+        Returns
+        -------
+        results : dict
+            doba jednoho volani v ns pro kazdy zpusob pristupu.
+        """
+        name = next(iter(self.__ir.getlist()))
+        handle = self.get_handle(FC_IR, name)
+        context = self.__slave_context
+        info = self.__ir
+
+        def context_get():
+            return context.getValues(FC_IR, info.getaddress(name=name) - 1)[0]
+
+        def context_set():
+            context.setValues(FC_IR, info.getaddress(name=name) - 1, values=[0x1234 & 0xFFFF])
+
+        names = [(FC_IR, key) for key in info.getlist()]
+        many = dict.fromkeys(names, 0x1234)
+        group = self.get_group(names)
+        group_values = [0x1234] * len(names)
+
+        def single_set_all():
+            for fc, key in names:
+                self.set_ir_state(key, 0x1234)
+
+        cases = {
+            'context_get': context_get,
+            'context_set': context_set,
+            'name_get': lambda: self.get_ir_state(name),
+            'name_set': lambda: self.set_ir_state(name, 0x1234),
+            'handle_get': handle.get,
+            'handle_set': lambda: handle.set(0x1234),
+            'single_all': single_set_all,
+            'set_many': lambda: self.set_many(many),
+            'get_many': lambda: self.get_many(names),
+            'group_write': lambda: group.write(group_values),
+            'group_read': group.read,
+        }
+
+        results = {}
+        for key in cases:
+            duration = min(timeit.repeat(cases[key], number=number, repeat=3))
+            results[key] = duration / number * 1e9
+            peg_msg.infomsg("{0: <12} {1:8.1f} ns/volani".format(key, results[key]))
+        return results
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Globální funkce modulu
+# ----------------------------------------------------------------------------------------------------------------------
+def test_torn_reads(duration: float = 2.0, readers: int = 3) -> dict:
+    """
+    Zátěžový test sekvenčního zámku bloku dat. Zapisující vlákno zapisuje dvojici slov dvěma samostatnými voláními
+    setValues uvnitř jednoho nedělitelného zápisu, obě slova mají vždy stejnou hodnotu. Čtecí vlákna současně čtou
+    dvojici pomocí getValues (stejně jako modbus server), jedno další vlákno pro srovnání čte přímo ze seznamu hodnot
+    bez zámku. Roztržené čtení je dvojice s rozdílnými slovy.
+
+    Parameters
+    ----------
+    duration : float
+        doba testu v sekundách,
+    readers : int
+        počet čtecích vláken používajících getValues.
+
+    Returns
+    -------
+    results : dict
+        počet zápisů, počet čtení a počet roztržených čtení přes getValues ('torn') a bez zámku ('torn_unprotected').
+    """
+    block = DataBlock(1, 2)
+    results = {'writes': 0, 'reads': 0, 'torn': 0, 'torn_unprotected': 0}
+    stop = threading.Event()
+
+    def writer():
+        value = 0
+        while not stop.is_set():
+            value = (value + 1) & 0xFFFF
+            block.begin_write()
+            try:
+                block.setValues(1, [value])
+                block.setValues(2, [value])
+            finally:
+                block.end_write()
+            results['writes'] += 1
+
+    def reader():
+        reads = 0
+        torn = 0
+        while not stop.is_set():
+            vals = block.getValues(1, 2)
+            if vals[0] != vals[1]:
+                torn = torn + 1
+            reads = reads + 1
+        results['reads'] += reads
+        results['torn'] += torn
+
+    def reader_unprotected():
+        torn_unprotected = 0
+        while not stop.is_set():
+            vals = block.values[0:2]
+            if vals[0] != vals[1]:
+                torn_unprotected = torn_unprotected + 1
+        results['torn_unprotected'] += torn_unprotected
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=writer, daemon=True)]
+        threads += [threading.Thread(target=reader, daemon=True) for _ in range(readers)]
+        threads += [threading.Thread(target=reader_unprotected, daemon=True)]
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    if results['torn'] == 0:
+        peg_msg.validmsg("Zadne roztrzene cteni: {0} zapisu, {1} cteni, bez zamku roztrzeno {2}".format(
+            results['writes'], results['reads'], results['torn_unprotected']))
+    else:
+        peg_msg.errormsg("Roztrzene cteni: {0} z {1}".format(results['torn'], results['reads']))
+    return results
+
+
+def test_register_types():
+    """
+    Test převodu vícewordových registrů. Hodnota zapsaná jménem se musí přečíst stejná jménem, z jednotlivých slov
+    modbus kontextu i z exportu json.
+
+    Returns
+    -------
+    errors : int
+        počet chyb testu.
+    """
+    registers = {
+        'U32_LITTLE': {'address': 1, 'description': 'uint32', 'type': 'uint32'},
+        'U32_BIG': {'address': 3, 'description': 'uint32', 'type': 'uint32', 'word_order': 'big'},
+        'I32': {'address': 5, 'description': 'int32', 'type': 'int32'},
+        'F32': {'address': 7, 'description': 'float32', 'type': 'float32'},
+        'I16': {'address': 9, 'description': 'int16', 'type': 'int16'},
+        'U16': {'address': 10, 'description': 'uint16'},
+    }
+    values = {'U32_LITTLE': 0x12345678, 'U32_BIG': 0x12345678, 'I32': -2, 'F32': 1.5, 'I16': -3, 'U16': 7}
+    words = {'U32_LITTLE': [0x5678, 0x1234], 'U32_BIG': [0x1234, 0x5678], 'I32': [0xFFFE, 0xFFFF],
+             'F32': [0x0000, 0x3FC0], 'I16': [0xFFFD], 'U16': [7]}
+
+    datastore = DataStore(input_registers=registers)
+    notified = []
+    datastore.subscribe([(FC_IR, 'U32_LITTLE')], lambda fc, name, value: notified.append(value))
+    datastore.set_many({(FC_IR, name): values[name] for name in values})
+    context = datastore.get_context()
+    errors = 0
+    readback = datastore.get_many([(FC_IR, name) for name in values])
+    # skupina cte stejne hodnoty a zapis skupiny se cte zpet jmenem
+    group = datastore.get_group([(FC_IR, name) for name in reversed(values)])
+    if group.read() != list(reversed(values.values())):
+        errors = errors + 1
+        peg_msg.errormsg("\tCteni skupiny: {0}".format(group.read()))
+    group.write(group.read())
+    ir_json = json.loads(datastore.get_file_data('ir.json'))
+
+    for name in values:
+        raw = context.getValues(FC_IR, registers[name]['address'] - 1, len(words[name]))
+        if datastore.get_ir_state(name) != values[name] or readback[(FC_IR, name)] != values[name] \
+                or list(raw) != words[name] or ir_json[name + '_ir'] != values[name]:
+            errors = errors + 1
+            peg_msg.errormsg("\t{0} : {1} -> {2} {3}".format(name, values[name], datastore.get_ir_state(name), raw))
+        else:
+            peg_msg.validmsg("\t{0} : {1} {2}".format(name, values[name], list(raw)))
+
+    # zapis obou slov jednim prikazem klienta se oznami jednou celou hodnotou
+    context.setValues(FC_IR, 0, [0x0001, 0x0002])
+    if notified != [0x12345678, 0x00020001]:
+        errors = errors + 1
+        peg_msg.errormsg("\tOdber zmen: {0}".format(notified))
+    return errors
+
+
+def test_sparse_layout(channels: int = 64, spacing: int = 1000):
+    """
+    Test rozdělení řídké mapy registrů do segmentů. Mapa obsahuje kanály s několika registry a velkým odstupem adres.
+    Kontroluje se velikost úložiště, čtení mezer a čtení a zápis přes více segmentů.
+
+    Parameters
+    ----------
+    channels : int
+        počet kanálů,
+    spacing : int
+        odstup adres kanálů.
+
+    Returns
+    -------
+    errors : int
+        počet chyb testu.
+    """
+    registers = {}
+    for channel in range(channels):
+        registers['CH{0}_VALUE'.format(channel)] = {'address': 1 + channel * spacing, 'description': 'hodnota'}
+        registers['CH{0}_CNT'.format(channel)] = {'address': 2 + channel * spacing, 'description': 'pocitadlo',
+                                                  'type': 'uint32'}
+    datastore = DataStore(input_registers=registers, holding_registers=registers)
+    context = datastore.get_context()
+    block = context.store['i']
+
+    errors = 0
+    peg_msg.infomsg("\tRozsah adres {0}, ulozeno {1} registru v {2} segmentech".format(block.count, block.size,
+                                                                                      len(block.segments)))
+    if block.size != 3 * channels or len(block.segments) != channels:
+        errors = errors + 1
+        peg_msg.errormsg("\tNeocekavana velikost uloziste")
+
+    datastore.set_many({(FC_IR, name): 0xFFFF for name in registers})
+    # cteni pres mezeru mezi dvema kanaly, mezera vraci nuly
+    vals = list(context.getValues(FC_IR, spacing - 1, 5))
+    if vals != [0, 0xFFFF, 0xFFFF, 0, 0]:
+        errors = errors + 1
+        peg_msg.errormsg("\tCteni mezery: {0}".format(vals))
+    # zapis pres mezeru meni pouze definovane registry
+    version = block.version
+    context.setValues(FC_IR, spacing - 1, [1, 2, 3, 4, 5])
+    vals = list(context.getValues(FC_IR, spacing - 1, 5))
+    if datastore.get_ir_state('CH1_VALUE') != 2 or datastore.get_ir_state('CH1_CNT') != 0x00040003 \
+            or vals != [0, 2, 3, 4, 0] or block.version != version + 1:
+        errors = errors + 1
+        peg_msg.errormsg("\tZapis pres mezeru: {0}".format(vals))
+    # cteni mimo rozsah bloku
+    if context.validate(FC_IR, channels * spacing, 1):
+        errors = errors + 1
+        peg_msg.errormsg("\tAdresa mimo blok je platna")
+
+    if errors == 0:
+        peg_msg.validmsg("\tSegmenty, mezery a zapis pres mezery v poradku")
+    return errors
+
+
+def test_persistence():
+    """
+    Test trvalého uložení registrů. Hodnoty zapsané do jednoho datového prostoru se musí obnovit v novém datovém
+    prostoru se stejným rozložením registrů, cívky se obnovit nesmí. Při změně rozložení se soubory založí znovu.
+
+    Returns
+    -------
+    errors : int
+        počet chyb testu.
+    """
+    errors = 0
+    with tempfile.TemporaryDirectory() as path:
+        datastore = DataStore()
+        if datastore.persist(path):
+            errors = errors + 1
+            peg_msg.errormsg("\tObnoveni z prazdneho adresare")
+        handle = datastore.get_handle(FC_IR, 'TEST_IR')
+        handle.set(0x1234)
+        datastore.set_hr_state('TEST_HR', 0x4321)
+        datastore.set_co_state('TEST_CO', True)
+        if not datastore.sync() or datastore.sync():
+            errors = errors + 1
+            peg_msg.errormsg("\tUlozeni probehlo bez zmeny nebo neprobehlo po zmene")
+
+        restored = DataStore()
+        if not restored.persist(path) or restored.get_ir_state('TEST_IR') != 0x1234 \
+                or restored.get_hr_state('TEST_HR') != 0x4321 or restored.get_co_state('TEST_CO') \
+                or list(restored.get_context().getValues(FC_IR, 0, 1)) != [0x1234]:
+            errors = errors + 1
+            peg_msg.errormsg("\tObnoveni hodnot: {0}".format(restored.get_file_data('all.json')))
+
+        changed = DataStore(input_registers={'OTHER_IR': {'address': 3, 'description': 'jine rozlozeni'}})
+        if changed.persist(path) or changed.get_ir_state('OTHER_IR') != 0:
+            errors = errors + 1
+            peg_msg.errormsg("\tObnoveni pri zmene rozlozeni registru")
+
+    if errors == 0:
+        peg_msg.validmsg("\tObnoveni registru ze souboru v poradku")
+    return errors
+
+
+def test_shared():
+    """
+    Test sdílení datového prostoru s procesem vzniklým forkem. Zápisy potomka do cívek a holding registrů musí
+    vidět rodič a zápisy rodiče do vstupních registrů potomek, včetně změny verze pro ETag.
+
+    Returns
+    -------
+    errors : int
+        počet chyb testu.
+    """
+    errors = 0
+    datastore = DataStore()
+    datastore.set_ir_state('TEST_IR', 0x0101)
+    if not datastore.share():
+        peg_msg.errormsg("\tZalozeni sdilene pameti")
+        return 1
+
+    reply_read, reply_write = os.pipe()
+    etag = datastore.get_file_etag('ir.json')
+    pid = os.fork()
+    if pid == 0:
+        # potomek: zapis povelu, cekani na zapis rodice
+        datastore.set_co_state('TEST_CO', True)
+        datastore.set_hr_state('TEST_HR', 0x5678)
+        deadline = time.monotonic() + 2.0
+        while datastore.get_ir_state('TEST_IR') != 0x0202 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        os.write(reply_write, b'1' if datastore.get_file_etag('ir.json') != etag else b'0')
+        os._exit(0)
+
+    deadline = time.monotonic() + 2.0
+    while not datastore.get_co_state('TEST_CO') and time.monotonic() < deadline:
+        time.sleep(0.001)
+    if not datastore.get_co_state('TEST_CO') or datastore.get_hr_state('TEST_HR') != 0x5678:
+        errors = errors + 1
+        peg_msg.errormsg("\tZapis potomka neni videt v rodici")
+    datastore.set_ir_state('TEST_IR', 0x0202)
+    if os.read(reply_read, 1) != b'1':
+        errors = errors + 1
+        peg_msg.errormsg("\tZapis rodice neni videt v potomkovi")
+    os.waitpid(pid, 0)
+    os.close(reply_read)
+    os.close(reply_write)
+
+    if errors == 0:
+        peg_msg.validmsg("\tSdileni datoveho prostoru s procesem v poradku")
+    return errors
+
+
+def test_fork_subscribers():
+    """
+    Test odběru změn v procesu vzniklém forkem. Rodič má přihlášený odběr, jehož zámek v okamžiku forku drží jiné
+    vlákno; zápis cívky v potomkovi se musí vrátit a odběratele nesmí zavolat.
+
+    Returns
+    -------
+    errors : int
+        počet chyb testu.
+    """
+    errors = 0
+    datastore = DataStore()
+    if not datastore.share():
+        peg_msg.errormsg("\tZalozeni sdilene pameti")
+        return 1
+
+    fired = []
+    handler_lock = threading.Lock()
+
+    def handler(fc, name, value):
+        with handler_lock:
+            fired.append(name)
+
+    subscription = datastore.subscribe([(FC_CO, 'TEST_CO')], handler)
+    reply_read, reply_write = os.pipe()
+    handler_lock.acquire()
+    pid = os.fork()
+    if pid == 0:
+        # potomek: zapis ve vlakne, zaseknuty odberatel by zapis nevratil
+        writer = threading.Thread(target=datastore.set_co_state, args=('TEST_CO', True), daemon=True)
+        writer.start()
+        writer.join(timeout=1.0)
+        os.write(reply_write, b'1' if not writer.is_alive() and not fired else b'0')
+        os._exit(0)
+
+    handler_lock.release()
+    if os.read(reply_read, 1) != b'1':
+        errors = errors + 1
+        peg_msg.errormsg("\tZapis v potomkovi zavolal odberatele rodice nebo se nevratil")
+    os.waitpid(pid, 0)
+    os.close(reply_read)
+    os.close(reply_write)
+
+    # odber v rodici fork nezrusil
+    datastore.set_co_state('TEST_CO', False)
+    datastore.unsubscribe(subscription)
+    if fired != ['TEST_CO']:
+        errors = errors + 1
+        peg_msg.errormsg("\tOdber zmen v rodici po forku nefunguje: {0}".format(fired))
+
+    if errors == 0:
+        peg_msg.validmsg("\tOdber zmen v procesu vzniklem forkem v poradku")
+    return errors
+
 
 # ----------------------------------------------------------------------------------------------------------------------
 # Test modulu
@@ -717,4 +2632,25 @@ if __name__ == '__main__':
     dbg_datastore = DataStore()
     dbg_datastore.test()
 
+    peg_msg.warningmsg("Test vicewordovych registru")
+    test_register_types()
+
+    peg_msg.warningmsg("Test ridke mapy registru")
+    test_sparse_layout()
+
+    peg_msg.warningmsg("Test trvaleho ulozeni registru")
+    test_persistence()
+
+    peg_msg.warningmsg("Test sdileni datoveho prostoru s procesem")
+    test_shared()
+
+    peg_msg.warningmsg("Test odberu zmen v procesu vzniklem forkem")
+    test_fork_subscribers()
+
+    peg_msg.warningmsg("Mereni doby pristupu k registrum")
+    dbg_datastore.benchmark()
+
+    peg_msg.warningmsg("Zatezovy test konzistence cteni dvojic registru")
+    test_torn_reads()
+
     peg_msg.validmsg("Konec testu pametoveho prostoru pro modbus SERVER")
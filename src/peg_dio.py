@@ -27,18 +27,25 @@
 # Import knihoven
 # ----------------------------------------------------------------------------------------------------------------------
 
-# knihovna pro spi
-from Adafruit_BBIO.SPI import SPI
-
-# knihovna pro GPIO
-import Adafruit_BBIO.GPIO as GPIO
+# pristup k SPI a GPIO pres backend periferii
+try:
+    import peg_hal
+except ImportError:
+    from src import peg_hal
 
 # časování smyčky
 import time
 
+# pocitadla hran v kompaktnim poli a obsluha hrany vazana na pin
+from array import array
+from functools import partial
+
 # vlakno pro trvalou komunikaci spi
 import threading
 
+# prepinani vlaken v zatezovem testu
+import sys
+
 # identifikace verze produktu
 try:
     from peg_global_scope import PCB_REVISION
@@ -54,6 +61,14 @@ except ImportError:
 # ----------------------------------------------------------------------------------------------------------------------
 # Konstanty modulu
 # ----------------------------------------------------------------------------------------------------------------------
+# nejdelsi doba cekani na zmenu vystupu v jednom kroku obsluhy SPI mimo vlakno (rezim asyncio) v sekundach
+SPI_PERIOD = 0.2
+
+# zakladni perioda obnovy vystupu na SPI beze zmeny v sekundach
+SPI_REFRESH_PERIOD = 10.0
+
+# pocet casu poslednich nabeznych hran uchovavanych pro kazdy vstup (mereni vykonu z intervalu pulsu)
+PULSE_HISTORY = 8
 
 
 # ----------------------------------------------------------------------------------------------------------------------
@@ -61,10 +76,20 @@ except ImportError:
 # ----------------------------------------------------------------------------------------------------------------------
 class Dio:
 
-    def __init__(self):
+    def __init__(self, hal: peg_hal.Backend = None, refresh_period: float = SPI_REFRESH_PERIOD):
         """
         Inicializace komunikace spi a nastavení digitálních vstupů
+
+        Parameters
+        ----------
+        hal : peg_hal.Backend
+            backend periferií, v základu společný backend programu podle konfigurace,
+        refresh_period : float
+            perioda obnovy výstupů na SPI beze změny v sekundách.
         """
+        self.__hal = hal if hal is not None else peg_hal.get_backend()
+        self.__refresh_period = refresh_period
+
         # konstanty
         # slovník masek digitálních výstupů přístupných přes SPI
         self.DIGITAL_OUTPUTS_CTRL = {
@@ -119,41 +144,61 @@ class Dio:
             }
             self.digital_inputs_inverted = False
 
-        # otevření sběrnice NUM = 0, CS = 0
-        self.spi = SPI(0,0)
-
-        # nastavení:
+        # otevření sběrnice NUM = 0, CS = 0, nastavení:
         #           - rychlost 5 kHz
         #           - mod CPOL = 1, CPHA = 0, u beaglebonu je to asi invertováno
         #           - počet bitů 16
-        self.spi.msh = 5000
-        self.spi.mode = 2
-        self.spi.bpw = 16
-        time.sleep(1)
+        self.__hal.spi_open(0, 0, speed=5000, mode=2, bits=16)
 
         # počáteční hodnoty
         self.doleds = 0
         self.doctrl = 0
         
         # povolit zadávání vystupu posuvných registrů
-        GPIO.setup(self.__DIGITAL_OUTPUTS_CLR_PIN, GPIO.OUT)
-        GPIO.output(self.__DIGITAL_OUTPUTS_CLR_PIN, GPIO.HIGH)
+        self.__hal.gpio_setup(self.__DIGITAL_OUTPUTS_CLR_PIN, peg_hal.GPIO_OUT)
+        self.__hal.gpio_output(self.__DIGITAL_OUTPUTS_CLR_PIN, True)
 
         # povolení čtení digitalních vstupů (od verze C3.0)
         if PCB_REVISION["controller"] >= 3.0:
-            GPIO.setup(self.__DIGITAL_OUTPUTS_DINEN_PIN, GPIO.OUT)
-            GPIO.output(self.__DIGITAL_OUTPUTS_DINEN_PIN, GPIO.HIGH)
+            self.__hal.gpio_setup(self.__DIGITAL_OUTPUTS_DINEN_PIN, peg_hal.GPIO_OUT)
+            self.__hal.gpio_output(self.__DIGITAL_OUTPUTS_DINEN_PIN, True)
 
         # digitální vstupy a počítadla náběžných hran
         for val in self.DIGITAL_INPUTS.values():
-            GPIO.setup(val, GPIO.IN)
-
-        self.__DIGITAL_INPUT_COUNTERS = {}
-        for key in self.DIGITAL_INPUTS:
-            self.__DIGITAL_INPUT_COUNTERS[key] = 0
-
-        for din in self.DIGITAL_INPUTS.values():
-            GPIO.add_event_detect(din, GPIO.RISING, callback=self.__inc_inx_cnt)
+            self.__hal.gpio_setup(val, peg_hal.GPIO_IN)
+
+        # stavy vstupu udrzuje obsluha hran: kazdy vstup ma pozici (slot) podle poradi DIGITAL_INPUTS, ktera je
+        # indexem pocitadla hran a casu posledni zmeny a cislem bitu masky logickych urovni; verze se zvysuje pri
+        # kazde zmene stavu vstupu nebo pocitadla; zamek chrani zmeny mezi vlaknem obsluhy hran a ostatnimi vlakny
+        self.__INPUT_SLOTS = {key: slot for slot, key in enumerate(self.DIGITAL_INPUTS)}
+        self.__input_lock = threading.Lock()
+        self.__input_counters = array('L', [0] * len(self.DIGITAL_INPUTS))
+        self.__input_changed = array('d', [time.monotonic()] * len(self.DIGITAL_INPUTS))
+        self.__pulse_times = array('d', [0.0] * (len(self.DIGITAL_INPUTS) * PULSE_HISTORY))
+        self.__pulse_index = array('L', [0] * len(self.DIGITAL_INPUTS))
+        self.__input_mask = 0
+        for slot, level in enumerate(self.__hal.gpio_inputs(list(self.DIGITAL_INPUTS.values()))):
+            if level != self.digital_inputs_inverted:
+                self.__input_mask = self.__input_mask | (1 << slot)
+        self.__input_version = 0
+
+        # obsluha hrany je vazana na pozici vstupu, pin se v ni nevyhledava
+        for slot, pin in enumerate(self.DIGITAL_INPUTS.values()):
+            self.__hal.gpio_add_event_detect(pin, partial(self.__on_edge, slot), peg_hal.GPIO_BOTH)
+
+        # naposledy odeslane stavy vystupu a termin obnovy, zamek a podminka probuzeni vlakna SPI
+        self.__txlist = [0, 0]
+        self.__refresh_deadline = 0.0
+        self.__condition = threading.Condition()
+        self.__commit_depth = 0
+        self.__changed_at = None
+
+        # pocitadla odeslanych ramcu a zpozdeni od povelu po odeslani
+        self.frames = 0
+        self.refreshes = 0
+        self.__latency_sum = 0.0
+        self.__latency_count = 0
+        self.__latency_max = 0.0
 
         # nastaveni vlakna
         self.__thread = threading.Thread(target=self.__threadfun, daemon=True)
@@ -171,8 +216,12 @@ class Dio:
         -------
             None
         """
-        self.spi.close()
-        GPIO.cleanup()
+        # backend chybi, pokud jej konstruktor nedokazal vytvorit
+        hal = getattr(self, '_Dio__hal', None)
+        if hal is None:
+            return
+        hal.spi_close()
+        hal.gpio_cleanup()
 
     def __threadfun(self):
         """
@@ -183,42 +232,201 @@ class Dio:
             None
         """
 
-        txlist = [0, 0]
-        divider = 0
+        self.__txlist = [0, 0]
+        self.__refresh_deadline = 0.0
         try:
             while not self.__thread_kill_requested:
-                # nastavení výstupu
-                if txlist[0] != self.doctrl or txlist[1] != self.doleds:
-                    txlist[0] = self.doctrl
-                    txlist[1] = self.doleds
-                    # self.spi.xfer2(txlist) nefunguje spravne v dlouhem casovem horizontu. Obcas dochazi k odeslani
-                    # pouze 1 byte.
-                    self.spi.writebytes(txlist)
-                    txlist[0] = self.doctrl
-                    txlist[1] = self.doleds
-                    divider = 0
-                else:
-                    divider = divider + 1
-                # uspávání vlákna
-                time.sleep(0.2)
+                self.service(timeout=None)
         finally:
             if self.__thread_kill_requested:
                 peg_msg.validmsg("Vlakno digitalnich IO rizene ukonceno - signal kill")
             else:
                 peg_msg.errormsg("Vlakno digitalnich IO neocekavane ukoncilo cinnost")
 
-    def __inc_inx_cnt(self, pin):
+    def __is_pending(self) -> bool:
+        """
+        Podmínka probuzení obsluhy SPI, volá se pod zámkem: požadavek ukončení nebo změna výstupů mimo otevřené okno
+        commit.
+        """
+        return self.__thread_kill_requested or (self.__changed_at is not None and self.__commit_depth == 0)
+
+    def service(self, timeout: float = SPI_PERIOD) -> bool:
+        """
+        Čekání na změnu výstupů nebo termín obnovy a přenos stavů na SPI. Vlákno digitálních IO volá funkci bez
+        omezení doby čekání, v režimu asyncio ji místo vlákna volá běhové prostředí s omezenou dobou čekání.
+
+        Parameters
+        ----------
+        timeout : float
+            nejdelší doba čekání v sekundách, None = do změny výstupů nebo do termínu obnovy.
+
+        Returns
+        -------
+        sent : bool
+            True, pokud byly stavy výstupů odeslány.
         """
-        Inkrementace počítadla náběžných hran pro vstupy 0 - 3
+        with self.__condition:
+            remaining = max(self.__refresh_deadline - time.monotonic(), 0.0)
+            if timeout is not None:
+                remaining = min(remaining, timeout)
+            self.__condition.wait_for(self.__is_pending, remaining)
+        return self.transfer()
+
+    def transfer(self) -> bool:
+        """
+        Jeden krok přenosu stavů výstupů na SPI. Výstupy se odešlou při změně mimo otevřené okno commit nebo pro obnovu
+        po uplynutí periody obnovy, s obnovou se znovu přečtou i stavy vstupů. Všechny změny od posledního přenosu se
+        odešlou jedním rámcem.
+
+        Returns
+        -------
+        sent : bool
+            True, pokud byly stavy výstupů odeslány.
+        """
+        with self.__condition:
+            now = time.monotonic()
+            changed = self.__changed_at is not None and self.__commit_depth == 0
+            if not changed and now < self.__refresh_deadline:
+                return False
+            txlist = [self.doctrl, self.doleds]
+            changed_at = self.__changed_at if changed else None
+            if changed:
+                self.__changed_at = None
+            self.__refresh_deadline = now + self.__refresh_period
+
+        self.__hal.spi_write(txlist)
+        self.__txlist = txlist
+        self.frames = self.frames + 1
+        if changed_at is None:
+            # s obnovou vystupu se obnovi i stavy vstupu pro pripad ztracene hrany
+            self.refreshes = self.refreshes + 1
+            self.sync_inputs()
+        else:
+            latency = time.perf_counter() - changed_at
+            self.__latency_sum = self.__latency_sum + latency
+            self.__latency_count = self.__latency_count + 1
+            if latency > self.__latency_max:
+                self.__latency_max = latency
+        return True
+
+    def begin_commit(self):
+        """
+        Otevření okna commit: změny výstupů se neodešlou, dokud se okno funkcí commit() nezavře, a pak se odešlou
+        jedním rámcem. Okna lze vnořovat.
 
         Returns
         -------
             None
         """
-        for key in self.DIGITAL_INPUTS:
-            if pin == self.DIGITAL_INPUTS[key]:
-                self.__DIGITAL_INPUT_COUNTERS[key] = (self.__DIGITAL_INPUT_COUNTERS[key] + 1) & 0xFFFFFFFF
-                break
+        with self.__condition:
+            self.__commit_depth = self.__commit_depth + 1
+
+    def commit(self):
+        """
+        Zavření okna commit a okamžité probuzení obsluhy SPI, pokud se výstupy v okně změnily.
+
+        Returns
+        -------
+            None
+        """
+        with self.__condition:
+            self.__commit_depth = max(self.__commit_depth - 1, 0)
+            if self.__commit_depth == 0 and self.__changed_at is not None:
+                self.__condition.notify()
+
+    def get_stats(self) -> dict:
+        """
+        Získání počítadel přenosu na SPI.
+
+        Returns
+        -------
+        stats : dict
+            {'frames', 'refreshes', 'latency_mean', 'latency_max'}, počet rámců, z toho obnov beze změny a zpoždění
+            od změny výstupu po odeslání rámce v µs.
+        """
+        count = self.__latency_count
+        return {
+            'frames': self.frames,
+            'refreshes': self.refreshes,
+            'latency_mean': self.__latency_sum / count * 1e6 if count else 0.0,
+            'latency_max': self.__latency_max * 1e6,
+        }
+
+    def __on_edge(self, slot: int, pin: str, level: bool, timestamp: float = None):
+        """
+        Obsluha hrany vstupu. Každá událost je hrana, takže pokud backend vrátí úroveň shodnou s uloženou (úroveň
+        čtená až po hraně, např. krátký impulz přečtený po návratu do klidu), směr hrany se odvodí z uložené úrovně a
+        náběžná hrana se započítá i se zastaralou úrovní.
+
+        Parameters
+        ----------
+        slot : int
+            pozice vstupu, váže se při přihlášení obsluhy,
+        pin : str
+            název pinu,
+        level : bool
+            fyzická úroveň vstupu po hraně (u některých backendů čtená se zpožděním),
+        timestamp : float
+            čas hrany time.monotonic() podle backendu, None = čas zpracování hrany.
+
+        Returns
+        -------
+            None
+        """
+        with self.__input_lock:
+            self.__set_level(slot, True, level, timestamp)
+
+    def __set_level(self, slot: int, edge: bool, level: bool, timestamp: float = None):
+        """
+        Zápis úrovně vstupu do masky vstupů, času změny, inkrementace počítadla náběžných hran a zápis času náběžné
+        hrany do kruhového bufferu vstupu. Volá se pod zámkem vstupů.
+
+        Parameters
+        ----------
+        slot : int
+            pozice vstupu,
+        edge : bool
+            True = událost hrany (směr se při shodě úrovní odvodí z uložené úrovně), False = jen porovnání úrovně,
+        level : bool
+            fyzická úroveň vstupu,
+        timestamp : float
+            čas změny time.monotonic(), None = aktuální čas.
+
+        Returns
+        -------
+            None
+        """
+        bit = 1 << slot
+        stored = bool(self.__input_mask & bit) != self.digital_inputs_inverted
+        if stored == level:
+            if not edge:
+                return
+            # zastarala uroven po hrane, hrana vede z ulozene urovne do opacne
+            level = not stored
+        now = time.monotonic() if timestamp is None else timestamp
+        self.__input_mask = self.__input_mask ^ bit
+        self.__input_changed[slot] = now
+        if level:
+            self.__input_counters[slot] = (self.__input_counters[slot] + 1) & 0xFFFFFFFF
+            index = self.__pulse_index[slot]
+            self.__pulse_times[slot * PULSE_HISTORY + index % PULSE_HISTORY] = now
+            self.__pulse_index[slot] = (index + 1) & 0xFFFFFFFF
+        self.__input_version = self.__input_version + 1
+
+    def sync_inputs(self):
+        """
+        Přečtení úrovní všech vstupů z hw do masky vstupů, např. po ztrátě hrany. Rozdíl proti uložené úrovni se
+        zpracuje jako hrana.
+
+        Returns
+        -------
+            None
+        """
+        pins = list(self.DIGITAL_INPUTS.values())
+        levels = self.__hal.gpio_inputs(pins)
+        with self.__input_lock:
+            for slot, level in enumerate(levels):
+                self.__set_level(slot, False, level)
 
     def restart(self):
         """
@@ -257,7 +465,9 @@ class Dio:
             None
         """
         if self.is_alive():
-            self.__thread_kill_requested = True
+            with self.__condition:
+                self.__thread_kill_requested = True
+                self.__condition.notify()
             self.__thread.join(timeout=10.0)
             self.__thread_kill_requested = False
 
@@ -276,23 +486,31 @@ class Dio:
         -------
             None
         """
-        if name in self.DIGITAL_OUTPUTS_CTRL:
-            mask = self.DIGITAL_OUTPUTS_CTRL[name]
-            if level:
-                self.doctrl = self.doctrl | mask
-            else:
-                self.doctrl = self.doctrl & ~mask
+        with self.__condition:
+            doctrl = self.doctrl
+            doleds = self.doleds
+            if name in self.DIGITAL_OUTPUTS_CTRL:
+                mask = self.DIGITAL_OUTPUTS_CTRL[name]
+                if level:
+                    self.doctrl = doctrl | mask
+                else:
+                    self.doctrl = doctrl & ~mask
+
+            elif name in self.DIGITAL_OUTPUTS_LEDS:
+                mask = self.DIGITAL_OUTPUTS_LEDS[name]
+                if level:
+                    self.doleds = doleds & ~mask
+                else:
+                    self.doleds = doleds | mask
 
-        elif name in self.DIGITAL_OUTPUTS_LEDS:
-            mask = self.DIGITAL_OUTPUTS_LEDS[name]
-            if level:
-                self.doleds = self.doleds & ~mask
             else:
-                self.doleds = self.doleds | mask
+                return
 
-
-        else:
-            pass
+            # zmena vystupu probudi obsluhu SPI, v otevrenem okne commit az pri jeho zavreni
+            if (self.doctrl != doctrl or self.doleds != doleds) and self.__changed_at is None:
+                self.__changed_at = time.perf_counter()
+                if self.__commit_depth == 0:
+                    self.__condition.notify()
 
     def get_output(self, name: str) -> bool:
         """
@@ -332,8 +550,70 @@ class Dio:
         -------
             aktuální logický stav digitálního vstupu.
         """
-        if name in self.DIGITAL_INPUTS:
-            return GPIO.input(self.DIGITAL_INPUTS[name]) != self.digital_inputs_inverted
+        if name in self.__INPUT_SLOTS:
+            return bool(self.__input_mask >> self.__INPUT_SLOTS[name] & 1)
+
+    def get_inputs_mask(self) -> int:
+        """
+        Získání stavů všech digitálních vstupů bez čtení hw.
+
+        Returns
+        -------
+        mask : int
+            bitová maska logických úrovní vstupů, bit 0 odpovídá prvnímu vstupu DIGITAL_INPUTS.
+        """
+        return self.__input_mask
+
+    def get_input_changed(self, name: str) -> float:
+        """
+        Získání času poslední změny digitálního vstupu.
+
+        Parameters
+        ----------
+        name : str
+            Název digitálního vstupu.
+
+        Returns
+        -------
+            čas time.monotonic() poslední změny vstupu nebo None pro neznámý vstup.
+        """
+        if name in self.__INPUT_SLOTS:
+            return self.__input_changed[self.__INPUT_SLOTS[name]]
+
+    def get_pulse_times(self, name: str) -> list:
+        """
+        Získání časů posledních náběžných hran digitálního vstupu, nejvýše PULSE_HISTORY.
+
+        Parameters
+        ----------
+        name : str
+            Název digitálního vstupu.
+
+        Returns
+        -------
+        times : list
+            časy time.monotonic() náběžných hran od nejstarší po nejnovější.
+        """
+        if name not in self.__INPUT_SLOTS:
+            return []
+        slot = self.__INPUT_SLOTS[name]
+        base = slot * PULSE_HISTORY
+        with self.__input_lock:
+            index = self.__pulse_index[slot]
+            count = min(index, PULSE_HISTORY)
+            return [self.__pulse_times[base + (index - count + num) % PULSE_HISTORY] for num in range(count)]
+
+    def get_input_version(self) -> int:
+        """
+        Získání verze stavů vstupů, která se zvýší při každé změně stavu vstupu nebo počítadla hran. Při shodné verzi
+        není třeba stavy vstupů a počítadel znovu číst.
+
+        Returns
+        -------
+        version : int
+            verze stavů vstupů.
+        """
+        return self.__input_version
 
     def get_input_counter(self, name: str) -> int:
         """
@@ -348,11 +628,31 @@ class Dio:
         -------
             stav počítadla náběžných hran.
         """
-        if name in self.__DIGITAL_INPUT_COUNTERS:
-            return self.__DIGITAL_INPUT_COUNTERS[name]
+        if name in self.__INPUT_SLOTS:
+            return self.__input_counters[self.__INPUT_SLOTS[name]]
         else:
             return 0
 
+    def set_input_counter(self, name: str, value: int):
+        """
+        Nastavení počítadla náběžných hran, např. obnovení stavu uloženého při minulém běhu programu.
+
+        Parameters
+        ----------
+        name : str
+            Název digitálního vstupu,
+        value : int
+            nová hodnota počítadla, zapíše se LSB 32 bitů.
+
+        Returns
+        -------
+            None
+        """
+        if name in self.__INPUT_SLOTS:
+            with self.__input_lock:
+                self.__input_counters[self.__INPUT_SLOTS[name]] = value & 0xFFFFFFFF
+                self.__input_version = self.__input_version + 1
+
     def clr_input_counter(self, name: str):
         """
         Vynulovani pocitadla nabeznych hran.
@@ -366,8 +666,30 @@ class Dio:
         -------
             None
         """
-        if name in self.__DIGITAL_INPUT_COUNTERS:
-            self.__DIGITAL_INPUT_COUNTERS[name] = 0
+        self.take_input_counter(name)
+
+    def take_input_counter(self, name: str) -> int:
+        """
+        Nedělitelné přečtení a vynulování počítadla náběžných hran, hrana souběžná s voláním se započte buď do vrácené
+        hodnoty, nebo do vynulovaného počítadla.
+
+        Parameters
+        ----------
+        name : str
+            Název digitálního vstupu.
+
+        Returns
+        -------
+            stav počítadla náběžných hran před vynulováním.
+        """
+        if name not in self.__INPUT_SLOTS:
+            return 0
+        slot = self.__INPUT_SLOTS[name]
+        with self.__input_lock:
+            value = self.__input_counters[slot]
+            self.__input_counters[slot] = 0
+            self.__input_version = self.__input_version + 1
+        return value
 
     def test(self):
         """
@@ -417,12 +739,81 @@ class Dio:
         for key in self.DIGITAL_INPUTS:
             peg_msg.infomsg("{0} = {1}".format(key, self.get_input_counter(key)))
 
+        peg_msg.warningmsg("Statistika prenosu SPI:")
+        peg_msg.infomsg("{0}".format(self.get_stats()))
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Zátěžový test počítadel hran
+# ----------------------------------------------------------------------------------------------------------------------
+def stress_edges(edges: int = 20000, take_period: float = 0.001) -> dict:
+    """
+    Zátěžový test počítadel hran nad simulátorem periferií: do každého vstupu vkládá impulzy samostatné vlákno
+    a souběžně jiné vlákno počítadla nedělitelně čte a nuluje. Přepínání vláken se po dobu testu zkrátí, aby se
+    souběh projevil. Součet přečtených hodnot a konečného stavu počítadla se musí rovnat počtu vložených impulzů.
+
+    Parameters
+    ----------
+    edges : int
+        počet impulzů na každý vstup,
+    take_period : float
+        perioda čtení a nulování počítadel v sekundách.
+
+    Returns
+    -------
+    result : dict
+        {název vstupu: počet ztracených impulzů}.
+    """
+    sim = peg_hal.SimulatedBackend()
+    dio = Dio(hal=sim)
+    totals = {key: 0 for key in dio.DIGITAL_INPUTS}
+    done = threading.Event()
+
+    def take():
+        while not done.is_set():
+            for key in totals:
+                totals[key] = totals[key] + dio.take_input_counter(key)
+            time.sleep(take_period)
+
+    reader = threading.Thread(target=take)
+    writers = [threading.Thread(target=sim.inject_edges, args=(pin, edges)) for pin in dio.DIGITAL_INPUTS.values()]
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        reader.start()
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+    finally:
+        done.set()
+        reader.join()
+        sys.setswitchinterval(switch_interval)
+    return {key: edges - totals[key] - dio.take_input_counter(key) for key in totals}
+
+
 # ----------------------------------------------------------------------------------------------------------------------
 # Test modulu
 # ----------------------------------------------------------------------------------------------------------------------
 if __name__ == "__main__":
+    peg_msg.infomsg("Zatezovy test pocitadel hran")
+    peg_msg.infomsg("============================")
+
+    dbg_lost = stress_edges()
+    if any(dbg_lost.values()):
+        peg_msg.errormsg("Ztracene impulzy: {0}".format(dbg_lost))
+    else:
+        peg_msg.validmsg("Zadny ztraceny impulz na {0} vstupech".format(len(dbg_lost)))
+
     peg_msg.infomsg("Test cinnosti digitalnich vstupu a vystupu")
     peg_msg.infomsg("==========================================")
 
-    dbg_dio = Dio()
-    dbg_dio.test()
+    # test hw jen s backendem, ktery lze na tomto pocitaci vytvorit
+    try:
+        dbg_hal = peg_hal.get_backend()
+    except (ImportError, OSError) as dbg_err:
+        dbg_hal = None
+        peg_msg.warningmsg("Test vynechan, backend periferii nelze vytvorit: {0}".format(dbg_err))
+    if dbg_hal is not None:
+        dbg_dio = Dio(hal=dbg_hal)
+        dbg_dio.test()
@@ -36,11 +36,69 @@ except ImportError:
 # ----------------------------------------------------------------------------------------------------------------------
 # Konstanty modulu
 # ----------------------------------------------------------------------------------------------------------------------
+# zakladni pocet pulsu pulsniho elektromeru na kWh
+PULSE_IMP_PER_KWH = 1000.0
+
+# zakladni doba bez pulsu v sekundach, po ktere je vykon pulsniho elektromeru nulovy
+PULSE_POWER_TIMEOUT = 60.0
 
 
 # ----------------------------------------------------------------------------------------------------------------------
 # Datové třídy modulu
 # ----------------------------------------------------------------------------------------------------------------------
+class PulsePowerEstimator:
+    """
+    Odhad výkonu z intervalů mezi pulsy elektroměru. Okamžitý výkon odpovídá poslednímu intervalu, vyhlazený výkon
+    průměru intervalů zadaných časů pulsů. Pokud od posledního pulsu uplynulo déle než trvá interval, počítá se
+    s dosud otevřeným intervalem, výkon po odpojení zátěže tak plynule klesá a po timeout sekundách je nulový.
+    """
+
+    def __init__(self, imp_per_kwh: float = PULSE_IMP_PER_KWH, timeout: float = PULSE_POWER_TIMEOUT):
+        """
+        Nastavení odhadu výkonu.
+
+        Parameters
+        ----------
+        imp_per_kwh : float
+            počet pulsů elektroměru na kWh,
+        timeout : float
+            doba bez pulsu v sekundách, po které je výkon nulový.
+        """
+        # energie jednoho pulsu v J, vykon ve W je energie pulsu deleno intervalem v s
+        self.__pulse_energy = 3.6e6 / imp_per_kwh
+        self.__timeout = timeout
+
+    def estimate(self, times: list, now: float) -> tuple:
+        """
+        Výpočet okamžitého a vyhlazeného výkonu.
+
+        Parameters
+        ----------
+        times : list
+            časy posledních pulsů v sekundách od nejstaršího po nejnovější, viz Dio.get_pulse_times(),
+        now : float
+            aktuální čas ve stejné časové základně.
+
+        Returns
+        -------
+        power : tuple
+            (okamžitý výkon, vyhlazený výkon) ve W.
+        """
+        if len(times) < 2:
+            return 0.0, 0.0
+        pending = now - times[-1]
+        if pending > self.__timeout:
+            return 0.0, 0.0
+
+        interval = max(times[-1] - times[-2], pending)
+        count = len(times) - 1
+        span = times[-1] - times[0]
+        span = span + max(pending - span / count, 0.0)
+        if interval <= 0.0 or span <= 0.0:
+            return 0.0, 0.0
+        return self.__pulse_energy / interval, self.__pulse_energy * count / span
+
+
 
 class Electrometer:
     """
@@ -49,15 +107,16 @@ class Electrometer:
 
     def __init__(self, channel_num: int):
         """
-        Konstruktor obecného zařízení elektroměru. Hodnota spotřeby se ukládá do dvojice slov (16 bit) jako
-        LITTLE ENDIAN. Při inicializaci je nutné zadat číslo kanálu (výstupu), na kterém elektroměr měří.
+        Konstruktor obecného zařízení elektroměru. Hodnota spotřeby se ukládá jako celé číslo, na dvojici slov
+        registru uint32 ji převádí datový prostor. Při inicializaci je nutné zadat číslo kanálu (výstupu), na kterém
+        elektroměr měří.
 
         Parameters
         ----------
         channel_num : int
             číslo kanálu, ke kterému elektroměr patří, hodnoty menší nž 2 patří kanálu 1, vyšší hodnoty kanálu 2
         """
-        self.__consumption = [0, 0]
+        self.__consumption = 0
         self.__alive = False
         self.__enabled = True
         self.__period = 5
@@ -109,17 +168,39 @@ class Electrometer:
         """
         return self.__alive or time.time() < self.__watchdog
 
-    def read(self) -> list[int]:
+    def read(self) -> int:
         """
         Čtení aktuální hodnoty odběru od posledního nulování.
 
         Returns
         -------
-        consumption: List[int]
-            aktuální odběr energie od nulování jako seznam dvou 16 bit hodnot (celková hodnota LITTLE ENDIAN).
+        consumption: int
+            aktuální odběr energie od nulování v jednotkách Wh.
         """
         return self.__consumption
 
+    def read_power(self) -> tuple:
+        """
+        Čtení aktuálního výkonu, obecné zařízení výkon neměří.
+
+        Returns
+        -------
+        power : tuple
+            (okamžitý výkon, vyhlazený výkon) ve W.
+        """
+        return 0.0, 0.0
+
+    def get_period(self) -> float:
+        """
+        Získání periody vyčítání údaje přístroje.
+
+        Returns
+        -------
+        period : float
+            perioda v sekundách.
+        """
+        return self.__period
+
     def get_channel_num(self):
         """
         Získání čísla výstupu, ke kterému elektroměr naleží
@@ -130,7 +211,7 @@ class Electrometer:
         """
         Vynulování aktuální hodnoty počítadla elektroměru.
         """
-        self.__consumption = [0, 0]
+        self.__consumption = 0
         self.__reset_req = True
 
     def _get_reset(self):
@@ -153,9 +234,16 @@ class Electrometer:
         """
         Funkce aktualizace hodnoty spotřeby.
         """
-        low = 0
-        high = 0
-        return [low, high]
+        return 0
+
+    def poll(self):
+        """
+        Jedna aktualizace hodnoty spotřeby bez vlákna, např. z úlohy smyčky asyncio. Volající zajišťuje periodu
+        get_period(), pro funkci is_alive() se obnoví watchdog.
+        """
+        if self.__enabled:
+            self.__consumption = self._update()
+            self.__watchdog = time.time() + self.__watchdog_period
 
     def __task(self):
         """
@@ -175,9 +263,10 @@ class ElectrometerPulse(Electrometer):
     Třída pulsního elektroměru
     """
 
-    def __init__(self, channel_num: int, dio: Dio):
+    def __init__(self, channel_num: int, dio: Dio, imp_per_kwh: float = PULSE_IMP_PER_KWH,
+                 power_timeout: float = PULSE_POWER_TIMEOUT):
         """
-        Objekt pulsního elektroměru náležící kanálu channel_num. 1000 imp/ kWh
+        Objekt pulsního elektroměru náležící kanálu channel_num.
 
         Parameters
         ----------
@@ -185,11 +274,17 @@ class ElectrometerPulse(Electrometer):
             číslo kanálu, ke kterému elektroměr patří, hodnoty menší než 2 patří kanálu 1, vyšší hodnoty kanálu 2,
 
         dio : Dio
-            objekt digitalních vstupů a výstupů zpřístupňující HW pro čtení pulsů elektroměru.
+            objekt digitalních vstupů a výstupů zpřístupňující HW pro čtení pulsů elektroměru,
+        imp_per_kwh : float
+            počet pulsů elektroměru na kWh,
+        power_timeout : float
+            doba bez pulsu v sekundách, po které je výkon nulový.
         """
         super().__init__(channel_num=channel_num)
 
         self.__dio = dio
+        self.__wh_per_pulse = 1000.0 / imp_per_kwh
+        self.__estimator = PulsePowerEstimator(imp_per_kwh=imp_per_kwh, timeout=power_timeout)
 
         if self.get_channel_num() > 1:
             self.__digital_input_name = 'IN2P0_ELEM'
@@ -204,10 +299,18 @@ class ElectrometerPulse(Electrometer):
             self.__dio.clr_input_counter(name=self.__digital_input_name)
             self._ack_reset()
 
-        val = self.__dio.get_input_counter(name=self.__digital_input_name)
-        low = val & 0xFFFF
-        high = (val >> 16) & 0xFFFF
-        return [low, high]
+        return round(self.__dio.get_input_counter(name=self.__digital_input_name) * self.__wh_per_pulse)
+
+    def read_power(self) -> tuple:
+        """
+        Výpočet aktuálního výkonu z časů posledních pulsů vstupu elektroměru.
+
+        Returns
+        -------
+        power : tuple
+            (okamžitý výkon, vyhlazený výkon) ve W.
+        """
+        return self.__estimator.estimate(self.__dio.get_pulse_times(self.__digital_input_name), time.monotonic())
 
 
 class ElectrometerSchrackMGRZK465(Electrometer):
@@ -265,14 +368,8 @@ class ElectrometerSchrackMGRZK465(Electrometer):
             data = self.__client.read_input_registers(address=426, count=2, unit=33)
 
         if data.isError():
-            low = 0
-            high = 0
-        else:
-            val = int(((int(data.registers[0]) << 16) + int(data.registers[1])) / 10)
-            low = val & 0xFFFF
-            high = (val >> 16) & 0xFFFF
-
-        return [low, high]
+            return 0
+        return int(((int(data.registers[0]) << 16) + int(data.registers[1])) / 10)
 
 
 # ----------------------------------------------------------------------------------------------------------------------
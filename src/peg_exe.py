@@ -1,33 +1,53 @@
 """ EXECUTION Výkonná funkce programu
 
     Modul nabízí inicialiční třídu a její funkci 'execute', která zajišťuje vykonnávání funkcí programu, tj. propojení
-    činností mezi jednotlivými moduly.
+    činností mezi jednotlivými moduly. Činnost je rozdělena do stupňů (digitální IO, analogové IO, elektroměry,
+    kalibrace, počítadlo), které lze funkcí 'register' zaregistrovat do plánovače, každý s vlastní periodou.
 
     Aktálně spojuje činnost modulů:
         - peg_aio
         - peg_dio
         - peg_das
         - peg_elm
+        - peg_tim
+        - peg_out
 """
 
 # ----------------------------------------------------------------------------------------------------------------------
 # Import knihoven
 # ----------------------------------------------------------------------------------------------------------------------
-
-# casovani tiku counteru
+# mereni doby vykonavani stupnu
 import time
 
+# soubezna inicializace ovladacu
+from concurrent.futures import ThreadPoolExecutor
+
+# zamek povelu digitalnich vystupu mezi stupnem a odberem zmen
+import threading
+
 # import pristupu k modbus datum
 try:
     from peg_global_scope import singleton_modbus_datastore as modbus_datastore
 except (ImportError, ModuleNotFoundError):
     from src.peg_global_scope import singleton_modbus_datastore as modbus_datastore
 
-# import typu elektromeru
+# import statistik doby vykonavani stupnu
+try:
+    from peg_global_scope import singleton_stage_timer as stage_timer
+except (ImportError, ModuleNotFoundError):
+    from src.peg_global_scope import singleton_stage_timer as stage_timer
+
+# kody funkci pametovych prostoru modbus
 try:
-    from peg_global_scope import ELECTROMETER_TYPES
+    from peg_das import FC_CO, FC_DI, FC_HR, FC_IR
 except (ImportError, ModuleNotFoundError):
-    from src.peg_global_scope import ELECTROMETER_TYPES
+    from src.peg_das import FC_CO, FC_DI, FC_HR, FC_IR
+
+# import typu elektromeru a nastaveni pulsniho elektromeru
+try:
+    from peg_global_scope import ELECTROMETER_TYPES, PULSE_ELECTROMETER
+except (ImportError, ModuleNotFoundError):
+    from src.peg_global_scope import ELECTROMETER_TYPES, PULSE_ELECTROMETER
 
 # import typu pripojeni LED
 try:
@@ -35,6 +55,30 @@ try:
 except (ImportError, ModuleNotFoundError):
     from src.peg_global_scope import LED_COMMON_ELECTRODE
 
+# import period stupnu vykonne funkce
+try:
+    from peg_global_scope import SCHEDULER_PERIODS
+except (ImportError, ModuleNotFoundError):
+    from src.peg_global_scope import SCHEDULER_PERIODS
+
+# planovac periodickych uloh
+try:
+    from peg_sch import Scheduler
+except (ImportError, ModuleNotFoundError):
+    from src.peg_sch import Scheduler
+
+# nazvy stupnu a udaju statistik doby vykonavani
+try:
+    from peg_tim import STAGE_NAMES, STAT_NAMES
+except (ImportError, ModuleNotFoundError):
+    from src.peg_tim import STAGE_NAMES, STAT_NAMES
+
+# zapis vystupu pouze pri zmene
+try:
+    from peg_out import OutputCache
+except (ImportError, ModuleNotFoundError):
+    from src.peg_out import OutputCache
+
 # analogove vstupy a vystupy
 try:
     import peg_aio
@@ -67,38 +111,79 @@ class Execution:
     """
     Třída slouží pouze jako zapouzdření dat nutných pro vybavení výkonné funkce přípravku Mennekes
     """
-    def __init__(self):
+    def __init__(self, threaded: bool = True, dio=None, aio=None, electrometers: list = None, recorder=None):
         """
         Inicializace pravidelneho kroku programové smyčky.
-        """
-
-        # digitalní vstupy a vystupy
-        self.__dio = peg_dio.Dio()
 
-        # analogove vstupy a vystupy
-        self.__aio = peg_aio.Aio()
-        self.__aio_calibration_div_cnt = 0
+        Parameters
+        ----------
+        threaded : bool
+            True, pokud přenos SPI a vyčítání elektroměrů běží ve vlastních vláknech. V režimu asyncio je False
+            a tyto blokující úlohy spouští běhové prostředí podle seznamu get_io_tasks(),
+        dio :
+            objekt digitálních vstupů a výstupů s rozhraním Dio, v základu se založí peg_dio.Dio(),
+        aio :
+            objekt analogových vstupů a výstupů s rozhraním Aio, v základu se založí peg_aio.Aio(),
+        electrometers : list
+            elektroměry s rozhraním Electrometer, v základu se založí podle ELECTROMETER_TYPES,
+        recorder : Recorder
+            záznam vzorků hw (peg_rec), pokud je zadán, čtení ovladačů a elektroměrů se zaznamenává.
+        """
+        self.__threaded = threaded
+
+        # digitalní vstupy a vystupy a analogove vstupy a vystupy, na sobe nezavisle inicializace (otevreni SPI,
+        # prvni vzorek ADC) probihaji soubezne
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix='peg_init') as executor:
+            dio_future = executor.submit(peg_dio.Dio, refresh_period=SCHEDULER_PERIODS['spi_refresh_period']) \
+                if dio is None else None
+            aio_future = executor.submit(peg_aio.Aio) if aio is None else None
+            self.__dio = dio if dio_future is None else dio_future.result()
+            self.__aio = aio if aio_future is None else aio_future.result()
+
+        if recorder is not None:
+            self.__dio = recorder.wrap_dio(self.__dio)
+            self.__aio = recorder.wrap_aio(self.__aio)
+
+        # ovladacum se predavaji pouze zmeny vystupu, s obnovou po output_refresh_period
+        self.__dio_outputs = OutputCache(self.__dio.set_output, SCHEDULER_PERIODS['output_refresh_period'])
+        # povely digitalnich vystupu zapisuje stupen i odber zmen ve vlakne serveru, cteni povelu a jejich zapis
+        # jsou proto nedelitelne vuci sobe navzajem
+        self.__digital_lock = threading.RLock()
+        self.__aio_outputs = OutputCache(self.__aio.set_output, SCHEDULER_PERIODS['output_refresh_period'])
 
         # pocitadlo cinnosti
         self.__counter = 0xFFFF
-        self.__counter_step_start_time = time.time()
         
-        # nastaveni maxima pocitadla
-        modbus_datastore.set_hr_state(name='COUNTER_TOP', value=self.__counter)
+        # nastaveni maxima pocitadla, pokud neni obnoveno z trvaleho ulozeni
+        if modbus_datastore.get_hr_state(name='COUNTER_TOP') == 0:
+            modbus_datastore.set_hr_state(name='COUNTER_TOP', value=self.__counter)
+
+        # obnoveni pocitadel nabeznych hran z trvale ulozenych vstupnich registru
+        for key in self.__dio.DIGITAL_INPUTS:
+            self.__dio.set_input_counter(key, modbus_datastore.get_ir_state(name=key + '_CNT'))
 
         # tvorba seznamu elektromeru
         self.__electrometer = []
         for channel_raw_num, electrometer_type in enumerate(ELECTROMETER_TYPES):
-            if 'pulse' in electrometer_type:
-                elem = peg_elm.ElectrometerPulse(channel_num=(channel_raw_num + 1), dio=self.__dio)
+            if electrometers is not None:
+                if channel_raw_num >= len(electrometers):
+                    break
+                elem = electrometers[channel_raw_num]
+            elif 'pulse' in electrometer_type:
+                elem = peg_elm.ElectrometerPulse(channel_num=(channel_raw_num + 1), dio=self.__dio,
+                                                 imp_per_kwh=PULSE_ELECTROMETER['imp_per_kwh'],
+                                                 power_timeout=PULSE_ELECTROMETER['power_timeout'])
             elif 'schrack_mgrzk' in electrometer_type:
                 elem = peg_elm.ElectrometerSchrackMGRZK465(channel_num=(channel_raw_num + 1))
             else:
                 elem = peg_elm.Electrometer(channel_num=(channel_raw_num + 1))
                 elem.disable()
                 peg_msg.warningmsg("Zaveden elektromer bez podpory vycitani hodnoty.")
+            if recorder is not None:
+                elem = recorder.wrap_electrometer(elem, "ELECTROMETER{0}".format(channel_raw_num + 1))
             self.__electrometer.append(elem)
-            elem.start()
+            if threaded:
+                elem.start()
 
         # nastaveni typu kontrolnich vystupu (zamky jsou invertovany)
         self.__ctr_output_inverted = dict(self.__dio.DIGITAL_OUTPUTS_CTRL)
@@ -113,6 +198,101 @@ class Execution:
             else:
                 self.__led_common_anode[key] = "anode" in LED_COMMON_ELECTRODE[1]
 
+        # plan prenosu mezi registry a vstupy a vystupy
+        self.__compile()
+
+        # okamzite promitnuti povelu z modbusu na digitalni vystupy, bez cekani na dalsi krok execute; zapisy klientu
+        # serveru v oddelenem procesu se odberem nehlasi, povely pak prebira az stupen digitalnich vystupu
+        self.__command_subscription = None
+        if modbus_datastore.shared:
+            peg_msg.warningmsg("Povely klientu procesu serveru se prebiraji stupnem digitalnich vystupu "
+                            "s periodou {0} s".format(SCHEDULER_PERIODS['digital_period']))
+        else:
+            self.__command_subscription = modbus_datastore.subscribe(
+                [(FC_CO, key) for key in self.__dio.DIGITAL_OUTPUTS_CTRL] +
+                [(FC_CO, 'LED_{0}'.format(key)) for key in self.__dio.DIGITAL_OUTPUTS_LEDS],
+                self.__get_output_command_handler())
+
+    def __compile(self):
+        """
+        Sestavení plánu přenosu mezi modbus registry a vstupy a výstupy. Jména registrů, inverze výstupů a výběr
+        funkce převodu analogových vstupů se určí jednou, stupně výkonné funkce pak jen procházejí připravené seznamy
+        a předkompilované skupiny registrů.
+
+        Returns
+        -------
+            None
+        """
+        dio = self.__dio
+        aio = self.__aio
+
+        # digitalni stupen: povely vystupu a nulovani pocitadel -> vystupy, stavy vstupu, vystupu a pocitadel
+        self.__input_plan = list(dio.DIGITAL_INPUTS)
+        self.__output_plan = []
+        output_commands = []
+        output_states = []
+        for key in dio.DIGITAL_OUTPUTS_LEDS:
+            self.__output_plan.append((key, self.__led_common_anode[key]))
+            output_commands.append((FC_CO, 'LED_{0}'.format(key)))
+            output_states.append((FC_DI, 'LED_{0}'.format(key)))
+        for key in dio.DIGITAL_OUTPUTS_CTRL:
+            self.__output_plan.append((key, self.__ctr_output_inverted[key]))
+            output_commands.append((FC_CO, key))
+            output_states.append((FC_DI, key))
+        self.__counter_plan = list(dio.DIGITAL_INPUTS)
+        self.__digital_commands = modbus_datastore.get_group(
+            output_commands + [(FC_CO, key + '_CNT_CLR') for key in self.__counter_plan])
+        self.__digital_states = modbus_datastore.get_group(
+            [(FC_DI, key) for key in self.__input_plan] + output_states +
+            [(FC_IR, key + '_CNT') for key in self.__counter_plan])
+
+        # naposledy zapsane stavy digitalniho stupne a verze stavu vstupu ovladace, ze ktere byly precteny
+        self.__digital_values = [None] * (len(self.__input_plan) + len(self.__output_plan) + len(self.__counter_plan))
+        self.__digital_version = None
+
+        # analogovy stupen: zadani stridy -> vystupy, hodnoty vstupu a stridy
+        self.__analog_input_plan = []
+        analog_states = []
+        for key in aio.ANALOG_INPUTS:
+            if 'CP' in key:
+                self.__analog_input_plan.append(key)
+                analog_states.append((FC_IR, 'CP_VOLTAGE' + key[2]))
+            elif 'PP' in key:
+                self.__analog_input_plan.append(key)
+                analog_states.append((FC_IR, 'PP_RESISTANCE' + key[2]))
+        self.__analog_output_plan = list(aio.ANALOG_OUTPUTS)
+        self.__analog_commands = modbus_datastore.get_group(
+            [(FC_HR, 'CP_DUTY' + key[2]) for key in self.__analog_output_plan])
+        self.__analog_states = modbus_datastore.get_group(
+            analog_states + [(FC_IR, 'CP_DUTY' + key[2]) for key in self.__analog_output_plan])
+
+        # stupen elektromeru: povely nulovani -> nulovani, stav elektromeru
+        self.__electrometer_commands = modbus_datastore.get_group(
+            [(FC_CO, "ELECTROMETER{0}_CLR".format(num + 1)) for num in range(len(self.__electrometer))])
+        self.__electrometer_states = modbus_datastore.get_group(
+            [(FC_IR, "ELECTROMETER{0}".format(num + 1)) for num in range(len(self.__electrometer))] +
+            [(FC_IR, "ELECTROMETER{0}{1}".format(num + 1, suffix)) for num in range(len(self.__electrometer))
+             for suffix in ('_POWER', '_POWER_AVG')])
+
+        # stupen pocitadla
+        self.__counter_top = modbus_datastore.get_handle(FC_HR, 'COUNTER_TOP')
+        self.__counter_state = modbus_datastore.get_handle(FC_IR, 'COUNTER')
+
+        # mereni doby vykonavani stupnu a diagnosticke registry statistik
+        self.__leds_count = len(dio.DIGITAL_OUTPUTS_LEDS)
+        self.__time_digital_inputs = stage_timer.get('DIGITAL_INPUTS')
+        self.__time_leds = stage_timer.get('LEDS')
+        self.__time_ctrl_outputs = stage_timer.get('CTRL_OUTPUTS')
+        self.__time_analog_inputs = stage_timer.get('ANALOG_INPUTS')
+        self.__time_analog_outputs = stage_timer.get('ANALOG_OUTPUTS')
+        self.__time_counters = stage_timer.get('COUNTERS')
+        self.__time_electrometers = stage_timer.get('ELECTROMETERS')
+        self.__time_calibration = stage_timer.get('CALIBRATION')
+        self.__timing_states = modbus_datastore.get_group(
+            [(FC_IR, 'TIME_{0}_{1}'.format(stage, stat)) for stage in STAGE_NAMES for stat in STAT_NAMES] +
+            [(FC_IR, 'AIO_WRITES'), (FC_IR, 'AIO_SKIPPED'), (FC_IR, 'DIO_WRITES'), (FC_IR, 'DIO_SKIPPED'),
+             (FC_IR, 'SPI_FRAMES'), (FC_IR, 'SPI_LATENCY')])
+
     def __del__(self):
         """
         Ukonceni cinnosti spustenych vlaken.
@@ -121,102 +301,268 @@ class Execution:
         -------
             None
         """
+        if self.__command_subscription is not None:
+            modbus_datastore.unsubscribe(self.__command_subscription)
         self.__dio.kill()
 
+    def __get_output_command_handler(self):
+        """
+        Vytvoreni funkce pro odber zmen povelu digitalnich vystupu. Funkce neodkazuje na objekt Execution, aby
+        odber nebranil jeho likvidaci.
+
+        Returns
+        -------
+        handler : callable
+            funkce volana pri zmene cívky povelu, callback(fc, name, value).
+        """
+        dio_outputs = self.__dio_outputs
+        ctr_output_inverted = self.__ctr_output_inverted
+        led_common_anode = self.__led_common_anode
+        digital_lock = self.__digital_lock
+
+        def handler(fc: int, name: str, value: bool):
+            # odber se vola az po dokonceni zapisu bloku, zamek stupne tak neceka na zapis a naopak
+            with digital_lock:
+                if name in ctr_output_inverted:
+                    dio_outputs.set(name, value != ctr_output_inverted[name])
+                elif name[4:] in led_common_anode:
+                    dio_outputs.set(name[4:], value != led_common_anode[name[4:]])
+
+        return handler
+
+    def register(self, scheduler: Scheduler, periods: dict = None):
+        """
+        Registrace stupňů výkonné funkce do plánovače. Stupně s kratší periodou mají vyšší prioritu.
+
+        Parameters
+        ----------
+        scheduler : Scheduler
+            plánovač hlavní smyčky,
+        periods : dict
+            periody stupňů v sekundách, v základu SCHEDULER_PERIODS z konfigurace.
+
+        Returns
+        -------
+            None
+        """
+        periods = periods or SCHEDULER_PERIODS
+        scheduler.add('digital', self.execute_digital, periods['digital_period'], priority=0)
+        scheduler.add('analog', self.execute_analog, periods['analog_period'], priority=1)
+        scheduler.add('counter', self.execute_counter, periods['counter_period'], priority=2)
+        scheduler.add('electrometer', self.execute_electrometers, periods['electrometer_period'], priority=3)
+        scheduler.add('calibration', self.execute_calibration, periods['calibration_period'], priority=4)
+        scheduler.add('diagnostics', self.execute_diagnostics, periods['diagnostics_period'], priority=5)
+
+    def get_io_tasks(self) -> list:
+        """
+        Získání periodických blokujících úloh hw, které v režimu bez vláken spouští běhové prostředí mimo smyčku
+        asyncio.
+
+        Returns
+        -------
+        tasks : list
+            seznam [(název, funkce, perioda v sekundách)].
+        """
+        # obsluha SPI sama ceka na zmenu vystupu nejdele SPI_PERIOD, proto se spousti bez prodlevy
+        tasks = [('spi', self.__dio.service, 0.0)]
+        for num, electrometer in enumerate(self.__electrometer):
+            tasks.append(('electrometer{0}'.format(num + 1), electrometer.poll, electrometer.get_period()))
+        return tasks
+
     def execute(self) -> int:
         """
-        Výkonná funkce programu.
+        Výkonná funkce programu, jeden průchod všemi stupni.
 
         Returns
         -------
         error_num: int
             číslo chyby nebo 0 pokud chyba nenastala.
         """
+        error_num = 0
+        for stage in (self.execute_digital, self.execute_analog, self.execute_counter, self.execute_electrometers,
+                      self.execute_calibration):
+            error_num = stage() or error_num
+        return error_num
+
+    def execute_digital(self) -> int:
+        """
+        Stupeň digitálních vstupů a výstupů: stavy vstupů, povely LED a kontrolních výstupů, počítadla hran.
+
+        Returns
+        -------
+        error_num: int
+            číslo chyby nebo 0 pokud chyba nenastala.
+        """
+        dio = self.__dio
+        dio_outputs = self.__dio_outputs
+        dio_outputs.poll()
 
         # kontrola behu hlavniho vlakna digitalnich vstupu a vystupu
-        if not self.__dio.is_alive():
+        if self.__threaded and not dio.is_alive():
             peg_msg.warningmsg("Restart vlakna digitalnich vstupu a vystupu.")
-            self.__dio.restart()
+            dio.restart()
+
+        # hromadny zapis stavu do modbus, pouze pri hrane vstupu nebo zmene vystupu
+        states = self.__digital_values
+        leds_count = self.__leds_count
+
+        # prepis stavu digitalnich vstupu, ktere ovladac udrzuje podle hran, jen pri zmene verze
+        start = time.perf_counter_ns()
+        version = dio.get_input_version()
+        changed = version != self.__digital_version
+        if changed:
+            for num, key in enumerate(self.__input_plan):
+                states[num] = dio.get_input(key)
+            self.__digital_version = version
+        stop = time.perf_counter_ns()
+        self.__time_digital_inputs.add(stop - start)
+
+        # prepis stavu LED a kontrolnich pinu, LED jsou v planu prvni, zmeny kroku odchazi na SPI jednim ramcem;
+        # povely se ctou az pod zamkem, zmena povelu z odberu tak nemuze byt prepsana starsi hodnotou
+        start = stop
+        position = len(self.__input_plan)
+        self.__digital_lock.acquire()
+        dio.begin_commit()
+        try:
+            commands = self.__digital_commands.read()
+            for num, ((key, inverted), command) in enumerate(zip(self.__output_plan, commands)):
+                if num == leds_count:
+                    stop = time.perf_counter_ns()
+                    self.__time_leds.add(stop - start)
+                    start = stop
+                dio_outputs.set(key, command != inverted)
+                state = dio.get_output(key) != inverted
+                if states[position + num] != state:
+                    states[position + num] = state
+                    changed = True
+        finally:
+            dio.commit()
+            self.__digital_lock.release()
+        stop = time.perf_counter_ns()
+        self.__time_ctrl_outputs.add(stop - start)
+
+        # prepis stavu pocitadel a jejich pripadne nulovani, nulovani zvysi verzi stavu vstupu a stavy se tak znovu
+        # prectou i v pristim kroku
+        start = stop
+        position = position + len(self.__output_plan)
+        for key, clear in zip(self.__counter_plan, commands[len(self.__output_plan):]):
+            if clear:
+                dio.clr_input_counter(key)
+                changed = True
+        if changed:
+            for num, key in enumerate(self.__counter_plan):
+                states[position + num] = dio.get_input_counter(key)
+        self.__time_counters.add(time.perf_counter_ns() - start)
+
+        if changed:
+            self.__digital_states.write(states)
 
-        # prepis stavu digitalnich vstupu
-        for key in self.__dio.DIGITAL_INPUTS:
-            modbus_datastore.set_di_state(key, self.__dio.get_input(name=key))
-
-        # prepis stavu LED
-        for key in self.__dio.DIGITAL_OUTPUTS_LEDS:
-            name = 'LED_{0}'.format(key)
-            val = modbus_datastore.get_co_state(name=name)
-            val = val != self.__led_common_anode[key]
-            self.__dio.set_output(key, val)
-            val = self.__dio.get_output(name=key) != self.__led_common_anode[key]
-            modbus_datastore.set_di_state(name, val)
-
-        # prepis stavu kontrolnich pinu
-        for key in self.__dio.DIGITAL_OUTPUTS_CTRL:
-            val = modbus_datastore.get_co_state(name=key) != self.__ctr_output_inverted[key]
-            self.__dio.set_output(key, val)
-            val = self.__dio.get_output(name=key) != self.__ctr_output_inverted[key]
-            modbus_datastore.set_di_state(key, val)
+        return 0
+
+    def execute_analog(self) -> int:
+        """
+        Stupeň analogových vstupů a výstupů: napětí CP, odpor PP a střída CP.
+
+        Returns
+        -------
+        error_num: int
+            číslo chyby nebo 0 pokud chyba nenastala.
+        """
+        aio = self.__aio
+        aio_outputs = self.__aio_outputs
+        aio_outputs.poll()
+        commands = self.__analog_commands.read()
+        states = []
 
         # prepis stavu analogovych vstupu
-        for key in self.__aio.ANALOG_INPUTS:
-            if 'CP' in key:
-                name = 'CP_VOLTAGE' + key[2]
-                modbus_datastore.set_ir_state(name=name, value=round(self.__aio.get_input(key)))
-            elif 'PP' in key:
-                name = 'PP_RESISTANCE' + key[2]
-                modbus_datastore.set_ir_state(name=name, value=round(self.__aio.get_input(key)))
-            else:
-                pass
+        start = time.perf_counter_ns()
+        for key in self.__analog_input_plan:
+            states.append(round(aio.get_input(key)))
+        stop = time.perf_counter_ns()
+        self.__time_analog_inputs.add(stop - start)
 
         # prepis stavu analogovych vystupu
-        for key in self.__aio.ANALOG_OUTPUTS:
-            name = 'CP_DUTY' + key[2]
-            self.__aio.set_output(key, modbus_datastore.get_hr_state(name=name))
-            modbus_datastore.set_ir_state(name=name, value=self.__aio.get_output(key))
+        for key, duty in zip(self.__analog_output_plan, commands):
+            aio_outputs.set(key, duty)
+            states.append(aio.get_output(key))
+        self.__time_analog_outputs.add(time.perf_counter_ns() - stop)
 
-        # prepis stavu pocitadel a jejich pripadne nulovani:
-        for key in self.__dio.DIGITAL_INPUTS:
-            name = key + '_CNT_CLR'
-            if modbus_datastore.get_co_state(name=name):
-                self.__dio.clr_input_counter(key)
-
-            val = self.__dio.get_input_counter(key)
-            name = key + '_CNT_L'
-            modbus_datastore.set_ir_state(name=name, value=(val & 0xFFFF))
-            name = key + '_CNT_H'
-            modbus_datastore.set_ir_state(name=name, value=((val >> 16) & 0xFFFF))
-
-        # prepis stavu elektromeru a jejich pripadne nulovani
-        for channel_raw_num in range(len(self.__electrometer)):
-            key = "ELECTROMETER{0}".format(channel_raw_num + 1)
-            name = key + '_CLR'
-            if modbus_datastore.get_co_state(name=name):
-                self.__electrometer[channel_raw_num].reset()
-
-            val = self.__electrometer[channel_raw_num].read()
-            name = key + '_L'
-            modbus_datastore.set_ir_state(name=name, value=val[0])
-            name = key + '_H'
-            modbus_datastore.set_ir_state(name=name, value=val[1])
-
-        # rekalibrace analogových vstupů
-        if self.__aio_calibration_div_cnt > 0:
-            self.__aio_calibration_div_cnt = self.__aio_calibration_div_cnt - 1
-        else:
-            self.__aio.check_calibration()
-            self.__aio_calibration_div_cnt = 9
-
-        # inkrementace pocitadla exekuce
-        now = time.time()
-        if (now - self.__counter_step_start_time) > 1:
-            self.__counter = self.__counter + 1
-
-            counter_top = modbus_datastore.get_hr_state(name="COUNTER_TOP")
-            if self.__counter > counter_top:
-                self.__counter = 0
-            self.__counter_step_start_time = now
-            
-        modbus_datastore.set_ir_state(name="COUNTER", value=self.__counter)
+        self.__analog_states.write(states)
+
+        return 0
+
+    def execute_electrometers(self) -> int:
+        """
+        Stupeň elektroměrů: přepis stavu a okamžitého a vyhlazeného výkonu elektroměrů a jejich případné nulování.
+
+        Returns
+        -------
+        error_num: int
+            číslo chyby nebo 0 pokud chyba nenastala.
+        """
+        start = time.perf_counter_ns()
+        states = []
+        powers = []
+        for electrometer, clear in zip(self.__electrometer, self.__electrometer_commands.read()):
+            if clear:
+                electrometer.reset()
+            states.append(electrometer.read())
+            powers.extend(round(power) for power in electrometer.read_power())
+        states.extend(powers)
+        self.__time_electrometers.add(time.perf_counter_ns() - start)
+
+        self.__electrometer_states.write(states)
+
+        return 0
+
+    def execute_calibration(self) -> int:
+        """
+        Stupeň rekalibrace analogových vstupů.
+
+        Returns
+        -------
+        error_num: int
+            číslo chyby nebo 0 pokud chyba nenastala.
+        """
+        start = time.perf_counter_ns()
+        self.__aio.check_calibration()
+        self.__time_calibration.add(time.perf_counter_ns() - start)
+
+        return 0
+
+    def execute_diagnostics(self) -> int:
+        """
+        Stupeň diagnostiky: přepis statistik doby vykonávání stupňů do diagnostických vstupních registrů TIME_*
+        v µs zaokrouhlených na celé číslo, počítadel zápisů a přeskočených zápisů výstupů a počítadel přenosu SPI.
+
+        Returns
+        -------
+        error_num: int
+            číslo chyby nebo 0 pokud chyba nenastala.
+        """
+        summary = stage_timer.summary()
+        spi = self.__dio.get_stats()
+        self.__timing_states.write([round(summary[stage][stat]) for stage in STAGE_NAMES for stat in STAT_NAMES] +
+                                   [self.__aio_outputs.writes, self.__aio_outputs.skipped,
+                                    self.__dio_outputs.writes, self.__dio_outputs.skipped,
+                                    spi['frames'], round(spi['latency_mean'])])
+
+        return 0
+
+    def execute_counter(self) -> int:
+        """
+        Stupeň testovacího počítadla, při každém volání se počítadlo zvýší o 1 s přetečením na hodnotě COUNTER_TOP.
+        Rychlost čítání určuje perioda úlohy 'counter' plánovače (counter_period), v jednorázovém průchodu execute()
+        se počítadlo zvýší jednou za průchod.
+
+        Returns
+        -------
+        error_num: int
+            číslo chyby nebo 0 pokud chyba nenastala.
+        """
+        self.__counter = self.__counter + 1
+        if self.__counter > self.__counter_top.get():
+            self.__counter = 0
+        self.__counter_state.set(self.__counter)
 
         return 0
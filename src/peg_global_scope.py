@@ -23,6 +23,12 @@ try:
 except (ImportError, ModuleNotFoundError):
     from src import peg_das
 
+# mereni doby vykonavani stupnu
+try:
+    import peg_tim
+except (ImportError, ModuleNotFoundError):
+    from src import peg_tim
+
 # modbus server
 try:
     import peg_mdb
@@ -75,6 +81,9 @@ CFG_TEMPLATE = """[PRODUCT_IDENTIFICATION]
 #   pulse ... signal pulsu elektromeru je pripojeny na vstup IN1P0_ELEM 
 #   schrack_mgrzk465 ... elektromer schrack MGRZK 465 s protokolem modbus
 #     pripojeny pomoci rs485
+# Pulsni elektromer:
+#   imp_per_kwh ... pocet pulsu na kWh
+#   power_timeout ... doba bez pulsu v sekundach, po ktere je vykon nulovy
 {2}
 
 [LEDS]
@@ -83,6 +92,41 @@ CFG_TEMPLATE = """[PRODUCT_IDENTIFICATION]
 #   cathode ... spolecna katoda
 #   anode ... spolecna anoda
 {3}
+
+[DATASTORE]
+# Trvale ulozeni holding a vstupnich registru v souborech mapovanych do
+# pameti. Prazdna cesta 'persist_path' trvale ulozeni vypina. Obsah se na
+# disk uklada nejcasteji po 'sync_period' sekundach a pouze pri zmene.
+{4}
+
+[SCHEDULER]
+# Periody stupnu hlavni smycky v sekundach:
+#   digital_period ... digitalni vstupy, vystupy a pocitadla hran
+#   analog_period ... analogove vstupy a vystupy
+#   electrometer_period ... prepis stavu elektromeru
+#   calibration_period ... rekalibrace analogovych vstupu
+#   counter_period ... krok testovaciho pocitadla COUNTER, pocitadlo tak meri beh planovace
+#   supervision_period ... kontrola behu serveru
+#   diagnostics_period ... prepis statistik doby vykonavani stupnu
+#   output_refresh_period ... obnova vystupu, ktere se jinak zapisuji jen pri zmene
+#   spi_refresh_period ... obnova digitalnich vystupu na SPI beze zmeny, zmeny se odesilaji ihned
+{5}
+
+[RUNTIME]
+# Zpusob behu serveru a vstupu a vystupu:
+#   threads ... kazdy server, SPI a elektromery bezi ve vlastnim vlakne
+#   asyncio ... servery, hlavni smycka i cteni elektromeru bezi jako ulohy
+#     jedne smycky asyncio, blokujici volani hw obsluhuje 'io_workers' vlaken
+#   process ... servery bezi v oddelenem procesu nad datovym prostorem ve
+#     sdilene pameti, sitova zatez neovlivnuje casovani hlavni smycky
+# record_path ... soubor zaznamu vzorku hw a zapisu klientu pro pozdejsi
+#   prehrani (peg_rec), prazdny retezec = bez zaznamu
+# hal ... pristup k periferiim:
+#   adafruit ... skutecny hw beaglebone (Adafruit_BBIO a PWM v /dev/bone)
+#   simulator ... simulace periferii v procesu, napr. pro mereni na PC
+#   gpiocdev ... jako adafruit, GPIO pres znakove zarizeni /dev/gpiochipN
+#     (hromadne cteni vstupu, hrany s casem jadra)
+{6}
 """
 
 # typy hodnot v konfiguracnim souboru
@@ -93,8 +137,25 @@ CFG_KEY_CLASS = {
     "controller": float,
     "ch1_type": str,
     "ch2_type": str,
+    "imp_per_kwh": float,
+    "power_timeout": float,
     "ch1_common_electrode": str,
     "ch2_common_electrode": str,
+    "persist_path": str,
+    "sync_period": float,
+    "digital_period": float,
+    "analog_period": float,
+    "electrometer_period": float,
+    "calibration_period": float,
+    "counter_period": float,
+    "supervision_period": float,
+    "diagnostics_period": float,
+    "output_refresh_period": float,
+    "spi_refresh_period": float,
+    "mode": str,
+    "io_workers": int,
+    "record_path": str,
+    "hal": str,
 }
 
 # revize DPS jako float
@@ -110,11 +171,56 @@ PCB_REVISION = {
 # - schrack_mgrzk465
 ELECTROMETER_TYPES = ["pulse", "pulse"]
 
+# nastaveni pulsniho elektromeru
+# ==============================
+# imp_per_kwh ... pocet pulsu na kWh
+# power_timeout ... doba bez pulsu v sekundach, po ktere je vykon nulovy
+PULSE_ELECTROMETER = {
+    "imp_per_kwh": 1000.0,
+    "power_timeout": 60.0
+}
+
 # typ pripojeni signalizacnich LED
 # ================================
 # cathode, anode
 LED_COMMON_ELECTRODE = ["cathode", "cathode"]
 
+# trvale ulozeni registru
+# ========================
+# persist_path ... adresar souboru registru, prazdny retezec = bez ukladani
+# sync_period ... perioda ukladani zmen na disk v sekundach
+DATASTORE_PERSISTENCE = {
+    "persist_path": "",
+    "sync_period": 60.0
+}
+
+# periody stupnu hlavni smycky v sekundach
+# ========================================
+SCHEDULER_PERIODS = {
+    "digital_period": 0.01,
+    "analog_period": 0.05,
+    "electrometer_period": 1.0,
+    "calibration_period": 2.0,
+    "counter_period": 1.0,
+    "supervision_period": 0.2,
+    "diagnostics_period": 1.0,
+    "output_refresh_period": 10.0,
+    "spi_refresh_period": 10.0
+}
+
+# zpusob behu serveru a vstupu a vystupu
+# ======================================
+# mode ... 'threads', 'asyncio' nebo 'process'
+# io_workers ... pocet vlaken pro blokujici volani hw v rezimu asyncio
+# record_path ... soubor zaznamu vzorku hw a zapisu klientu, prazdny retezec = bez zaznamu
+# hal ... backend periferii 'adafruit', 'gpiocdev' nebo 'simulator'
+RUNTIME = {
+    "mode": "threads",
+    "io_workers": 2,
+    "record_path": "",
+    "hal": "adafruit"
+}
+
 # Aktualni verze programu
 # =======================
 PRODUCT_IDENTIFICATION = {
@@ -323,7 +429,7 @@ DIGITAL_INPUTS = {
 HOLDING_REGISTERS = {
     'COUNTER_TOP': {
         'address': 1,
-        'description': 'testovací - counter v input registrech čítá s periodou 1 s od 0 do této hodnoty'
+        'description': 'testovací - counter v input registrech čítá od 0 do této hodnoty s periodou counter_period'
     },
     'CP_DUTY1': {
         'address': 2,
@@ -339,7 +445,7 @@ HOLDING_REGISTERS = {
 INPUT_REGISTERS = {
     'COUNTER': {
         'address': 1,
-        'description': 'testovací - pocitadlo do hodnoty counter_top s pretecenim, inkrementace po 1 s'
+        'description': 'testovací - pocitadlo do counter_top s pretecenim, inkrementace s periodou counter_period'
     },
     'CP_DUTY1': {
         'address': 2,
@@ -353,45 +459,35 @@ INPUT_REGISTERS = {
         'address': 4,
         'description': 'hodnota připojeného odporu na vodiči PP u kanálu 1 v jednotkách ohm'
     },
-    'IN1P0_ELEM_CNT_L': {
+    'IN1P0_ELEM_CNT': {
         'address': 5,
-        'description': 'stav počítadla náběžných hran vstupu IN1P0, nižší byte'
-    },
-    'IN1P0_ELEM_CNT_H': {
-        'address': 6,
-        'description': 'stav počítadla náběžných hran vstupu IN1P0, vyšší byte'
+        'description': 'stav počítadla náběžných hran vstupu IN1P0, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
     },
-    'IN1P1_LOCK_CNT_L': {
+    'IN1P1_LOCK_CNT': {
         'address': 7,
-        'description': 'stav počítadla náběžných hran vstupu IN1P1, nižší byte'
+        'description': 'stav počítadla náběžných hran vstupu IN1P1, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
     },
-    'IN1P1_LOCK_CNT_H': {
-        'address': 8,
-        'description': 'stav počítadla náběžných hran vstupu IN1P1, vyšší byte'
-    },
-    'IN1P2_STOK_CNT_L': {
+    'IN1P2_STOK_CNT': {
         'address': 9,
-        'description': 'stav počítadla náběžných hran vstupu IN1P2, nižší byte'
-    },
-    'IN1P2_STOK_CNT_H': {
-        'address': 10,
-        'description': 'stav počítadla náběžných hran vstupu IN1P2, vyšší byte'
+        'description': 'stav počítadla náběžných hran vstupu IN1P2, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
     },
-    'IN1P3_BTON_CNT_L': {
+    'IN1P3_BTON_CNT': {
         'address': 11,
-        'description': 'stav počítadla náběžných hran vstupu IN1P3, nižší byte'
+        'description': 'stav počítadla náběžných hran vstupu IN1P3, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
     },
-    'IN1P3_BTON_CNT_H': {
-        'address': 12,
-        'description': 'stav počítadla náběžných hran vstupu IN1P3, vyšší byte'
-    },
-    'ELECTROMETER1_L': {
+    'ELECTROMETER1': {
         'address': 13,
-        'description': 'stav elektroměru kanálu 1 v jednotkách Wh, nižší byte'
-    },
-    'ELECTROMETER1_H': {
-        'address': 14,
-        'description': 'stav elektroměru kanálu 1 v jednotkách Wh, vyšší byte'
+        'description': 'stav elektroměru kanálu 1 v jednotkách Wh, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
     },
     'CP_DUTY2': {
         'address': 22,
@@ -405,48 +501,116 @@ INPUT_REGISTERS = {
         'address': 24,
         'description': 'hodnota připojeného odporu na vodiči PP u kanálu 2'
     },
-    'IN2P0_ELEM_CNT_L': {
+    'IN2P0_ELEM_CNT': {
         'address': 25,
-        'description': 'stav počítadla náběžných hran vstupu IN2P0, nižší byte'
-    },
-    'IN2P0_ELEM_CNT_H': {
-        'address': 26,
-        'description': 'stav počítadla náběžných hran vstupu IN2P0, vyšší byte'
+        'description': 'stav počítadla náběžných hran vstupu IN2P0, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
     },
-    'IN2P1_LOCK_CNT_L': {
+    'IN2P1_LOCK_CNT': {
         'address': 27,
-        'description': 'stav počítadla náběžných hran vstupu IN2P1, nižší byte'
+        'description': 'stav počítadla náběžných hran vstupu IN2P1, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
     },
-    'IN2P1_LOCK_CNT_H': {
-        'address': 28,
-        'description': 'stav počítadla náběžných hran vstupu IN2P1, vyšší byte'
-    },
-    'IN2P2_STOK_CNT_L': {
+    'IN2P2_STOK_CNT': {
         'address': 29,
-        'description': 'stav počítadla náběžných hran vstupu IN2P2, nižší byte'
+        'description': 'stav počítadla náběžných hran vstupu IN2P2, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
     },
-    'IN2P2_STOK_CNT_H': {
-        'address': 30,
-        'description': 'stav počítadla náběžných hran vstupu IN2P2, vyšší byte'
-    },
-    'IN2P3_BTON_CNT_L': {
+    'IN2P3_BTON_CNT': {
         'address': 31,
-        'description': 'stav počítadla náběžných hran vstupu IN2P3, nižší byte'
+        'description': 'stav počítadla náběžných hran vstupu IN2P3, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
     },
-    'IN2P3_BTON_CNT_H': {
-        'address': 32,
-        'description': 'stav počítadla náběžných hran vstupu IN2P3, vyšší byte'
-    },
-    'ELECTROMETER2_L': {
+    'ELECTROMETER2': {
         'address': 33,
-        'description': 'stav elektroměru kanálu 2 v jednotkách Wh, nižší byte'
-    },
-    'ELECTROMETER2_H': {
-        'address': 34,
-        'description': 'stav elektroměru kanálu 2 v jednotkách Wh, vyšší byte'
+        'description': 'stav elektroměru kanálu 2 v jednotkách Wh, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
+    },
+    'AIO_WRITES': {
+        'address': 35,
+        'description': 'počet zápisů střídy analogových výstupů do ovladače, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
+    },
+    'AIO_SKIPPED': {
+        'address': 37,
+        'description': 'počet přeskočených zápisů analogových výstupů beze změny, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
+    },
+    'DIO_WRITES': {
+        'address': 39,
+        'description': 'počet zápisů digitálních výstupů do ovladače, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
+    },
+    'DIO_SKIPPED': {
+        'address': 41,
+        'description': 'počet přeskočených zápisů digitálních výstupů beze změny, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
+    },
+    'STARTUP_MODBUS': {
+        'address': 43,
+        'description': 'doba od startu programu do první odpovědi modbus serveru v ms, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
+    },
+    'SPI_FRAMES': {
+        'address': 45,
+        'description': 'počet rámců digitálních výstupů odeslaných na SPI, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
+    },
+    'SPI_LATENCY': {
+        'address': 47,
+        'description': 'průměrné zpoždění od změny digitálního výstupu po odeslání na SPI v µs, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
+    },
+    'ELECTROMETER1_POWER': {
+        'address': 49,
+        'description': 'okamžitý výkon elektroměru kanálu 1 ve W, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
+    },
+    'ELECTROMETER1_POWER_AVG': {
+        'address': 51,
+        'description': 'vyhlazený výkon elektroměru kanálu 1 ve W, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
+    },
+    'ELECTROMETER2_POWER': {
+        'address': 53,
+        'description': 'okamžitý výkon elektroměru kanálu 2 ve W, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
+    },
+    'ELECTROMETER2_POWER_AVG': {
+        'address': 55,
+        'description': 'vyhlazený výkon elektroměru kanálu 2 ve W, 32 bit, nižší slovo na nižší adrese',
+        'type': 'uint32',
+        'word_order': 'little'
     },
 }
 
+# diagnosticke registry doby vykonavani stupnu vykonne funkce v us, TIME_<stupen>_<MIN|MEAN|MAX|P99>
+TIMING_REGISTERS_ADDRESS = 101
+for stage_num, stage_name in enumerate(peg_tim.STAGE_NAMES):
+    for stat_num, stat_name in enumerate(peg_tim.STAT_NAMES):
+        INPUT_REGISTERS['TIME_{0}_{1}'.format(stage_name, stat_name)] = {
+            'address': TIMING_REGISTERS_ADDRESS + 2 * (stage_num * len(peg_tim.STAT_NAMES) + stat_num),
+            'description': 'doba vykonávání stupně {0} v µs ({1}), 32 bit, nižší slovo na nižší adrese'.format(
+                stage_name, stat_name),
+            'type': 'uint32',
+            'word_order': 'little'
+        }
+
 # ----------------------------------------------------------------------------------------------------------------------
 # Globální singletony modulu
 # ----------------------------------------------------------------------------------------------------------------------
@@ -461,6 +625,12 @@ singleton_modbus_datastore = peg_das.DataStore(identification=PRODUCT_IDENTIFICA
 root_path = dirname(__file__)
 singleton_flask_app = Flask(PRODUCT_IDENTIFICATION["ProductName"], root_path=root_path)
 
+# statistiky doby vykonavani stupnu vykonne funkce
+singleton_stage_timer = peg_tim.StageTimer()
+
+# zaznam casu kroku startu programu
+singleton_startup_timer = peg_tim.StartupTimer()
+
 
 # ----------------------------------------------------------------------------------------------------------------------
 # Globální funkce modulu
@@ -528,6 +698,11 @@ def getsettings(argv: list) -> None:
             if "ch2_type" in rconfig["ELECTROMETERS"]:
                 ELECTROMETER_TYPES[1] = CFG_KEY_CLASS["ch2_type"](rconfig["ELECTROMETERS"]["ch2_type"])
                 peg_msg.validmsg("Cteni konfigurace ELECTROMETERS: ch2_type = {0}".format(ELECTROMETER_TYPES[1]))
+            for key in PULSE_ELECTROMETER:
+                if key in rconfig["ELECTROMETERS"]:
+                    PULSE_ELECTROMETER[key] = CFG_KEY_CLASS[key](rconfig["ELECTROMETERS"][key])
+                    peg_msg.validmsg("Cteni konfigurace ELECTROMETERS: {0} = {1}".format(
+                        key, PULSE_ELECTROMETER[key]))
 
         if "LEDS" in rconfig:
             if "ch1_common_electrode" in rconfig["LEDS"]:
@@ -537,6 +712,26 @@ def getsettings(argv: list) -> None:
                 LED_COMMON_ELECTRODE[1] = CFG_KEY_CLASS["ch2_common_electrode"](rconfig["LEDS"]["ch2_common_electrode"])
                 peg_msg.validmsg("Cteni konfigurace LEDS: ch2_common_electrode = {0}".format(LED_COMMON_ELECTRODE[1]))
 
+        if "DATASTORE" in rconfig:
+            for key in DATASTORE_PERSISTENCE:
+                if key in rconfig["DATASTORE"]:
+                    DATASTORE_PERSISTENCE[key] = CFG_KEY_CLASS[key](rconfig["DATASTORE"][key])
+                    peg_msg.validmsg("Cteni konfigurace DATASTORE: {0} = {1}".format(
+                        key, DATASTORE_PERSISTENCE[key]))
+
+        if "RUNTIME" in rconfig:
+            for key in RUNTIME:
+                if key in rconfig["RUNTIME"]:
+                    RUNTIME[key] = CFG_KEY_CLASS[key](rconfig["RUNTIME"][key])
+                    peg_msg.validmsg("Cteni konfigurace RUNTIME: {0} = {1}".format(key, RUNTIME[key]))
+
+        if "SCHEDULER" in rconfig:
+            for key in SCHEDULER_PERIODS:
+                if key in rconfig["SCHEDULER"]:
+                    SCHEDULER_PERIODS[key] = CFG_KEY_CLASS[key](rconfig["SCHEDULER"][key])
+                    peg_msg.validmsg("Cteni konfigurace SCHEDULER: {0} = {1}".format(
+                        key, SCHEDULER_PERIODS[key]))
+
     if wfilename:
         product_indetification_section = "\nModelName = {0}".format(PRODUCT_IDENTIFICATION["ModelName"])
 
@@ -546,14 +741,31 @@ def getsettings(argv: list) -> None:
 
         electrometers_section = "\nch1_type = {0}\nch2_type = {1}"
         electrometers_section = electrometers_section.format(ELECTROMETER_TYPES[0], ELECTROMETER_TYPES[1])
+        for key in PULSE_ELECTROMETER:
+            electrometers_section = electrometers_section + "\n{0} = {1}".format(key, PULSE_ELECTROMETER[key])
 
         leds_section = "\nch1_common_electrode = {0}\nch2_common_electrode = {1}"
         leds_section = leds_section.format(LED_COMMON_ELECTRODE[0], LED_COMMON_ELECTRODE[1])
 
+        datastore_section = ""
+        for key in DATASTORE_PERSISTENCE:
+            datastore_section = datastore_section + "\n{0} = {1}".format(key, DATASTORE_PERSISTENCE[key])
+
+        scheduler_section = ""
+        for key in SCHEDULER_PERIODS:
+            scheduler_section = scheduler_section + "\n{0} = {1}".format(key, SCHEDULER_PERIODS[key])
+
+        runtime_section = ""
+        for key in RUNTIME:
+            runtime_section = runtime_section + "\n{0} = {1}".format(key, RUNTIME[key])
+
         wconfig = CFG_TEMPLATE.format(product_indetification_section,
                                       pcb_revision_section,
                                       electrometers_section,
-                                      leds_section)
+                                      leds_section,
+                                      datastore_section,
+                                      scheduler_section,
+                                      runtime_section)
 
         try:
             with open(wfilename, 'w') as configfile:
@@ -0,0 +1,917 @@
+""" HARDWARE ABSTRACTION Přístup k periferiím GPIO, SPI, ADC a PWM přes vyměnitelný backend
+
+    Modul odděluje ovladače peg_dio a peg_aio od konkrétního přístupu k periferiím. Backend 'adafruit' používá
+    knihovnu Adafruit_BBIO a soubory PWM v /dev/bone/pwm, tj. skutečný hw beaglebone. Backend 'gpiocdev' přistupuje
+    ke GPIO přes znakové zařízení /dev/gpiochipN: vstupy jednoho čipu čte jedním voláním ioctl a hrany všech vstupů
+    přijímá s časem jádra z deskriptorů požadavků v jednom vlákně, SPI, ADC a PWM předává backendu 'adafruit'. Backend
+    'simulator' běží v procesu na libovolném počítači: úrovně vstupů a hrany nastavuje test nebo zátěžový skript,
+    analogové vstupy sledují zadané průběhy a každá operace může mít nastavenou dobu trvání. Backend se volí položkou
+    'hal' sekce RUNTIME konfigurace a vytvoří se při prvním použití, tj. až po načtení konfigurace.
+"""
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Import knihoven
+# ----------------------------------------------------------------------------------------------------------------------
+# prubehy analogovych vstupu a doby operaci simulatoru
+import time
+import math
+
+# znakove zarizeni GPIO
+import os
+import select
+import struct
+
+# soubezny pristup k simulovanym vstupum
+import threading
+
+# volba backendu z konfigurace
+try:
+    from peg_global_scope import RUNTIME
+except (ImportError, ModuleNotFoundError):
+    from src.peg_global_scope import RUNTIME
+
+# hlaseni na konzoli
+try:
+    import peg_msg
+except ImportError:
+    from src import peg_msg
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Konstanty modulu
+# ----------------------------------------------------------------------------------------------------------------------
+# smer pinu GPIO
+GPIO_IN = 0
+GPIO_OUT = 1
+
+# hrany vstupu GPIO pro detekci udalosti
+GPIO_RISING = 1
+GPIO_FALLING = 2
+GPIO_BOTH = 3
+
+# rozhrani znakoveho zarizeni GPIO v2 (linux/gpio.h)
+GPIO_CHIP_PATH = '/dev/gpiochip{0}'
+GPIO_CONSUMER = b'peg'
+GPIO_V2_LINES_MAX = 64
+GPIO_V2_LINE_FLAG_INPUT = 0x04
+GPIO_V2_LINE_FLAG_OUTPUT = 0x08
+GPIO_V2_LINE_FLAG_EDGE_RISING = 0x10
+GPIO_V2_LINE_FLAG_EDGE_FALLING = 0x20
+GPIO_V2_LINE_ATTR_ID_OUTPUT_VALUES = 2
+GPIO_V2_LINE_EVENT_RISING_EDGE = 1
+GPIO_V2_LINE_REQUEST = struct.Struct('<64I32sQI20x' + 'I4xQQ' * 10 + 'II20xi')
+GPIO_V2_LINE_VALUES = struct.Struct('<QQ')
+GPIO_V2_LINE_EVENT = struct.Struct('<QIIII24x')
+GPIO_V2_GET_LINE_IOCTL = 0xC0000000 | GPIO_V2_LINE_REQUEST.size << 16 | 0xB4 << 8 | 0x07
+GPIO_V2_LINE_GET_VALUES_IOCTL = 0xC0000000 | GPIO_V2_LINE_VALUES.size << 16 | 0xB4 << 8 | 0x0E
+GPIO_V2_LINE_SET_VALUES_IOCTL = 0xC0000000 | GPIO_V2_LINE_VALUES.size << 16 | 0xB4 << 8 | 0x0F
+
+# pocet udalosti hran ctenych najednou z jednoho pozadavku
+GPIO_EVENT_BATCH = 16
+
+# piny beaglebone -> (cislo cipu GPIO, linka), cip odpovida bance GPIO procesoru
+BEAGLEBONE_GPIO_LINES = {
+    'P8_15': (1, 15),
+    'P8_16': (1, 14),
+    'P8_17': (0, 27),
+    'P8_18': (2, 1),
+    'P8_39': (2, 12),
+    'P8_40': (2, 13),
+    'P8_41': (2, 10),
+    'P8_42': (2, 11),
+    'P8_43': (2, 8),
+    'P8_44': (2, 9),
+    'P8_45': (2, 6),
+    'P8_46': (2, 7),
+    'P9_15': (1, 16),
+    'P9_25': (3, 21),
+    'P9_27': (3, 19),
+}
+
+# zakladni doby operaci simulatoru v sekundach
+DEFAULT_LATENCIES = {
+    'gpio': 0.0,
+    'spi': 0.0,
+    'adc': 0.0,
+    'pwm': 0.0,
+}
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Průběhy analogových vstupů simulátoru
+# ----------------------------------------------------------------------------------------------------------------------
+def constant(value: float):
+    """
+    Konstantní průběh.
+
+    Parameters
+    ----------
+    value : float
+        poměrná hodnota ADC 0 až 1.
+
+    Returns
+    -------
+    waveform : callable
+        funkce času v sekundách vracející hodnotu ADC.
+    """
+    return lambda seconds: value
+
+
+def square(low: float, high: float, period: float, duty: float = 0.5):
+    """
+    Obdélníkový průběh, začíná vysokou úrovní.
+
+    Parameters
+    ----------
+    low : float
+        nízká úroveň 0 až 1,
+    high : float
+        vysoká úroveň 0 až 1,
+    period : float
+        perioda v sekundách,
+    duty : float
+        poměrná doba vysoké úrovně 0 až 1.
+
+    Returns
+    -------
+    waveform : callable
+        funkce času v sekundách vracející hodnotu ADC.
+    """
+    return lambda seconds: high if (seconds % period) < duty * period else low
+
+
+def sine(offset: float, amplitude: float, period: float):
+    """
+    Sinusový průběh.
+
+    Parameters
+    ----------
+    offset : float
+        střední hodnota 0 až 1,
+    amplitude : float
+        amplituda,
+    period : float
+        perioda v sekundách.
+
+    Returns
+    -------
+    waveform : callable
+        funkce času v sekundách vracející hodnotu ADC.
+    """
+    return lambda seconds: offset + amplitude * math.sin(2 * math.pi * seconds / period)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Rozhraní backendu
+# ----------------------------------------------------------------------------------------------------------------------
+class Backend:
+    """
+    Společné rozhraní backendů. Piny se označují názvy beaglebone (např. 'P8_41'), výstupy PWM cestou k adresáři
+    kanálu (např. '/dev/bone/pwm/1/a/').
+    """
+    name = 'none'
+
+    def gpio_setup(self, pin: str, direction: int):
+        """
+        Nastavení směru pinu GPIO_IN nebo GPIO_OUT.
+        """
+        raise NotImplementedError
+
+    def gpio_output(self, pin: str, level: bool):
+        """
+        Zápis úrovně výstupního pinu.
+        """
+        raise NotImplementedError
+
+    def gpio_input(self, pin: str) -> bool:
+        """
+        Čtení úrovně vstupního pinu.
+        """
+        raise NotImplementedError
+
+    def gpio_inputs(self, pins: list) -> list:
+        """
+        Čtení úrovní více vstupních pinů, backend může číst hromadně.
+        """
+        return [self.gpio_input(pin) for pin in pins]
+
+    def gpio_add_event_detect(self, pin: str, callback, edge: int = GPIO_RISING):
+        """
+        Přihlášení funkce callback(pin, level, timestamp) volané při hraně vstupu GPIO_RISING, GPIO_FALLING nebo
+        GPIO_BOTH, level je úroveň vstupu po hraně a timestamp čas hrany time.monotonic() nebo None, pokud jej backend
+        nezná.
+        """
+        raise NotImplementedError
+
+    def gpio_cleanup(self):
+        """
+        Uvolnění všech pinů.
+        """
+        raise NotImplementedError
+
+    def spi_open(self, bus: int, device: int, speed: int, mode: int, bits: int):
+        """
+        Otevření a nastavení sběrnice SPI.
+        """
+        raise NotImplementedError
+
+    def spi_write(self, data: list):
+        """
+        Zápis slov na sběrnici SPI.
+        """
+        raise NotImplementedError
+
+    def spi_close(self):
+        """
+        Uzavření sběrnice SPI.
+        """
+        raise NotImplementedError
+
+    def adc_setup(self):
+        """
+        Inicializace ADC.
+        """
+        raise NotImplementedError
+
+    def adc_read(self, pin: str) -> float:
+        """
+        Čtení poměrné hodnoty ADC 0 až 1.
+        """
+        raise NotImplementedError
+
+    def pwm_write(self, channel: str, attribute: str, value: str):
+        """
+        Zápis nastavení kanálu PWM, atributy 'period', 'duty_cycle', 'polarity' a 'enable'.
+        """
+        raise NotImplementedError
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Backend Adafruit_BBIO a sysfs
+# ----------------------------------------------------------------------------------------------------------------------
+class AdafruitBackend(Backend):
+    """
+    Přístup ke skutečnému hw beaglebone přes knihovnu Adafruit_BBIO a soubory PWM.
+    """
+    name = 'adafruit'
+
+    def __init__(self):
+        # knihovny jsou dostupne jen na beaglebone, importuji se az pri volbe backendu
+        import Adafruit_BBIO.GPIO as GPIO
+        import Adafruit_BBIO.ADC as ADC
+        from Adafruit_BBIO.SPI import SPI
+        self.__gpio = GPIO
+        self.__adc = ADC
+        self.__spi_class = SPI
+        self.__spi = None
+
+    def gpio_setup(self, pin: str, direction: int):
+        self.__gpio.setup(pin, self.__gpio.OUT if direction == GPIO_OUT else self.__gpio.IN)
+
+    def gpio_output(self, pin: str, level: bool):
+        self.__gpio.output(pin, self.__gpio.HIGH if level else self.__gpio.LOW)
+
+    def gpio_input(self, pin: str) -> bool:
+        return bool(self.__gpio.input(pin))
+
+    def gpio_add_event_detect(self, pin: str, callback, edge: int = GPIO_RISING):
+        gpio = self.__gpio
+        if edge == GPIO_BOTH:
+            # Adafruit_BBIO predava jen nazev pinu, uroven po hrane se cte ze vstupu
+            function = lambda channel: callback(pin, bool(gpio.input(pin)), None)
+            gpio_edge = gpio.BOTH
+        else:
+            function = lambda channel: callback(pin, edge == GPIO_RISING, None)
+            gpio_edge = gpio.RISING if edge == GPIO_RISING else gpio.FALLING
+        gpio.add_event_detect(pin, gpio_edge, callback=function)
+
+    def gpio_cleanup(self):
+        self.__gpio.cleanup()
+
+    def spi_open(self, bus: int, device: int, speed: int, mode: int, bits: int):
+        self.__spi = self.__spi_class(bus, device)
+        self.__spi.msh = speed
+        self.__spi.mode = mode
+        self.__spi.bpw = bits
+
+    def spi_write(self, data: list):
+        # self.spi.xfer2(data) nefunguje spravne v dlouhem casovem horizontu, obcas odesle pouze 1 byte
+        self.__spi.writebytes(data)
+
+    def spi_close(self):
+        if self.__spi is not None:
+            self.__spi.close()
+
+    def adc_setup(self):
+        self.__adc.setup()
+
+    def adc_read(self, pin: str) -> float:
+        return self.__adc.read(pin)
+
+    def pwm_write(self, channel: str, attribute: str, value: str):
+        with open(channel + attribute, 'w') as file:
+            file.write(value)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Backend simulátoru
+# ----------------------------------------------------------------------------------------------------------------------
+class SimulatedBackend(Backend):
+    """
+    Simulace periferií v procesu. Úrovně vstupů a hrany se nastavují funkcemi set_input a inject_edges, analogové
+    vstupy funkcí set_waveform, zapsané výstupy jsou v atributech outputs, spi_frames a pwm.
+    """
+    name = 'simulator'
+
+    def __init__(self, latencies: dict = None, waveform=None):
+        """
+        Založení simulátoru s klidovými vstupy.
+
+        Parameters
+        ----------
+        latencies : dict
+            doby operací {'gpio', 'spi', 'adc', 'pwm'} v sekundách, chybějící položky viz DEFAULT_LATENCIES,
+        waveform : callable
+            průběh všech analogových vstupů bez vlastního průběhu, v základu constant(1.0), tj. nepřipojené vozidlo.
+        """
+        self.latencies = dict(DEFAULT_LATENCIES)
+        self.latencies.update(latencies or {})
+        self.__default_waveform = waveform or constant(1.0)
+        self.__waveforms = {}
+        self.__callbacks = {}
+        self.__lock = threading.Lock()
+        self.__start = time.monotonic()
+        self.directions = {}
+        self.inputs = {}
+        self.outputs = {}
+        self.pwm = {}
+        self.spi_frames = 0
+        self.spi_last = None
+        self.spi_settings = None
+
+    @staticmethod
+    def __wait(seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    # ovladani simulace
+    def set_input(self, pin: str, level: bool):
+        """
+        Nastavení úrovně vstupu, při přihlášené hraně se zavolá přihlášená funkce.
+
+        Parameters
+        ----------
+        pin : str
+            název pinu,
+        level : bool
+            nová úroveň.
+
+        Returns
+        -------
+            None
+        """
+        level = bool(level)
+        with self.__lock:
+            changed = level != self.inputs.get(pin, False)
+            self.inputs[pin] = level
+            callback, edge = self.__callbacks.get(pin, (None, 0))
+        if changed and callback is not None and edge & (GPIO_RISING if level else GPIO_FALLING):
+            callback(pin, level, time.monotonic())
+
+    def inject_edges(self, pin: str, count: int = 1):
+        """
+        Vložení impulzů na vstup, každý impulz vyvolá jednu náběžnou hranu. Úroveň vstupu zůstane nízká.
+
+        Parameters
+        ----------
+        pin : str
+            název pinu,
+        count : int
+            počet impulzů.
+
+        Returns
+        -------
+            None
+        """
+        for _ in range(count):
+            self.set_input(pin, False)
+            self.set_input(pin, True)
+        self.set_input(pin, False)
+
+    def set_waveform(self, pin: str, waveform):
+        """
+        Nastavení průběhu analogového vstupu.
+
+        Parameters
+        ----------
+        pin : str
+            název pinu,
+        waveform : callable
+            funkce času od založení simulátoru v sekundách vracející hodnotu ADC, viz constant, square, sine.
+
+        Returns
+        -------
+            None
+        """
+        self.__waveforms[pin] = waveform
+
+    # rozhrani backendu
+    def gpio_setup(self, pin: str, direction: int):
+        self.directions[pin] = direction
+        if direction == GPIO_IN:
+            self.inputs.setdefault(pin, False)
+        else:
+            self.outputs.setdefault(pin, False)
+
+    def gpio_output(self, pin: str, level: bool):
+        self.__wait(self.latencies['gpio'])
+        self.outputs[pin] = bool(level)
+
+    def gpio_input(self, pin: str) -> bool:
+        self.__wait(self.latencies['gpio'])
+        return self.inputs.get(pin, False)
+
+    def gpio_add_event_detect(self, pin: str, callback, edge: int = GPIO_RISING):
+        with self.__lock:
+            self.__callbacks[pin] = (callback, edge)
+
+    def gpio_cleanup(self):
+        with self.__lock:
+            self.__callbacks = {}
+
+    def spi_open(self, bus: int, device: int, speed: int, mode: int, bits: int):
+        self.spi_settings = (bus, device, speed, mode, bits)
+
+    def spi_write(self, data: list):
+        self.__wait(self.latencies['spi'])
+        self.spi_last = list(data)
+        self.spi_frames = self.spi_frames + 1
+
+    def spi_close(self):
+        self.spi_settings = None
+
+    def adc_setup(self):
+        pass
+
+    def adc_read(self, pin: str) -> float:
+        self.__wait(self.latencies['adc'])
+        value = self.__waveforms.get(pin, self.__default_waveform)(time.monotonic() - self.__start)
+        return min(max(value, 0.0), 1.0)
+
+    def pwm_write(self, channel: str, attribute: str, value: str):
+        self.__wait(self.latencies['pwm'])
+        self.pwm[channel + attribute] = value
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Backend znakového zařízení GPIO
+# ----------------------------------------------------------------------------------------------------------------------
+class LineRequest:
+    """
+    Požadavek na linky jednoho čipu GPIO, tj. deskriptor vrácený jádrem voláním GPIO_V2_GET_LINE_IOCTL. Bit hodnot
+    odpovídá pořadí linky v požadavku.
+    """
+
+    def __init__(self, fd: int, offsets: list):
+        """
+        Převzetí deskriptoru požadavku.
+
+        Parameters
+        ----------
+        fd : int
+            deskriptor požadavku,
+        offsets : list
+            čísla linek čipu v pořadí požadavku.
+        """
+        self.fd = fd
+        self.offsets = list(offsets)
+        self.mask = (1 << len(self.offsets)) - 1
+
+    @classmethod
+    def open(cls, chip: str, offsets: list, flags: int, values: int = 0):
+        """
+        Vyžádání linek čipu se společným nastavením.
+
+        Parameters
+        ----------
+        chip : str
+            cesta ke znakovému zařízení čipu, např. '/dev/gpiochip2',
+        offsets : list
+            čísla linek čipu, nejvýše GPIO_V2_LINES_MAX,
+        flags : int
+            příznaky GPIO_V2_LINE_FLAG_* všech linek,
+        values : int
+            počáteční hodnoty výstupních linek, bit podle pořadí linky.
+
+        Returns
+        -------
+        request : LineRequest
+            požadavek na linky.
+        """
+        import fcntl
+        attrs = [0] * 30
+        num_attrs = 0
+        if flags & GPIO_V2_LINE_FLAG_OUTPUT:
+            attrs[0:3] = [GPIO_V2_LINE_ATTR_ID_OUTPUT_VALUES, values, (1 << len(offsets)) - 1]
+            num_attrs = 1
+        buffer = bytearray(GPIO_V2_LINE_REQUEST.pack(
+            *(list(offsets) + [0] * (GPIO_V2_LINES_MAX - len(offsets))), GPIO_CONSUMER, flags, num_attrs, *attrs,
+            len(offsets), 0, 0))
+        chip_fd = os.open(chip, os.O_RDWR | os.O_CLOEXEC)
+        try:
+            fcntl.ioctl(chip_fd, GPIO_V2_GET_LINE_IOCTL, buffer, True)
+        finally:
+            os.close(chip_fd)
+        return cls(GPIO_V2_LINE_REQUEST.unpack(buffer)[-1], offsets)
+
+    def get_values(self) -> int:
+        """
+        Čtení hodnot všech linek požadavku jedním voláním.
+
+        Returns
+        -------
+        bits : int
+            hodnoty linek, bit podle pořadí linky.
+        """
+        import fcntl
+        buffer = bytearray(GPIO_V2_LINE_VALUES.pack(0, self.mask))
+        fcntl.ioctl(self.fd, GPIO_V2_LINE_GET_VALUES_IOCTL, buffer, True)
+        return GPIO_V2_LINE_VALUES.unpack(buffer)[0]
+
+    def set_values(self, bits: int, mask: int):
+        """
+        Zápis hodnot vybraných výstupních linek požadavku.
+
+        Parameters
+        ----------
+        bits : int
+            hodnoty linek, bit podle pořadí linky,
+        mask : int
+            maska zapisovaných linek.
+
+        Returns
+        -------
+            None
+        """
+        import fcntl
+        fcntl.ioctl(self.fd, GPIO_V2_LINE_SET_VALUES_IOCTL, bytearray(GPIO_V2_LINE_VALUES.pack(bits, mask)))
+
+    def read_events(self) -> list:
+        """
+        Přečtení čekajících událostí hran, volá se po ohlášení připravenosti deskriptoru.
+
+        Returns
+        -------
+        events : list
+            [(číslo linky, True pro náběžnou hranu, čas hrany CLOCK_MONOTONIC v sekundách)].
+        """
+        data = os.read(self.fd, GPIO_V2_LINE_EVENT.size * GPIO_EVENT_BATCH)
+        events = []
+        for timestamp_ns, event_id, offset, _, _ in GPIO_V2_LINE_EVENT.iter_unpack(data):
+            events.append((offset, event_id == GPIO_V2_LINE_EVENT_RISING_EDGE, timestamp_ns / 1e9))
+        return events
+
+    def close(self):
+        """
+        Uvolnění linek požadavku.
+
+        Returns
+        -------
+            None
+        """
+        os.close(self.fd)
+
+
+class PipeLineRequest(LineRequest):
+    """
+    Náhrada požadavku na linky pro test bez jádra: hodnoty linek jsou v paměti, události hran se zapisují funkcí
+    inject do roury ve formátu jádra a backend je čte stejně jako z deskriptoru požadavku.
+    """
+
+    def __init__(self, offsets: list):
+        self.__pipe = os.pipe()
+        super().__init__(self.__pipe[0], offsets)
+        self.bits = 0
+        self.reads = 0
+
+    def get_values(self) -> int:
+        self.reads = self.reads + 1
+        return self.bits
+
+    def set_values(self, bits: int, mask: int):
+        self.bits = (self.bits & ~mask) | (bits & mask)
+
+    def inject(self, offset: int, rising: bool, timestamp: float):
+        """
+        Zápis hrany linky: změna hodnoty a událost s časem timestamp v sekundách.
+        """
+        bit = 1 << self.offsets.index(offset)
+        self.bits = self.bits | bit if rising else self.bits & ~bit
+        os.write(self.__pipe[1], GPIO_V2_LINE_EVENT.pack(round(timestamp * 1e9), 1 if rising else 2, offset, 0, 0))
+
+    def close(self):
+        super().close()
+        os.close(self.__pipe[1])
+
+
+class GpioCdevBackend(Backend):
+    """
+    GPIO přes znakové zařízení GPIO v2 jádra linux, SPI, ADC a PWM přes základní backend. Vstupy jednoho čipu tvoří
+    jeden požadavek s detekcí obou hran: úrovně všech vstupů čipu se čtou jedním voláním ioctl, hrany se přijímají
+    s časem jádra v jednom vlákně přes epoll. Čas CLOCK_MONOTONIC jádra odpovídá time.monotonic(). Každý výstup je
+    samostatný požadavek. Požadavky vstupů se vytvoří až při prvním čtení nebo přihlášení hrany, tj. po nastavení
+    všech vstupů.
+    """
+    name = 'gpiocdev'
+
+    def __init__(self, base: Backend = None, lines: dict = None):
+        """
+        Založení backendu.
+
+        Parameters
+        ----------
+        base : Backend
+            backend pro SPI, ADC a PWM, v základu AdafruitBackend(),
+        lines : dict
+            {pin: (cesta k čipu nebo číslo čipu, linka)}, v základu BEAGLEBONE_GPIO_LINES, např. pro čipy modulu
+            jádra gpio-sim.
+        """
+        self.__base = base if base is not None else AdafruitBackend()
+        self.__lines = {}
+        for pin, (chip, offset) in (lines or BEAGLEBONE_GPIO_LINES).items():
+            self.__lines[pin] = (GPIO_CHIP_PATH.format(chip) if isinstance(chip, int) else chip, offset)
+        self.__lock = threading.Lock()
+        self.__inputs = []
+        self.__inputs_changed = True
+        self.__input_requests = {}
+        self.__input_positions = {}
+        self.__event_pins = {}
+        self.__callbacks = {}
+        self.__outputs = {}
+        self.__epoll = None
+        self.__wakeup = None
+        self.__thread = None
+
+    def _open_request(self, chip: str, offsets: list, flags: int, values: int = 0) -> LineRequest:
+        """
+        Vyžádání linek čipu, v testu lze nahradit požadavkem nad jiným deskriptorem.
+        """
+        return LineRequest.open(chip, offsets, flags, values)
+
+    def __get_requests(self) -> dict:
+        """
+        Získání požadavků vstupů, při prvním volání po nastavení vstupu se požadavky vytvoří znovu a zaregistrují do
+        vlákna hran.
+
+        Returns
+        -------
+        requests : dict
+            {cesta k čipu: LineRequest}.
+        """
+        with self.__lock:
+            if not self.__inputs_changed:
+                return self.__input_requests
+            self.__inputs_changed = False
+            self.__release_inputs()
+
+            chips = {}
+            for pin in self.__inputs:
+                chip, offset = self.__lines[pin]
+                chips.setdefault(chip, []).append((offset, pin))
+            for chip, items in chips.items():
+                request = self._open_request(chip, [offset for offset, _ in items], GPIO_V2_LINE_FLAG_INPUT |
+                                             GPIO_V2_LINE_FLAG_EDGE_RISING | GPIO_V2_LINE_FLAG_EDGE_FALLING)
+                self.__input_requests[chip] = request
+                for position, (offset, pin) in enumerate(items):
+                    self.__input_positions[pin] = (request, position)
+                    self.__event_pins[(request.fd, offset)] = pin
+
+            if self.__thread is None:
+                self.__epoll = select.epoll()
+                self.__wakeup = os.pipe()
+                self.__epoll.register(self.__wakeup[0], select.EPOLLIN)
+                self.__thread = threading.Thread(target=self.__threadfun, daemon=True, name='peg_gpio_events')
+                self.__thread.start()
+            for request in self.__input_requests.values():
+                self.__epoll.register(request.fd, select.EPOLLIN)
+            return self.__input_requests
+
+    def __release_inputs(self):
+        """
+        Uvolnění požadavků vstupů, volá se pod zámkem.
+        """
+        for request in self.__input_requests.values():
+            if self.__epoll is not None:
+                self.__epoll.unregister(request.fd)
+            request.close()
+        self.__input_requests = {}
+        self.__input_positions = {}
+        self.__event_pins = {}
+
+    def __threadfun(self):
+        """
+        Vlákno hran: čeká na události všech požadavků vstupů a volá přihlášené funkce s časem hrany jádra.
+
+        Returns
+        -------
+            None
+        """
+        while True:
+            for fd, _ in self.__epoll.poll():
+                if fd == self.__wakeup[0]:
+                    return
+                with self.__lock:
+                    requests = [request for request in self.__input_requests.values() if request.fd == fd]
+                    event_pins = self.__event_pins
+                for request in requests:
+                    try:
+                        events = request.read_events()
+                    except OSError:
+                        continue
+                    for offset, rising, timestamp in events:
+                        pin = event_pins.get((fd, offset))
+                        callback, edge = self.__callbacks.get(pin, (None, 0))
+                        if callback is not None and edge & (GPIO_RISING if rising else GPIO_FALLING):
+                            callback(pin, rising, timestamp)
+
+    # rozhrani backendu
+    def gpio_setup(self, pin: str, direction: int):
+        chip, offset = self.__lines[pin]
+        if direction == GPIO_IN:
+            with self.__lock:
+                if pin not in self.__inputs:
+                    self.__inputs.append(pin)
+                    self.__inputs_changed = True
+        elif pin not in self.__outputs:
+            self.__outputs[pin] = self._open_request(chip, [offset], GPIO_V2_LINE_FLAG_OUTPUT)
+
+    def gpio_output(self, pin: str, level: bool):
+        self.__outputs[pin].set_values(1 if level else 0, 1)
+
+    def gpio_input(self, pin: str) -> bool:
+        return self.gpio_inputs([pin])[0]
+
+    def gpio_inputs(self, pins: list) -> list:
+        self.__get_requests()
+        positions = self.__input_positions
+        values = {}
+        result = []
+        for pin in pins:
+            request, position = positions[pin]
+            if request not in values:
+                values[request] = request.get_values()
+            result.append(bool(values[request] >> position & 1))
+        return result
+
+    def gpio_add_event_detect(self, pin: str, callback, edge: int = GPIO_RISING):
+        self.__callbacks[pin] = (callback, edge)
+        self.__get_requests()
+
+    def gpio_cleanup(self):
+        with self.__lock:
+            self.__release_inputs()
+            self.__callbacks = {}
+            if self.__thread is not None:
+                os.write(self.__wakeup[1], b'\x00')
+        if self.__thread is not None:
+            self.__thread.join(timeout=1.0)
+            self.__epoll.close()
+            for fd in self.__wakeup:
+                os.close(fd)
+            self.__thread = None
+        for request in self.__outputs.values():
+            request.close()
+        self.__outputs = {}
+
+    def spi_open(self, bus: int, device: int, speed: int, mode: int, bits: int):
+        self.__base.spi_open(bus, device, speed, mode, bits)
+
+    def spi_write(self, data: list):
+        self.__base.spi_write(data)
+
+    def spi_close(self):
+        self.__base.spi_close()
+
+    def adc_setup(self):
+        self.__base.adc_setup()
+
+    def adc_read(self, pin: str) -> float:
+        return self.__base.adc_read(pin)
+
+    def pwm_write(self, channel: str, attribute: str, value: str):
+        self.__base.pwm_write(channel, attribute, value)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Volba backendu
+# ----------------------------------------------------------------------------------------------------------------------
+BACKENDS = {
+    'adafruit': AdafruitBackend,
+    'gpiocdev': GpioCdevBackend,
+    'simulator': SimulatedBackend,
+}
+
+_backend = None
+
+
+def get_backend() -> Backend:
+    """
+    Získání společného backendu programu podle položky RUNTIME['hal'], backend se vytvoří při prvním volání.
+
+    Returns
+    -------
+    backend : Backend
+        backend periferií.
+    """
+    global _backend
+    if _backend is None:
+        name = RUNTIME.get('hal', 'adafruit')
+        if name not in BACKENDS:
+            peg_msg.errormsg("Neznamy backend periferii {0}, pouzije se adafruit".format(name))
+            name = 'adafruit'
+        _backend = BACKENDS[name]()
+        peg_msg.validmsg("Backend periferii: {0}".format(name))
+    return _backend
+
+
+def set_backend(backend: Backend):
+    """
+    Nastavení společného backendu programu, např. simulátoru s vlastními dobami operací v testu.
+
+    Parameters
+    ----------
+    backend : Backend
+        backend periferií.
+
+    Returns
+    -------
+        None
+    """
+    global _backend
+    _backend = backend
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Test modulu
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    peg_msg.infomsg("Test simulatoru periferii")
+    peg_msg.infomsg("=========================")
+
+    dbg_sim = SimulatedBackend(latencies={'adc': 0.001})
+    dbg_edges = []
+    dbg_sim.gpio_setup('P8_41', GPIO_IN)
+    dbg_sim.gpio_add_event_detect('P8_41', lambda pin, level, timestamp: dbg_edges.append(level))
+    dbg_sim.inject_edges('P8_41', 5)
+    dbg_sim.set_input('P8_41', True)
+    if len(dbg_edges) == 6 and dbg_sim.gpio_input('P8_41'):
+        peg_msg.validmsg("Hrany vstupu: {0}".format(len(dbg_edges)))
+    else:
+        peg_msg.errormsg("Chybny pocet hran vstupu: {0}".format(len(dbg_edges)))
+
+    dbg_sim.set_waveform('P9_40', square(0.25, 0.75, period=0.02))
+    dbg_start = time.monotonic()
+    dbg_values = {dbg_sim.adc_read('P9_40') for _ in range(40)}
+    dbg_elapsed = time.monotonic() - dbg_start
+    if dbg_values == {0.25, 0.75} and dbg_elapsed >= 0.04:
+        peg_msg.validmsg("Prubeh ADC {0} za {1:.3f} s".format(sorted(dbg_values), dbg_elapsed))
+    else:
+        peg_msg.errormsg("Chybny prubeh ADC {0} za {1:.3f} s".format(sorted(dbg_values), dbg_elapsed))
+
+    peg_msg.infomsg("Test backendu znakoveho zarizeni GPIO nad rourou")
+    peg_msg.infomsg("================================================")
+
+    dbg_requests = []
+    dbg_cdev = GpioCdevBackend(base=SimulatedBackend(), lines={'P8_41': ('chipA', 10), 'P8_42': ('chipA', 11),
+                                                               'P8_43': ('chipB', 8), 'P9_15': ('chipB', 16)})
+    dbg_cdev._open_request = lambda chip, offsets, flags, values=0: dbg_requests.append(
+        PipeLineRequest(offsets)) or dbg_requests[-1]
+    for dbg_pin in ('P8_41', 'P8_42', 'P8_43'):
+        dbg_cdev.gpio_setup(dbg_pin, GPIO_IN)
+    dbg_cdev.gpio_setup('P9_15', GPIO_OUT)
+    dbg_cdev.gpio_output('P9_15', True)
+    dbg_cdev.gpio_input('P8_41')
+    dbg_requests[1].bits = 0b10
+    dbg_requests[1].reads = 0
+    dbg_levels = dbg_cdev.gpio_inputs(['P8_41', 'P8_42', 'P8_43'])
+    if dbg_levels == [False, True, False] and [request.reads for request in dbg_requests[1:]] == [1, 1] \
+            and dbg_requests[0].bits == 1:
+        peg_msg.validmsg("Hromadne cteni vstupu: {0}, 1 volani na cip".format(dbg_levels))
+    else:
+        peg_msg.errormsg("Chybne hromadne cteni vstupu: {0}".format(dbg_levels))
+
+    dbg_edges = []
+    dbg_done = threading.Event()
+    for dbg_pin in ('P8_41', 'P8_43'):
+        dbg_cdev.gpio_add_event_detect(dbg_pin, lambda pin, level, timestamp: (
+            dbg_edges.append((pin, level, timestamp)), len(dbg_edges) == 3 and dbg_done.set()), GPIO_BOTH)
+    dbg_requests[1].inject(10, True, 100.25)
+    dbg_requests[1].inject(11, True, 100.5)
+    dbg_requests[1].inject(10, False, 100.75)
+    dbg_requests[2].inject(8, True, 101.0)
+    dbg_done.wait(1.0)
+    if sorted(dbg_edges) == [('P8_41', False, 100.75), ('P8_41', True, 100.25), ('P8_43', True, 101.0)]:
+        peg_msg.validmsg("Hrany s casem jadra: {0}".format(dbg_edges))
+    else:
+        peg_msg.errormsg("Chybne hrany: {0}".format(dbg_edges))
+    dbg_cdev.gpio_cleanup()
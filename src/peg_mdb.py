@@ -16,6 +16,9 @@ from pymodbus.datastore import ModbusServerContext
 # casovani debugu
 import time
 
+# zkouska pripravenosti serveru
+import socket
+
 # hlaseni na konzoli
 try:
     import peg_msg
@@ -50,6 +53,13 @@ except ImportError:
     # modbus verze <= 2.5.3
     ServerStop = lambda: peg_msg.errormsg("Funkce 'kill' neni definovana pro modbus knihovnu 'pymodbus' verze <= 2.5.3")
 
+# asynchronni server pro beh ve smycce asyncio
+try:
+    from pymodbus.server import ModbusTcpServer
+except ImportError:
+    # modbus verze <= 2.5.3
+    ModbusTcpServer = None
+
 # ----------------------------------------------------------------------------------------------------------------------
 # Konstanty modulu
 # ----------------------------------------------------------------------------------------------------------------------
@@ -59,6 +69,9 @@ DEFAULT_IP = "127.0.0.1"
 # komunikacni port
 DEFAULT_PORT = 502
 
+# dotaz zkousky pripravenosti: cteni jednoho vstupniho registru od adresy 0, transakce 1, jednotka 1
+READY_REQUEST = bytes([0x00, 0x01, 0x00, 0x00, 0x00, 0x06, 0x01, 0x04, 0x00, 0x00, 0x00, 0x01])
+
 # ----------------------------------------------------------------------------------------------------------------------
 # Hlavní třída modulu
 # ----------------------------------------------------------------------------------------------------------------------
@@ -112,6 +125,51 @@ class ModbusServer(BasicServer):
             else:
                 peg_msg.errormsg("Vlakno modbus serveru neocekavane ukoncilo cinnost")
 
+    async def serve_async(self):
+        """
+        Běh asynchronního modbus serveru jako úlohy smyčky asyncio místo vlastního vlákna. Server se ukončí zrušením
+        úlohy.
+
+        Returns
+        -------
+            None
+        """
+        if ModbusTcpServer is None:
+            peg_msg.errormsg("Asynchronni modbus server neni dostupny pro modbus knihovnu 'pymodbus' verze <= 2.5.3")
+            return
+
+        peg_msg.validmsg("Start asynchronniho modbus serveru.")
+        server = ModbusTcpServer(context=self.__context,
+                                 identity=self.__identity,
+                                 address=self.__ipaddr)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.shutdown()
+
+    def _probe(self, host: str, port: int) -> bool:
+        """
+        Zkouska pripravenosti modbus serveru: server musi odpovedet na cteni jednoho vstupniho registru.
+
+        Parameters
+        ----------
+        host : str
+            ip adresa serveru,
+        port : int
+            port serveru.
+
+        Returns
+        -------
+            True pokud server odpovida, jinak False.
+        """
+        try:
+            with socket.create_connection((host, port), timeout=1.0) as connection:
+                connection.sendall(READY_REQUEST)
+                # hlavicka MBAP a kod funkce
+                return len(connection.recv(260)) >= 8
+        except OSError:
+            return False
+
     def get_address(self) -> str:
         """
         Funkce vrati retezec obsahujici ip adresu serveru ve formatu <ip>:<port>.
@@ -0,0 +1,167 @@
+""" OUTPUTS Zápis výstupů pouze při změně
+
+    Modul nabízí mezivrstvu mezi datovým prostorem modbusu a ovladači výstupů (Aio, Dio). Požadovaná hodnota se
+    ovladači předá jen tehdy, pokud se liší od naposledy zapsané hodnoty. Pro jistotu se všechny výstupy jednou za
+    periodu obnovy zapíší znovu, i když se nezměnily. Počítadla zápisů, přeskočených zápisů a obnov slouží pro
+    diagnostiku.
+"""
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Import knihoven
+# ----------------------------------------------------------------------------------------------------------------------
+# monotonni casovani obnovy
+import time
+
+# zapis z vice vlaken
+import threading
+
+# hlaseni na konzoli
+try:
+    import peg_msg
+except ImportError:
+    from src import peg_msg
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Konstanty modulu
+# ----------------------------------------------------------------------------------------------------------------------
+# zakladni perioda obnovy vsech vystupu v sekundach
+DEFAULT_REFRESH_PERIOD = 10.0
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Hlavní třída modulu
+# ----------------------------------------------------------------------------------------------------------------------
+class OutputCache:
+    """
+    Zápis výstupů ovladače pouze při změně požadované hodnoty s periodickou obnovou. Funkce lze volat z více vláken.
+    """
+
+    def __init__(self, write, refresh_period: float = DEFAULT_REFRESH_PERIOD):
+        """
+        Založení prázdné mezivrstvy, první požadavek na každý výstup se vždy zapíše.
+
+        Parameters
+        ----------
+        write : callable
+            funkce zápisu ovladače write(name, value), např. Aio.set_output nebo Dio.set_output,
+        refresh_period : float
+            perioda obnovy všech výstupů v sekundách, hodnota 0 obnovu vypíná.
+        """
+        self.__write = write
+        self.__lock = threading.Lock()
+        self.__committed = {}
+        self.__refresh_period = refresh_period
+        self.__refresh_deadline = time.monotonic() + refresh_period
+        self.writes = 0
+        self.skipped = 0
+        self.refreshes = 0
+
+    def set(self, name: str, value) -> bool:
+        """
+        Požadavek na hodnotu výstupu. Ovladač se volá jen při změně proti naposledy zapsané hodnotě.
+
+        Parameters
+        ----------
+        name : str
+            název výstupu,
+        value :
+            požadovaná hodnota.
+
+        Returns
+        -------
+        written : bool
+            True, pokud byla hodnota zapsána ovladači.
+        """
+        with self.__lock:
+            if self.__committed.get(name, self) == value:
+                self.skipped = self.skipped + 1
+                return False
+            self.__write(name, value)
+            self.__committed[name] = value
+            self.writes = self.writes + 1
+            return True
+
+    def poll(self, now: float = None) -> bool:
+        """
+        Kontrola termínu obnovy. Po jeho uplynutí se zapomenou zapsané hodnoty, takže další požadavek na každý výstup
+        se zapíše znovu. Funkci stačí volat jednou za průchod stupněm výkonné funkce.
+
+        Parameters
+        ----------
+        now : float
+            aktuální čas podle time.monotonic(), v základu se zjistí.
+
+        Returns
+        -------
+        refresh : bool
+            True, pokud nastal termín obnovy.
+        """
+        if self.__refresh_period <= 0:
+            return False
+        if now is None:
+            now = time.monotonic()
+        with self.__lock:
+            if now < self.__refresh_deadline:
+                return False
+            self.__refresh_deadline = now + self.__refresh_period
+            self.__committed = {}
+            self.refreshes = self.refreshes + 1
+            return True
+
+    def invalidate(self, name: str = None):
+        """
+        Zapomenutí zapsané hodnoty jednoho nebo všech výstupů, např. po restartu ovladače.
+
+        Parameters
+        ----------
+        name : str
+            název výstupu, v základu všechny výstupy.
+
+        Returns
+        -------
+            None
+        """
+        with self.__lock:
+            if name is None:
+                self.__committed = {}
+            else:
+                self.__committed.pop(name, None)
+
+    def get_stats(self) -> dict:
+        """
+        Získání počítadel.
+
+        Returns
+        -------
+        stats : dict
+            {'writes', 'skipped', 'refreshes'}.
+        """
+        return {'writes': self.writes, 'skipped': self.skipped, 'refreshes': self.refreshes}
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Test modulu
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    peg_msg.infomsg("Test zapisu vystupu pri zmene")
+    peg_msg.infomsg("=============================")
+
+    dbg_written = []
+    dbg_cache = OutputCache(lambda name, value: dbg_written.append((name, value)), refresh_period=0.05)
+    for dbg_step in range(100):
+        dbg_cache.set('CP1', 100)
+        dbg_cache.set('CP2', 5 if dbg_step < 50 else 53)
+    if dbg_written == [('CP1', 100), ('CP2', 5), ('CP2', 53)] and dbg_cache.skipped == 197:
+        peg_msg.validmsg("Zapsany pouze zmeny: {0}".format(dbg_cache.get_stats()))
+    else:
+        peg_msg.errormsg("Chybne zapisy {0}: {1}".format(dbg_written, dbg_cache.get_stats()))
+
+    time.sleep(0.06)
+    dbg_cache.poll()
+    dbg_cache.set('CP1', 100)
+    dbg_cache.set('CP2', 53)
+    if dbg_written[-2:] == [('CP1', 100), ('CP2', 53)] and dbg_cache.refreshes == 1:
+        peg_msg.validmsg("Obnova po uplynuti periody: {0}".format(dbg_cache.get_stats()))
+    else:
+        peg_msg.errormsg("Chybna obnova {0}: {1}".format(dbg_written, dbg_cache.get_stats()))
@@ -0,0 +1,369 @@
+""" PROCESS Servery v odděleném procesu
+
+    Modul nabízí spuštění modbus a web serveru v samostatném procesu. Datový prostor modbusu je před vznikem procesu
+    přesunut do sdílené paměti (DataStore.share), proces serverů jej zdědí forkem. Obsluha požadavků sítě (pymodbus,
+    Flask, serializace json) tak nedrží GIL procesu hlavní smyčky a zátěž sítě neovlivňuje časování výkonné funkce.
+
+    Součástí je měření rozptylu (jitter) periodického kroku hlavní smyčky při síťové zátěži pro servery ve vláknech
+    a servery v odděleném procesu.
+"""
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Import knihoven
+# ----------------------------------------------------------------------------------------------------------------------
+# proces serveru
+import multiprocessing
+import os
+
+# casovani kontroly serveru a mereni rozptylu kroku
+import time
+
+# zatez web serveru pri mereni
+import urllib.request
+
+# zatez modbus serveru pri mereni
+import threading
+
+# hlaseni na konzoli
+try:
+    import peg_msg
+except ImportError:
+    from src import peg_msg
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Konstanty modulu
+# ----------------------------------------------------------------------------------------------------------------------
+# perioda kontroly serveru a zivota rodice v procesu serveru v sekundach
+SUPERVISION_PERIOD = 0.5
+
+# pocet kontrol po sobe, po kterych se server v procesu restartuje
+SUPERVISION_LIMIT = 10
+
+# doba cekani na ukonceni procesu serveru v sekundach
+KILL_TIMEOUT = 5.0
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Hlavní třída modulu
+# ----------------------------------------------------------------------------------------------------------------------
+class ServerProcess:
+    """
+    Třída pro řízení procesu se servery. Rozhraní odpovídá serverům ve vlákně (restart, is_alive, kill), hlavní
+    program tak proces hlídá stejně jako servery.
+    """
+
+    def __init__(self, servers: list):
+        """
+        Založení řízení procesu, proces se spouští funkcí restart().
+
+        Parameters
+        ----------
+        servers : list
+            servery odvozené od BasicServer, které se v procesu spustí, např. [ModbusServer, WebServer].
+        """
+        self.__servers = list(servers)
+        self.__context = multiprocessing.get_context('fork')
+        self.__process = None
+
+    def __del__(self):
+        """
+        Ukončení procesu serverů.
+        """
+        self.kill()
+
+    def restart(self):
+        """
+        Nové spuštění procesu serverů. Proces vzniká forkem, proto se má poprvé spustit dříve, než hlavní program
+        založí další vlákna.
+
+        Returns
+        -------
+            None
+        """
+        if self.is_alive():
+            self.kill()
+        self.__process = self.__context.Process(target=self.__processfun, args=(os.getpid(),), daemon=True,
+                                                name='peg_servers')
+        self.__process.start()
+
+    def is_alive(self) -> bool:
+        """
+        Informace, zda proces serverů běží.
+
+        Returns
+        -------
+            True pokud proces běží, jinak False.
+        """
+        return self.__process is not None and self.__process.is_alive()
+
+    def kill(self):
+        """
+        Ukončení procesu serverů.
+
+        Returns
+        -------
+            None
+        """
+        if self.is_alive():
+            self.__process.terminate()
+            self.__process.join(timeout=KILL_TIMEOUT)
+
+    def wait_ready(self, timeout: float = 10.0) -> bool:
+        """
+        Čekání na připravenost všech serverů procesu, zkouška probíhá z rodičovského procesu přes síť.
+
+        Parameters
+        ----------
+        timeout : float
+            nejdelší doba čekání v sekundách.
+
+        Returns
+        -------
+            True pokud jsou všechny servery připraveny, jinak False.
+        """
+        deadline = time.monotonic() + timeout
+        for server in self.__servers:
+            if not server.wait_ready(max(deadline - time.monotonic(), 0.0), alive=self.is_alive):
+                return False
+        return True
+
+    def get_pid(self) -> int:
+        """
+        Získání čísla procesu serverů.
+
+        Returns
+        -------
+        pid : int
+            číslo procesu nebo None, pokud proces neběží.
+        """
+        return self.__process.pid if self.is_alive() else None
+
+    def __processfun(self, parent: int):
+        """
+        Hlavní funkce procesu serverů: spustí servery ve vláknech procesu, hlídá jejich běh a skončí se zánikem
+        rodičovského procesu.
+
+        Parameters
+        ----------
+        parent : int
+            číslo rodičovského procesu.
+
+        Returns
+        -------
+            None
+        """
+        peg_msg.validmsg("Start procesu serveru, pid {0}".format(os.getpid()))
+        errcnt = [0] * len(self.__servers)
+        try:
+            for server in self.__servers:
+                server.restart()
+            while os.getppid() == parent:
+                time.sleep(SUPERVISION_PERIOD)
+                for num, server in enumerate(self.__servers):
+                    if server.is_alive():
+                        errcnt[num] = 0
+                    elif errcnt[num] < SUPERVISION_LIMIT:
+                        errcnt[num] = errcnt[num] + 1
+                    else:
+                        peg_msg.warningmsg("Restart serveru {0} v procesu serveru".format(type(server).__name__))
+                        server.restart()
+                        errcnt[num] = 0
+        except KeyboardInterrupt:
+            pass
+        finally:
+            peg_msg.validmsg("Proces serveru ukoncen, pid {0}".format(os.getpid()))
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Měření rozptylu kroku hlavní smyčky
+# ----------------------------------------------------------------------------------------------------------------------
+def _load(web_port: int, modbus_port: int, duration: float, clients: int):
+    """
+    Síťová zátěž pro měření: souběžné čtení all.json z web serveru a vstupních registrů z modbus serveru.
+
+    Parameters
+    ----------
+    web_port : int
+        port web serveru,
+    modbus_port : int
+        port modbus serveru,
+    duration : float
+        doba zátěže v sekundách,
+    clients : int
+        počet souběžných klientů každého serveru.
+
+    Returns
+    -------
+        None
+    """
+    try:
+        from pymodbus.client import ModbusTcpClient
+    except ImportError:
+        from pymodbus.client.sync import ModbusTcpClient
+
+    stop = time.monotonic() + duration
+
+    def web_client():
+        while time.monotonic() < stop:
+            try:
+                urllib.request.urlopen('http://127.0.0.1:{0}/all.json'.format(web_port), timeout=2).read()
+            except OSError:
+                time.sleep(0.01)
+
+    def modbus_client():
+        client = ModbusTcpClient('127.0.0.1', port=modbus_port)
+        client.connect()
+        while time.monotonic() < stop:
+            try:
+                client.read_input_registers(0, 40)
+                client.read_coils(0, 32)
+            except Exception:
+                time.sleep(0.01)
+        client.close()
+
+    threads = [threading.Thread(target=web_client) for _ in range(clients)]
+    threads += [threading.Thread(target=modbus_client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def _measure(datastore, period: float, duration: float) -> dict:
+    """
+    Periodický krok s absolutními termíny, který jako stupeň digitálních IO čte povely a zapisuje stavy datového
+    prostoru. Měří se zpoždění probuzení proti termínu a doba kroku.
+
+    Parameters
+    ----------
+    datastore : DataStore
+        datový prostor,
+    period : float
+        perioda kroku v sekundách,
+    duration : float
+        doba měření v sekundách.
+
+    Returns
+    -------
+    result : dict
+        {'ticks', 'late_p50', 'late_p99', 'late_max', 'step_p99'}, doby v µs.
+    """
+    try:
+        from peg_das import FC_CO, FC_DI, FC_IR
+    except ImportError:
+        from src.peg_das import FC_CO, FC_DI, FC_IR
+
+    commands = datastore.get_group([(FC_CO, 'POWER_SW1'), (FC_CO, 'POWER_SW2'), (FC_CO, 'LED_RED1')])
+    states = datastore.get_group([(FC_DI, 'POWER_SW1'), (FC_DI, 'POWER_SW2'), (FC_IR, 'COUNTER'),
+                                  (FC_IR, 'CP_VOLTAGE1')])
+    late = []
+    steps = []
+    deadline = time.monotonic() + period
+    stop = deadline + duration
+    tick = 0
+    while deadline < stop:
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        start = time.monotonic()
+        late.append(start - deadline)
+        values = commands.read()
+        tick = tick + 1
+        states.write([values[0], values[1], tick & 0xFFFF, tick % 1000])
+        steps.append(time.monotonic() - start)
+        deadline = deadline + period
+
+    late.sort()
+    steps.sort()
+    return {
+        'ticks': len(late),
+        'late_p50': round(late[len(late) // 2] * 1e6),
+        'late_p99': round(late[(99 * (len(late) - 1)) // 100] * 1e6),
+        'late_max': round(late[-1] * 1e6),
+        'step_p99': round(steps[(99 * (len(steps) - 1)) // 100] * 1e6),
+    }
+
+
+def benchmark_jitter(duration: float = 5.0, period: float = 0.01, clients: int = 4, web_port: int = 18080,
+                     modbus_port: int = 15020) -> dict:
+    """
+    Porovnání rozptylu kroku hlavní smyčky při síťové zátěži pro servery ve vláknech a servery v odděleném procesu.
+    Měří se nad globálním datovým prostorem programu, který se pro druhý režim přesune do sdílené paměti. Zátěž
+    generuje samostatný proces. Režim 'process' používá porty o 1 vyšší, protože web server ve vlákně nelze ukončit.
+
+    Parameters
+    ----------
+    duration : float
+        doba měření každého režimu v sekundách,
+    period : float
+        perioda kroku v sekundách,
+    clients : int
+        počet souběžných klientů každého serveru,
+    web_port : int
+        port web serveru,
+    modbus_port : int
+        port modbus serveru.
+
+    Returns
+    -------
+    result : dict
+        {'threads': výsledek, 'process': výsledek}, výsledek viz _measure.
+    """
+    try:
+        from peg_global_scope import singleton_modbus_datastore as datastore
+        from peg_mdb import ModbusServer
+        from peg_web import WebServer
+    except ImportError:
+        from src.peg_global_scope import singleton_modbus_datastore as datastore
+        from src.peg_mdb import ModbusServer
+        from src.peg_web import WebServer
+
+    context = multiprocessing.get_context('fork')
+    result = {}
+    for mode in ('threads', 'process'):
+        if mode == 'process':
+            web_port = web_port + 1
+            modbus_port = modbus_port + 1
+            datastore.share()
+        servers = [ModbusServer(datastore=datastore, host='127.0.0.1', port=modbus_port),
+                   WebServer(host='127.0.0.1', port=web_port)]
+        if mode == 'threads':
+            for server in servers:
+                server.restart()
+            for server in servers:
+                server.wait_ready()
+            process = None
+        else:
+            process = ServerProcess(servers)
+            process.restart()
+            process.wait_ready()
+
+        load = context.Process(target=_load, args=(web_port, modbus_port, duration + 1.0, clients), daemon=True)
+        load.start()
+        time.sleep(0.5)
+        result[mode] = _measure(datastore, period, duration)
+        load.join()
+
+        if process is not None:
+            process.kill()
+        else:
+            servers[0].kill()
+        peg_msg.infomsg("{0: <8} {1}".format(mode, result[mode]))
+    return result
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Test modulu
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    peg_msg.infomsg("Mereni rozptylu kroku hlavni smycky pri sitove zatezi")
+    peg_msg.infomsg("=====================================================")
+
+    dbg_result = benchmark_jitter()
+    if dbg_result['process']['late_p99'] <= dbg_result['threads']['late_p99']:
+        peg_msg.validmsg("Servery v procesu: p99 zpozdeni kroku {0} us proti {1} us ve vlaknech".format(
+            dbg_result['process']['late_p99'], dbg_result['threads']['late_p99']))
+    else:
+        peg_msg.warningmsg("Servery v procesu: p99 zpozdeni kroku {0} us proti {1} us ve vlaknech".format(
+            dbg_result['process']['late_p99'], dbg_result['threads']['late_p99']))
@@ -0,0 +1,754 @@
+""" RECORD Záznam a přehrání vzorků hw a zápisů do datového prostoru
+
+    Modul nabízí záznam všech vzorků čtených z hw (stavy digitálních vstupů, počítadla hran, analogové vstupy, údaje
+    elektroměrů) a všech zápisů klientů do cívek a holding registrů do kompaktního binárního souboru s časovými
+    značkami. Ukládají se pouze změny hodnot. Záznam lze později bez hw přehrát přes Execution.execute v reálném čase
+    nebo co nejrychleji, např. pro srovnávací měření výkonu mimo beaglebone.
+
+    Formát souboru:
+        - hlavička: b'PEGR', verze formátu uint16, čas začátku záznamu jako float64 (time.time()),
+        - záznamy '<QBHd': čas od začátku v µs, druh záznamu, číslo kanálu, hodnota,
+        - za záznamy REC_NAME a REC_META následuje text utf-8 o délce uvedené v hodnotě záznamu.
+
+    Záznam REC_TICK odděluje kroky hlavní smyčky. Vzorky za značkou kroku patří tomuto kroku, zápisy klientů se při
+    přehrání uplatní až po jeho vykonání.
+"""
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Import knihoven
+# ----------------------------------------------------------------------------------------------------------------------
+# binarni format zaznamu
+import struct
+
+# metadata ovladacu v zaznamu
+import json
+
+# casove znacky a mereni doby prehrani
+import time
+
+# soubezne zapisy z vlaken serveru
+import threading
+
+# otisk stavu datoveho prostoru pri prehrani
+import zlib
+
+# import pristupu k modbus datum
+try:
+    from peg_global_scope import singleton_modbus_datastore as modbus_datastore
+except (ImportError, ModuleNotFoundError):
+    from src.peg_global_scope import singleton_modbus_datastore as modbus_datastore
+
+# nazvy civek a holding registru
+try:
+    from peg_global_scope import COILS, HOLDING_REGISTERS
+except (ImportError, ModuleNotFoundError):
+    from src.peg_global_scope import COILS, HOLDING_REGISTERS
+
+# kody funkci pametovych prostoru modbus
+try:
+    from peg_das import FC_CO, FC_HR
+except (ImportError, ModuleNotFoundError):
+    from src.peg_das import FC_CO, FC_HR
+
+# vykonna funkce pro prehrani
+try:
+    from peg_exe import Execution
+except (ImportError, ModuleNotFoundError):
+    from src.peg_exe import Execution
+
+# hlaseni na konzoli
+try:
+    import peg_msg
+except ImportError:
+    from src import peg_msg
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Konstanty modulu
+# ----------------------------------------------------------------------------------------------------------------------
+# identifikace a verze formatu souboru
+RECORD_MAGIC = b'PEGR'
+RECORD_VERSION = 1
+RECORD_HEADER = struct.Struct('<4sHd')
+
+# jeden zaznam: cas v us, druh, kanal, hodnota
+RECORD_ITEM = struct.Struct('<QBHd')
+
+# velikost bufferu, po jejimz naplneni se zaznam zapise do souboru
+RECORD_BUFFER = 65536
+
+# druhy zaznamu
+REC_NAME = 0
+REC_TICK = 1
+REC_INPUT = 2
+REC_COUNTER = 3
+REC_ANALOG = 4
+REC_METER = 5
+REC_COIL = 6
+REC_HOLDING = 7
+REC_META = 8
+REC_POWER = 9
+REC_POWER_AVG = 10
+
+# vzorky hw a zapisy klientu
+SAMPLE_KINDS = (REC_INPUT, REC_COUNTER, REC_ANALOG, REC_METER, REC_POWER, REC_POWER_AVG)
+WRITE_KINDS = {REC_COIL: FC_CO, REC_HOLDING: FC_HR}
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Záznam
+# ----------------------------------------------------------------------------------------------------------------------
+class _RecordedDio:
+    """
+    Obálka ovladače digitálních vstupů a výstupů, která zaznamenává čtené stavy vstupů a počítadel hran.
+    """
+
+    def __init__(self, dio, recorder):
+        self.__dio = dio
+        self.__sample = recorder.sample
+
+    def __getattr__(self, name):
+        return getattr(self.__dio, name)
+
+    def get_input(self, name: str) -> bool:
+        value = self.__dio.get_input(name)
+        self.__sample(REC_INPUT, name, value)
+        return value
+
+    def get_input_counter(self, name: str) -> int:
+        value = self.__dio.get_input_counter(name)
+        self.__sample(REC_COUNTER, name, value)
+        return value
+
+
+class _RecordedAio:
+    """
+    Obálka ovladače analogových vstupů a výstupů, která zaznamenává čtené hodnoty vstupů.
+    """
+
+    def __init__(self, aio, recorder):
+        self.__aio = aio
+        self.__sample = recorder.sample
+
+    def __getattr__(self, name):
+        return getattr(self.__aio, name)
+
+    def get_input(self, name: str) -> float:
+        value = self.__aio.get_input(name)
+        self.__sample(REC_ANALOG, name, value)
+        return value
+
+
+class _RecordedElectrometer:
+    """
+    Obálka elektroměru, která zaznamenává čtené údaje odběru a výkonu.
+    """
+
+    def __init__(self, electrometer, recorder, name: str):
+        self.__electrometer = electrometer
+        self.__sample = recorder.sample
+        self.__name = name
+
+    def __getattr__(self, name):
+        return getattr(self.__electrometer, name)
+
+    def read(self) -> int:
+        value = self.__electrometer.read()
+        self.__sample(REC_METER, self.__name, value)
+        return value
+
+    def read_power(self) -> tuple:
+        power, average = self.__electrometer.read_power()
+        self.__sample(REC_POWER, self.__name, power)
+        self.__sample(REC_POWER_AVG, self.__name, average)
+        return power, average
+
+
+class Recorder:
+    """
+    Záznam vzorků hw a zápisů klientů do binárního souboru. Ovladače se obalí funkcemi wrap_*, zápisy klientů se
+    zaznamenávají odběrem změn cívek a holding registrů a kroky hlavní smyčky se oddělují funkcí tick().
+    """
+
+    def __init__(self, path: str, datastore=None, names: list = None):
+        """
+        Otevření souboru záznamu a zápis počátečních hodnot cívek a holding registrů.
+
+        Parameters
+        ----------
+        path : str
+            cesta k souboru záznamu, existující soubor se přepíše,
+        datastore : DataStore
+            datový prostor, v základu globální datový prostor programu,
+        names : list
+            zaznamenávané registry [(kód funkce, jméno)], v základu všechny cívky a holding registry.
+        """
+        self.__datastore = datastore if datastore is not None else modbus_datastore
+        if names is None:
+            names = [(FC_CO, key) for key in COILS] + [(FC_HR, key) for key in HOLDING_REGISTERS]
+        self.__lock = threading.Lock()
+        self.__buffer = bytearray()
+        self.__channels = {}
+        self.__last = {}
+        self.__start = time.monotonic_ns()
+        self.__file = open(path, 'wb')
+        self.__file.write(RECORD_HEADER.pack(RECORD_MAGIC, RECORD_VERSION, time.time()))
+        self.samples = 0
+        self.writes = 0
+        self.ticks = 0
+
+        # pocatecni stav, aby bylo prehrani nezavisle na obsahu datoveho prostoru
+        kinds = {FC_CO: REC_COIL, FC_HR: REC_HOLDING}
+        for fc, key in names:
+            self.sample(kinds[fc], key, self.__datastore.get_handle(fc, key).get())
+        self.__subscription = self.__datastore.subscribe(names, self.__on_write)
+        peg_msg.validmsg("Zaznam vzorku hw do souboru {0}".format(path))
+
+    def __del__(self):
+        """
+        Uzavření souboru záznamu.
+        """
+        self.close()
+
+    def __on_write(self, fc: int, name: str, value):
+        """
+        Odběr změn cívek a holding registrů.
+        """
+        self.sample(REC_COIL if fc == FC_CO else REC_HOLDING, name, value)
+
+    def __append(self, kind: int, channel: int, value: float, text: bytes = b''):
+        """
+        Přidání záznamu do bufferu, volá se pod zámkem.
+        """
+        self.__buffer += RECORD_ITEM.pack((time.monotonic_ns() - self.__start) // 1000, kind, channel, value)
+        self.__buffer += text
+        if len(self.__buffer) >= RECORD_BUFFER:
+            self.__file.write(self.__buffer)
+            self.__buffer = bytearray()
+
+    def sample(self, kind: int, name: str, value):
+        """
+        Záznam jednoho vzorku nebo zápisu. Zaznamená se pouze změna proti minulé hodnotě kanálu.
+
+        Parameters
+        ----------
+        kind : int
+            druh záznamu REC_*,
+        name : str
+            název kanálu, např. název vstupu nebo registru,
+        value :
+            hodnota, bool se ukládá jako 0 nebo 1.
+
+        Returns
+        -------
+            None
+        """
+        key = (kind, name)
+        if self.__last.get(key, self) == value:
+            return
+        with self.__lock:
+            if self.__file is None:
+                return
+            self.__last[key] = value
+            channel = self.__channels.get(name)
+            if channel is None:
+                channel = len(self.__channels)
+                self.__channels[name] = channel
+                text = name.encode('utf-8')
+                self.__append(REC_NAME, channel, len(text), text)
+            self.__append(kind, channel, float(value))
+            if kind in WRITE_KINDS:
+                self.writes = self.writes + 1
+            else:
+                self.samples = self.samples + 1
+
+    def meta(self, key: str, value):
+        """
+        Záznam popisu ovladače, ze kterého přehrání vytvoří náhradní ovladač.
+
+        Parameters
+        ----------
+        key : str
+            'dio', 'aio' nebo 'electrometers',
+        value :
+            popis převoditelný na json.
+
+        Returns
+        -------
+            None
+        """
+        text = json.dumps({key: value}).encode('utf-8')
+        with self.__lock:
+            if self.__file is not None:
+                self.__append(REC_META, 0, len(text), text)
+
+    def tick(self):
+        """
+        Značka začátku kroku hlavní smyčky. V plánovači se registruje s periodou digitálního stupně a vyšší prioritou
+        než stupně výkonné funkce.
+
+        Returns
+        -------
+            None
+        """
+        with self.__lock:
+            if self.__file is not None:
+                self.__append(REC_TICK, 0, 0.0)
+                self.ticks = self.ticks + 1
+
+    def close(self):
+        """
+        Ukončení odběru změn a zápis zbytku bufferu do souboru.
+
+        Returns
+        -------
+            None
+        """
+        with self.__lock:
+            if self.__file is None:
+                return
+            self.__datastore.unsubscribe(self.__subscription)
+            self.__file.write(self.__buffer)
+            self.__file.close()
+            self.__file = None
+            self.__buffer = bytearray()
+
+    def wrap_dio(self, dio):
+        """
+        Obalení ovladače digitálních vstupů a výstupů.
+
+        Parameters
+        ----------
+        dio : Dio
+            ovladač.
+
+        Returns
+        -------
+        dio :
+            obálka se stejným rozhraním.
+        """
+        self.meta('dio', {'DIGITAL_INPUTS': list(dio.DIGITAL_INPUTS),
+                          'DIGITAL_OUTPUTS_CTRL': dict(dio.DIGITAL_OUTPUTS_CTRL),
+                          'DIGITAL_OUTPUTS_LEDS': dict(dio.DIGITAL_OUTPUTS_LEDS)})
+        return _RecordedDio(dio, self)
+
+    def wrap_aio(self, aio):
+        """
+        Obalení ovladače analogových vstupů a výstupů.
+
+        Parameters
+        ----------
+        aio : Aio
+            ovladač.
+
+        Returns
+        -------
+        aio :
+            obálka se stejným rozhraním.
+        """
+        self.meta('aio', {'ANALOG_INPUTS': list(aio.ANALOG_INPUTS), 'ANALOG_OUTPUTS': list(aio.ANALOG_OUTPUTS)})
+        return _RecordedAio(aio, self)
+
+    def wrap_electrometer(self, electrometer, name: str):
+        """
+        Obalení elektroměru.
+
+        Parameters
+        ----------
+        electrometer : Electrometer
+            elektroměr,
+        name : str
+            název kanálu v záznamu, např. 'ELECTROMETER1'.
+
+        Returns
+        -------
+        electrometer :
+            obálka se stejným rozhraním.
+        """
+        self.meta('electrometer', {'name': name, 'period': electrometer.get_period()})
+        return _RecordedElectrometer(electrometer, self, name)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Náhradní ovladače pro přehrání
+# ----------------------------------------------------------------------------------------------------------------------
+class ReplayDio:
+    """
+    Náhradní ovladač digitálních vstupů a výstupů, hodnoty vstupů a počítadel nastavuje přehrání záznamu.
+    """
+
+    def __init__(self, meta: dict):
+        self.DIGITAL_INPUTS = {key: None for key in meta['DIGITAL_INPUTS']}
+        self.DIGITAL_OUTPUTS_CTRL = dict(meta['DIGITAL_OUTPUTS_CTRL'])
+        self.DIGITAL_OUTPUTS_LEDS = dict(meta['DIGITAL_OUTPUTS_LEDS'])
+        self.inputs = {key: False for key in self.DIGITAL_INPUTS}
+        self.counters = {key: 0 for key in self.DIGITAL_INPUTS}
+        self.outputs = {key: False for key in list(self.DIGITAL_OUTPUTS_CTRL) + list(self.DIGITAL_OUTPUTS_LEDS)}
+        self.__version = 0
+
+    def transfer(self) -> bool:
+        return False
+
+    def service(self, timeout: float = None) -> bool:
+        return False
+
+    def begin_commit(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def get_stats(self) -> dict:
+        return {'frames': 0, 'refreshes': 0, 'latency_mean': 0.0, 'latency_max': 0.0}
+
+    def restart(self):
+        pass
+
+    def is_alive(self) -> bool:
+        return True
+
+    def kill(self):
+        pass
+
+    def set_output(self, name: str, level: bool):
+        self.outputs[name] = level
+
+    def get_output(self, name: str) -> bool:
+        return self.outputs[name]
+
+    def get_input(self, name: str) -> bool:
+        return self.inputs[name]
+
+    def get_inputs_mask(self) -> int:
+        return sum(1 << num for num, key in enumerate(self.DIGITAL_INPUTS) if self.inputs[key])
+
+    def get_input_version(self) -> int:
+        # prehrani meni vstupy primo v atributech, stavy se proto ctou v kazdem kroku
+        self.__version = self.__version + 1
+        return self.__version
+
+    def get_input_counter(self, name: str) -> int:
+        return self.counters[name]
+
+    def set_input_counter(self, name: str, value: int):
+        self.counters[name] = value
+
+    def clr_input_counter(self, name: str):
+        self.counters[name] = 0
+
+    def take_input_counter(self, name: str) -> int:
+        value = self.counters[name]
+        self.counters[name] = 0
+        return value
+
+
+class ReplayAio:
+    """
+    Náhradní ovladač analogových vstupů a výstupů, hodnoty vstupů nastavuje přehrání záznamu.
+    """
+
+    def __init__(self, meta: dict):
+        self.ANALOG_INPUTS = {key: None for key in meta['ANALOG_INPUTS']}
+        self.ANALOG_OUTPUTS = {key: None for key in meta['ANALOG_OUTPUTS']}
+        self.inputs = {key: 0.0 for key in self.ANALOG_INPUTS}
+        self.outputs = {key: 100 for key in self.ANALOG_OUTPUTS}
+
+    def check_calibration(self):
+        pass
+
+    def set_output(self, name: str, duty: int):
+        self.outputs[name] = duty
+
+    def get_output(self, name: str) -> int:
+        return self.outputs[name]
+
+    def get_input(self, name: str) -> float:
+        return self.inputs[name]
+
+
+class ReplayElectrometer:
+    """
+    Náhradní elektroměr, údaj odběru a výkonu nastavuje přehrání záznamu.
+    """
+
+    def __init__(self, period: float = 5.0):
+        self.value = 0
+        self.power = [0.0, 0.0]
+        self.__period = period
+
+    def start(self):
+        pass
+
+    def enable(self):
+        pass
+
+    def disable(self):
+        pass
+
+    def is_alive(self) -> bool:
+        return True
+
+    def read(self) -> int:
+        return self.value
+
+    def read_power(self) -> tuple:
+        return self.power[0], self.power[1]
+
+    def reset(self):
+        self.value = 0
+
+    def poll(self):
+        pass
+
+    def get_period(self) -> float:
+        return self.__period
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Přehrání
+# ----------------------------------------------------------------------------------------------------------------------
+def load(path: str) -> tuple:
+    """
+    Načtení souboru záznamu.
+
+    Parameters
+    ----------
+    path : str
+        cesta k souboru záznamu.
+
+    Returns
+    -------
+    meta, records : dict, list
+        popisy ovladačů {'dio', 'aio', 'electrometer': [...]} a záznamy [(čas v µs, druh, název kanálu, hodnota)]
+        bez záznamů REC_NAME a REC_META.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    magic, version, _ = RECORD_HEADER.unpack_from(data)
+    if magic != RECORD_MAGIC or version != RECORD_VERSION:
+        raise ValueError("Neznamy format souboru zaznamu {0}".format(path))
+
+    meta = {'electrometer': []}
+    names = {}
+    records = []
+    position = RECORD_HEADER.size
+    size = RECORD_ITEM.size
+    end = len(data) - size
+    while position <= end:
+        stamp, kind, channel, value = RECORD_ITEM.unpack_from(data, position)
+        position = position + size
+        if kind == REC_NAME or kind == REC_META:
+            text = data[position:position + int(value)].decode('utf-8')
+            position = position + int(value)
+            if kind == REC_NAME:
+                names[channel] = text
+            else:
+                for key, item in json.loads(text).items():
+                    if key == 'electrometer':
+                        meta[key].append(item)
+                    else:
+                        meta[key] = item
+        else:
+            records.append((stamp, kind, names.get(channel), value))
+    return meta, records
+
+
+class Replay:
+    """
+    Přehrání záznamu přes Execution.execute s náhradními ovladači. Každá značka kroku vykoná všechny stupně
+    výkonné funkce.
+    """
+
+    def __init__(self, path: str, datastore=None):
+        """
+        Načtení záznamu a příprava kroků přehrání.
+
+        Parameters
+        ----------
+        path : str
+            cesta k souboru záznamu,
+        datastore : DataStore
+            datový prostor, do kterého se přehrávají zápisy klientů, v základu globální datový prostor programu.
+        """
+        self.__datastore = datastore if datastore is not None else modbus_datastore
+        self.__meta, records = load(path)
+        self.dio = ReplayDio(self.__meta['dio'])
+        self.aio = ReplayAio(self.__meta['aio'])
+        self.electrometers = [ReplayElectrometer(item['period']) for item in self.__meta['electrometer']]
+        meters = {item['name']: meter for item, meter in zip(self.__meta['electrometer'], self.electrometers)}
+
+        # predkompilace zaznamu na funkce nastaveni hodnot, kroky [(cas v us, vzorky, zapisy)]
+        def setter(values: dict, key: str, value):
+            return lambda: values.__setitem__(key, value)
+
+        self.__initial = []
+        self.__steps = []
+        self.samples = 0
+        self.writes = 0
+        for stamp, kind, name, value in records:
+            if kind == REC_TICK:
+                self.__steps.append((stamp, [], []))
+            elif kind in WRITE_KINDS:
+                handle = self.__datastore.get_handle(WRITE_KINDS[kind], name)
+                value = bool(value) if kind == REC_COIL else int(value)
+                action = (lambda handle, value: lambda: handle.set(value))(handle, value)
+                (self.__steps[-1][2] if self.__steps else self.__initial).append(action)
+                self.writes = self.writes + 1
+            elif kind in SAMPLE_KINDS:
+                if kind == REC_INPUT:
+                    action = setter(self.dio.inputs, name, bool(value))
+                elif kind == REC_COUNTER:
+                    action = setter(self.dio.counters, name, int(value))
+                elif kind == REC_ANALOG:
+                    action = setter(self.aio.inputs, name, value)
+                elif kind == REC_METER:
+                    meter = meters[name]
+                    action = (lambda meter, value: lambda: setattr(meter, 'value', value))(meter, int(value))
+                else:
+                    action = setter(meters[name].power, kind - REC_POWER, value)
+                (self.__steps[-1][1] if self.__steps else self.__initial).append(action)
+                self.samples = self.samples + 1
+
+    def create_execution(self) -> Execution:
+        """
+        Vytvoření výkonné funkce nad náhradními ovladači.
+
+        Returns
+        -------
+        execution : Execution
+            výkonná funkce bez vláken.
+        """
+        return Execution(threaded=False, dio=self.dio, aio=self.aio, electrometers=self.electrometers)
+
+    def run(self, realtime: bool = False, execution: Execution = None, digest: bool = False) -> dict:
+        """
+        Přehrání záznamu. Před krokem se nastaví vzorky kroku, po vykonání kroku se uplatní zápisy klientů.
+
+        Parameters
+        ----------
+        realtime : bool
+            True pro dodržení časových značek záznamu, jinak co nejrychleji,
+        execution : Execution
+            výkonná funkce, v základu se vytvoří funkcí create_execution(),
+        digest : bool
+            True pro výpočet otisku obsahu datového prostoru po každém kroku (zpomaluje přehrání).
+
+        Returns
+        -------
+        result : dict
+            {'ticks', 'samples', 'writes', 'duration', 'tick_mean', 'tick_p99', 'tick_max', 'digest'}, doba přehrání
+            v s, doby kroku v µs.
+        """
+        if execution is None:
+            execution = self.create_execution()
+        execute = execution.execute
+        durations = []
+        crc = 0
+
+        for action in self.__initial:
+            action()
+        start = time.monotonic()
+        origin = self.__steps[0][0] if self.__steps else 0
+        for stamp, samples, writes in self.__steps:
+            if realtime:
+                delay = start + (stamp - origin) / 1e6 - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            for action in samples:
+                action()
+            tick_start = time.perf_counter_ns()
+            execute()
+            durations.append(time.perf_counter_ns() - tick_start)
+            if digest:
+                crc = snapshot_digest(self.__datastore, crc)
+            for action in writes:
+                action()
+        duration = time.monotonic() - start
+
+        durations.sort()
+        count = len(durations)
+        return {
+            'ticks': count,
+            'samples': self.samples,
+            'writes': self.writes,
+            'duration': duration,
+            'tick_mean': sum(durations) / count / 1000 if count else 0.0,
+            'tick_p99': durations[(99 * (count - 1)) // 100] / 1000 if count else 0.0,
+            'tick_max': durations[-1] / 1000 if count else 0.0,
+            'digest': crc,
+        }
+
+
+def snapshot_digest(datastore, crc: int = 0) -> int:
+    """
+    Otisk obsahu datového prostoru bez diagnostických registrů doby vykonávání.
+
+    Parameters
+    ----------
+    datastore : DataStore
+        datový prostor,
+    crc : int
+        otisk předchozího kroku pro řetězení.
+
+    Returns
+    -------
+    crc : int
+        crc32 obsahu.
+    """
+    snapshot = {key: value for key, value in datastore.snapshot().items() if not key.startswith('TIME_')}
+    return zlib.crc32(json.dumps(snapshot, sort_keys=True).encode('utf-8'), crc)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Test modulu
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    peg_msg.infomsg("Test zaznamu a prehrani vzorku hw")
+    peg_msg.infomsg("=================================")
+
+    dbg_path = os.path.join(tempfile.mkdtemp(), 'peg.rec')
+
+    # zaznam nad nahradnimi ovladaci, ktere nastavuje test
+    dbg_dio = ReplayDio({'DIGITAL_INPUTS': ['IN1P0_ELEM', 'IN1P1_LOCK', 'IN1P2_STOK', 'IN1P3_BTON',
+                                            'IN2P0_ELEM', 'IN2P1_LOCK', 'IN2P2_STOK', 'IN2P3_BTON'],
+                         'DIGITAL_OUTPUTS_CTRL': {'POWER_SW1': False, 'OPEN_LOCK1': False, 'CLOSE_LOCK1': False,
+                                                  'POWER_SW2': False, 'OPEN_LOCK2': False, 'CLOSE_LOCK2': False,
+                                                  'DISABLE_LOCK12': False},
+                         'DIGITAL_OUTPUTS_LEDS': {'RED1': False, 'GREEN1': False, 'BLUE1': False, 'RED2': False,
+                                                  'GREEN2': False, 'BLUE2': False}})
+    dbg_aio = ReplayAio({'ANALOG_INPUTS': ['PP1', 'CP1', 'PP2', 'CP2'], 'ANALOG_OUTPUTS': ['CP1', 'CP2']})
+    dbg_meters = [ReplayElectrometer(), ReplayElectrometer()]
+    dbg_recorder = Recorder(dbg_path)
+    dbg_execution = Execution(threaded=False, dio=dbg_dio, aio=dbg_aio, electrometers=dbg_meters,
+                              recorder=dbg_recorder)
+    dbg_crc = 0
+    for dbg_step in range(500):
+        dbg_recorder.tick()
+        dbg_dio.inputs['IN1P0_ELEM'] = dbg_step % 7 == 0
+        dbg_dio.counters['IN1P0_ELEM'] = dbg_step // 7
+        dbg_aio.inputs['CP1'] = 6.0 if dbg_step < 250 else 9.0
+        dbg_meters[0].value = dbg_step // 50
+        dbg_execution.execute()
+        dbg_crc = snapshot_digest(modbus_datastore, dbg_crc)
+        if dbg_step % 100 == 10:
+            modbus_datastore.set_co_state('POWER_SW1', not modbus_datastore.get_co_state('POWER_SW1'))
+            modbus_datastore.set_hr_state('CP_DUTY1', dbg_step // 10)
+    dbg_recorder.close()
+    del dbg_execution
+    peg_msg.infomsg("Zaznam: {0} kroku, {1} vzorku, {2} zapisu, {3} B".format(
+        dbg_recorder.ticks, dbg_recorder.samples, dbg_recorder.writes, os.path.getsize(dbg_path)))
+
+    dbg_replay = Replay(dbg_path)
+    dbg_result = dbg_replay.run(digest=True)
+    if dbg_result['digest'] == dbg_crc and dbg_result['ticks'] == 500:
+        peg_msg.validmsg("Prehrani odpovida zaznamu: {0}".format(dbg_result))
+    else:
+        peg_msg.errormsg("Prehrani neodpovida zaznamu: {0}, otisk {1}".format(dbg_result, dbg_crc))
+
+    dbg_result = Replay(dbg_path).run()
+    peg_msg.infomsg("Prehrani co nejrychleji: {0:.3f} s, krok prumer {1:.0f} us, p99 {2:.0f} us".format(
+        dbg_result['duration'], dbg_result['tick_mean'], dbg_result['tick_p99']))
+    os.remove(dbg_path)
@@ -0,0 +1,262 @@
+""" SCHEDULER Plánování periodických úloh hlavní smyčky
+
+    Modul nabízí plánovač, ve kterém se každá úloha programové smyčky registruje s vlastní periodou a prioritou.
+    Termíny spuštění jsou absolutní podle monotónních hodin (time.monotonic), perioda úlohy se tak neposouvá o dobu
+    vykonávání ostatních úloh. Pokud úloha nestihne jeden nebo více svých termínů, zaznamená se přetečení a úloha
+    pokračuje nejbližším budoucím termínem bez dohánění zmeškaných spuštění.
+"""
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Import knihoven
+# ----------------------------------------------------------------------------------------------------------------------
+# monotonni casovani terminu
+import time
+
+# hlaseni na konzoli
+try:
+    import peg_msg
+except ImportError:
+    from src import peg_msg
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Konstanty modulu
+# ----------------------------------------------------------------------------------------------------------------------
+# nejkratsi povolena perioda ulohy v sekundach
+MIN_PERIOD = 0.001
+
+# nejdelsi doba jednoho uspani planovace v sekundach, aby bylo mozne smycku ukoncit
+MAX_SLEEP = 0.5
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Datové třídy modulu
+# ----------------------------------------------------------------------------------------------------------------------
+class Task:
+    """
+    Periodická úloha plánovače s počítadly spuštění a přetečení.
+    """
+    __slots__ = ('name', 'function', 'period', 'priority', 'order', 'deadline', 'runs', 'overruns', 'late_max',
+                 'errors')
+
+    def __init__(self, name: str, function, period: float, priority: int, order: int, deadline: float):
+        """
+        Založení úlohy.
+
+        Parameters
+        ----------
+        name : str
+            název úlohy,
+        function : callable
+            funkce úlohy volaná bez parametrů,
+        period : float
+            perioda spouštění v sekundách,
+        priority : int
+            priorita, při shodném termínu se dříve spouští úloha s nižším číslem,
+        order : int
+            pořadí registrace, rozhoduje při shodné prioritě,
+        deadline : float
+            první termín spuštění podle time.monotonic().
+        """
+        self.name = name
+        self.function = function
+        self.period = period
+        self.priority = priority
+        self.order = order
+        self.deadline = deadline
+        self.runs = 0
+        self.overruns = 0
+        self.late_max = 0.0
+        self.errors = 0
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Hlavní třída modulu
+# ----------------------------------------------------------------------------------------------------------------------
+class Scheduler:
+    """
+    Plánovač periodických úloh s absolutními termíny.
+    """
+
+    def __init__(self):
+        """
+        Založení prázdného plánovače.
+        """
+        self.__tasks = {}
+        # ulohy serazene podle priority a poradi registrace
+        self.__order = []
+
+    def add(self, name: str, function, period: float, priority: int = 0) -> Task:
+        """
+        Registrace periodické úlohy. První spuštění je ihned při nejbližším volání run_pending().
+
+        Parameters
+        ----------
+        name : str
+            jedinečný název úlohy,
+        function : callable
+            funkce úlohy volaná bez parametrů,
+        period : float
+            perioda spouštění v sekundách,
+        priority : int
+            priorita, při shodném termínu se dříve spouští úloha s nižším číslem.
+
+        Returns
+        -------
+        task : Task
+            zaregistrovaná úloha.
+        """
+        if name in self.__tasks:
+            raise ValueError('Uloha {0} je jiz registrovana.'.format(name))
+        task = Task(name=name,
+                    function=function,
+                    period=max(float(period), MIN_PERIOD),
+                    priority=priority,
+                    order=len(self.__tasks),
+                    deadline=time.monotonic())
+        self.__tasks[name] = task
+        self.__order = sorted(self.__tasks.values(), key=lambda item: (item.priority, item.order))
+        return task
+
+    def set_period(self, name: str, period: float):
+        """
+        Změna periody úlohy. Nová perioda platí od příštího termínu.
+
+        Parameters
+        ----------
+        name : str
+            název úlohy,
+        period : float
+            nová perioda v sekundách.
+
+        Returns
+        -------
+            None
+        """
+        if name in self.__tasks:
+            self.__tasks[name].period = max(float(period), MIN_PERIOD)
+
+    def next_deadline(self) -> float:
+        """
+        Získání nejbližšího termínu spuštění některé úlohy.
+
+        Returns
+        -------
+        deadline : float
+            termín podle time.monotonic() nebo None, pokud plánovač nemá úlohy.
+        """
+        if not self.__order:
+            return None
+        return min(task.deadline for task in self.__order)
+
+    def run_pending(self, now: float = None) -> int:
+        """
+        Spuštění všech úloh, jejichž termín již nastal, v pořadí podle priority. Další termín úlohy se počítá
+        od předchozího termínu, ne od okamžiku spuštění, takže perioda neujíždí.
+
+        Parameters
+        ----------
+        now : float
+            aktuální čas podle time.monotonic(), v základu se zjistí.
+
+        Returns
+        -------
+        count : int
+            počet spuštěných úloh.
+        """
+        if now is None:
+            now = time.monotonic()
+        count = 0
+        for task in self.__order:
+            if task.deadline > now:
+                continue
+
+            late = now - task.deadline
+            if late > task.late_max:
+                task.late_max = late
+            # zmeskane terminy se nedohani, zaznamena se pocet preskocenych spusteni
+            missed = int(late // task.period)
+            if missed:
+                task.overruns = task.overruns + missed
+            task.deadline = task.deadline + (missed + 1) * task.period
+
+            try:
+                task.function()
+            except Exception as err:
+                task.errors = task.errors + 1
+                peg_msg.errormsg("Chyba ulohy planovace {0}: {1}".format(task.name, err))
+            task.runs = task.runs + 1
+            count = count + 1
+        return count
+
+    def run_once(self) -> int:
+        """
+        Čekání na nejbližší termín a spuštění připravených úloh. Čekání je omezeno na MAX_SLEEP, aby volající
+        smyčka mohla pravidelně kontrolovat své ukončení.
+
+        Returns
+        -------
+        count : int
+            počet spuštěných úloh.
+        """
+        deadline = self.next_deadline()
+        if deadline is None:
+            time.sleep(MAX_SLEEP)
+            return 0
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(min(delay, MAX_SLEEP))
+        return self.run_pending()
+
+    def get_stats(self) -> dict:
+        """
+        Získání statistik úloh.
+
+        Returns
+        -------
+        stats : dict
+            slovník {název úlohy: {'period', 'priority', 'runs', 'overruns', 'late_max', 'errors'}}.
+        """
+        stats = {}
+        for task in self.__order:
+            stats[task.name] = {
+                'period': task.period,
+                'priority': task.priority,
+                'runs': task.runs,
+                'overruns': task.overruns,
+                'late_max': task.late_max,
+                'errors': task.errors,
+            }
+        return stats
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Test modulu
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    peg_msg.infomsg("Test planovace uloh")
+    peg_msg.infomsg("===================")
+
+    dbg_scheduler = Scheduler()
+    dbg_scheduler.add('fast', lambda: None, period=0.01, priority=0)
+    dbg_scheduler.add('medium', lambda: None, period=0.05, priority=1)
+    dbg_scheduler.add('slow', lambda: time.sleep(0.03), period=1.0, priority=2)
+    # jednou dlouha uloha musi zaznamenat preteceni sebe i ostatnich uloh
+    dbg_long_runs = [0.25]
+    dbg_scheduler.add('overrun', lambda: time.sleep(dbg_long_runs.pop() if dbg_long_runs else 0), period=0.1,
+                      priority=3)
+
+    dbg_start = time.monotonic()
+    while time.monotonic() - dbg_start < 1.95:
+        dbg_scheduler.run_once()
+
+    dbg_expected = {'fast': 200, 'medium': 40, 'slow': 2}
+    for dbg_name, dbg_stats in dbg_scheduler.get_stats().items():
+        dbg_text = "{0: <8} runs={1: <4} overruns={2: <3} late_max={3:.1f} ms".format(
+            dbg_name, dbg_stats['runs'], dbg_stats['overruns'], dbg_stats['late_max'] * 1000)
+        if dbg_name in dbg_expected and abs(dbg_stats['runs'] - dbg_expected[dbg_name]) > dbg_expected[dbg_name] // 5:
+            peg_msg.errormsg(dbg_text)
+        elif dbg_name == 'overrun' and dbg_stats['overruns'] == 0:
+            peg_msg.errormsg(dbg_text)
+        else:
+            peg_msg.validmsg(dbg_text)
@@ -10,6 +10,10 @@
 # vlakno pro nezavisly beh serveru
 import threading
 
+# zjisteni pripravenosti serveru
+import socket
+import time
+
 # hlaseni na konzoli
 try:
     import peg_msg
@@ -19,7 +23,11 @@ except ImportError:
 # ----------------------------------------------------------------------------------------------------------------------
 # Konstanty modulu
 # ----------------------------------------------------------------------------------------------------------------------
+# nejdelsi doba cekani na pripravenost serveru v sekundach
+READY_TIMEOUT = 10.0
 
+# perioda zkousky pripravenosti serveru v sekundach
+READY_POLL = 0.01
 
 # ----------------------------------------------------------------------------------------------------------------------
 # Hlavní třída modulu
@@ -100,6 +108,71 @@ class  BasicServer:
             self.__thread.join(timeout=10.0)
             self.__thread_kill_requested = False
 
+    def get_address(self) -> str:
+        """
+        Adresa serveru ve formatu <ip>:<port>, server bez adresy vraci None.
+
+        Returns
+        -------
+        ip_address : str
+            ip adresa serveru.
+        """
+        return None
+
+    def _probe(self, host: str, port: int) -> bool:
+        """
+        Jedna zkouska pripravenosti serveru, v zakladu navazani spojeni na naslouchajici soket.
+
+        Parameters
+        ----------
+        host : str
+            ip adresa serveru,
+        port : int
+            port serveru.
+
+        Returns
+        -------
+            True pokud server odpovida, jinak False.
+        """
+        try:
+            with socket.create_connection((host, port), timeout=READY_POLL * 10):
+                return True
+        except OSError:
+            return False
+
+    def wait_ready(self, timeout: float = READY_TIMEOUT, alive=None) -> bool:
+        """
+        Cekani na pripravenost serveru, tj. server prijima spojeni a odpovida. Ceka se nejdele zadanou dobu nebo do
+        ukonceni vlakna serveru.
+
+        Parameters
+        ----------
+        timeout : float
+            nejdelsi doba cekani v sekundach,
+        alive : callable
+            funkce vracejici beh serveru, v zakladu is_alive, napr. pro server v oddelenem procesu nebo ve smycce
+            asyncio.
+
+        Returns
+        -------
+            True pokud je server pripraven, jinak False.
+        """
+        alive = alive or self.is_alive
+        address = self.get_address()
+        if address is None:
+            return bool(alive())
+        host, port = address.rsplit(':', 1)
+        if host in ('', '0.0.0.0'):
+            host = '127.0.0.1'
+        deadline = time.monotonic() + timeout
+        while alive():
+            if self._probe(host, int(port)):
+                return True
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(READY_POLL)
+        return False
+
     def get_kill_request(self):
         """
         Získání požadavku na ukončení procesu.
@@ -0,0 +1,285 @@
+""" TIMING Měření doby vykonávání stupňů programu
+
+    Modul nabízí klouzavou statistiku doby vykonávání (min, průměr, max, 99. percentil) pro jednotlivé stupně výkonné
+    funkce. Vzorky se ukládají do kruhového bufferu pevné délky, zápis vzorku je tak levný a statistika se počítá až
+    při dotazu, např. pro diagnostické registry nebo webový soubor timing.json.
+
+    Dále nabízí záznam časů kroků startu programu, např. doby do první odpovědi modbus serveru (startup.json).
+"""
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Import knihoven
+# ----------------------------------------------------------------------------------------------------------------------
+# kompaktni kruhovy buffer vzorku
+from array import array
+
+# monotonni hodiny s rozlisenim ns
+import time
+
+# export json
+import json
+
+# hlaseni na konzoli
+try:
+    import peg_msg
+except ImportError:
+    from src import peg_msg
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Konstanty modulu
+# ----------------------------------------------------------------------------------------------------------------------
+# merene stupne vykonne funkce
+STAGE_NAMES = (
+    'DIGITAL_INPUTS',
+    'LEDS',
+    'CTRL_OUTPUTS',
+    'ANALOG_INPUTS',
+    'ANALOG_OUTPUTS',
+    'COUNTERS',
+    'ELECTROMETERS',
+    'CALIBRATION',
+)
+
+# udaje statistiky jednoho stupne
+STAT_NAMES = ('MIN', 'MEAN', 'MAX', 'P99')
+
+# pocet vzorku klouzaveho okna, musi byt mocnina 2
+TIMING_WINDOW = 1024
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Datové třídy modulu
+# ----------------------------------------------------------------------------------------------------------------------
+class TimingStats:
+    """
+    Klouzavá statistika doby vykonávání jednoho stupně z posledních TIMING_WINDOW vzorků.
+    """
+    __slots__ = ('name', '__samples', '__position', '__count')
+
+    def __init__(self, name: str):
+        """
+        Založení prázdné statistiky.
+
+        Parameters
+        ----------
+        name : str
+            název stupně.
+        """
+        self.name = name
+        self.__samples = array('Q', bytes(8 * TIMING_WINDOW))
+        self.__position = 0
+        self.__count = 0
+
+    def add(self, duration: int):
+        """
+        Přidání jednoho vzorku.
+
+        Parameters
+        ----------
+        duration : int
+            doba vykonávání v ns, např. rozdíl dvou hodnot time.perf_counter_ns().
+
+        Returns
+        -------
+            None
+        """
+        self.__samples[self.__position] = duration
+        self.__position = (self.__position + 1) & (TIMING_WINDOW - 1)
+        if self.__count < TIMING_WINDOW:
+            self.__count = self.__count + 1
+
+    def summary(self) -> dict:
+        """
+        Výpočet statistiky z vzorků okna.
+
+        Returns
+        -------
+        summary : dict
+            {'MIN', 'MEAN', 'MAX', 'P99'} v µs a 'SAMPLES' s počtem vzorků. Bez vzorků jsou hodnoty 0.
+        """
+        count = self.__count
+        samples = sorted(self.__samples[:count])
+        if not samples:
+            return {'MIN': 0.0, 'MEAN': 0.0, 'MAX': 0.0, 'P99': 0.0, 'SAMPLES': 0}
+        return {
+            'MIN': samples[0] / 1000,
+            'MEAN': sum(samples) / count / 1000,
+            'MAX': samples[-1] / 1000,
+            'P99': samples[(99 * (count - 1)) // 100] / 1000,
+            'SAMPLES': count,
+        }
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Hlavní třída modulu
+# ----------------------------------------------------------------------------------------------------------------------
+class StageTimer:
+    """
+    Soubor statistik doby vykonávání stupňů výkonné funkce.
+    """
+
+    def __init__(self, names: tuple = STAGE_NAMES):
+        """
+        Založení statistik pro všechny stupně.
+
+        Parameters
+        ----------
+        names : tuple
+            názvy měřených stupňů.
+        """
+        self.__stats = {}
+        for name in names:
+            self.__stats[name] = TimingStats(name)
+
+    def get(self, name: str) -> TimingStats:
+        """
+        Získání statistiky stupně. Objekt je vhodné získat jednou a dále volat přímo jeho funkci add().
+
+        Parameters
+        ----------
+        name : str
+            název stupně,
+
+        Returns
+        -------
+        stats : TimingStats
+            statistika stupně nebo None, pokud stupeň neexistuje.
+        """
+        return self.__stats.get(name)
+
+    def summary(self) -> dict:
+        """
+        Statistika všech stupňů.
+
+        Returns
+        -------
+        summary : dict
+            {název stupně: {'MIN', 'MEAN', 'MAX', 'P99', 'SAMPLES'}}, doby v µs.
+        """
+        return {name: stats.summary() for name, stats in self.__stats.items()}
+
+    def get_json(self) -> str:
+        """
+        Statistika všech stupňů jako text json.
+
+        Returns
+        -------
+        text : str
+            obsah souboru timing.json.
+        """
+        return json.dumps(self.summary(), ensure_ascii=False, indent=2)
+
+
+class StartupTimer:
+    """
+    Záznam časů dokončení kroků startu programu od založení objektu.
+    """
+
+    def __init__(self):
+        """
+        Založení záznamu, čas startu je okamžik založení.
+        """
+        self.__start = time.monotonic()
+        self.__marks = {}
+
+    def mark(self, name: str) -> float:
+        """
+        Záznam dokončení kroku startu.
+
+        Parameters
+        ----------
+        name : str
+            název kroku.
+
+        Returns
+        -------
+        elapsed : float
+            doba od startu v ms.
+        """
+        elapsed = (time.monotonic() - self.__start) * 1000
+        self.__marks[name] = elapsed
+        return elapsed
+
+    def get(self, name: str) -> float:
+        """
+        Získání času dokončení kroku.
+
+        Parameters
+        ----------
+        name : str
+            název kroku.
+
+        Returns
+        -------
+        elapsed : float
+            doba od startu v ms nebo None, pokud krok nebyl dokončen.
+        """
+        return self.__marks.get(name)
+
+    def summary(self) -> dict:
+        """
+        Časy všech dokončených kroků v pořadí dokončení.
+
+        Returns
+        -------
+        summary : dict
+            {název kroku: doba od startu v ms}.
+        """
+        return dict(self.__marks)
+
+    def get_json(self) -> str:
+        """
+        Časy kroků startu jako text json.
+
+        Returns
+        -------
+        text : str
+            obsah souboru startup.json.
+        """
+        return json.dumps(self.summary(), ensure_ascii=False, indent=2)
+
+    def report(self):
+        """
+        Výpis časů kroků startu na konzoli.
+
+        Returns
+        -------
+            None
+        """
+        previous = 0.0
+        for name, elapsed in self.__marks.items():
+            peg_msg.infomsg("{0: <24} {1:8.1f} ms (+{2:.1f} ms)".format(name, elapsed, elapsed - previous))
+            previous = elapsed
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Test modulu
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    peg_msg.infomsg("Test mereni doby vykonavani stupnu")
+    peg_msg.infomsg("==================================")
+
+    dbg_timer = StageTimer(names=('SLEEP', 'EMPTY'))
+    dbg_sleep = dbg_timer.get('SLEEP')
+    dbg_empty = dbg_timer.get('EMPTY')
+    for dbg_num in range(200):
+        dbg_start = time.perf_counter_ns()
+        time.sleep(0.001)
+        dbg_middle = time.perf_counter_ns()
+        dbg_sleep.add(dbg_middle - dbg_start)
+        dbg_empty.add(time.perf_counter_ns() - dbg_middle)
+
+    dbg_summary = dbg_timer.summary()
+    peg_msg.infomsg(dbg_timer.get_json())
+    if dbg_summary['SLEEP']['MIN'] >= 1000 and dbg_summary['SLEEP']['P99'] <= dbg_summary['SLEEP']['MAX'] \
+            and dbg_summary['EMPTY']['MEAN'] < dbg_summary['SLEEP']['MIN']:
+        peg_msg.validmsg("Statistika odpovida merenym dobam")
+    else:
+        peg_msg.errormsg("Statistika neodpovida merenym dobam")
+
+    # rezie mereni jednoho vzorku
+    dbg_start = time.perf_counter_ns()
+    for dbg_num in range(100000):
+        dbg_empty.add(time.perf_counter_ns() - dbg_start)
+    peg_msg.infomsg("Rezie jednoho vzorku {0:.0f} ns".format((time.perf_counter_ns() - dbg_start) / 100000))
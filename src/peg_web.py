@@ -9,8 +9,15 @@
 # casovani debugu
 import time
 
+# asynchronni http server pro rezim asyncio
+import asyncio
+import io
+import sys
+
 # import framework
 from flask import render_template
+from flask import request
+from flask import make_response
 
 #import wsqi
 from waitress import serve
@@ -33,6 +40,18 @@ try:
 except (ImportError, ModuleNotFoundError):
     from src.peg_global_scope import singleton_modbus_datastore as modbus_datastore
 
+# import statistik doby vykonavani stupnu
+try:
+    from peg_global_scope import singleton_stage_timer as stage_timer
+except (ImportError, ModuleNotFoundError):
+    from src.peg_global_scope import singleton_stage_timer as stage_timer
+
+# import casu kroku startu programu
+try:
+    from peg_global_scope import singleton_startup_timer as startup_timer
+except (ImportError, ModuleNotFoundError):
+    from src.peg_global_scope import singleton_startup_timer as startup_timer
+
 # hlaseni na konzoli
 try:
     import peg_msg
@@ -48,6 +67,9 @@ DEFAULT_IP = "0.0.0.0"
 # komunikacni port
 DEFAULT_PORT = 8080
 
+# doba necinnosti spojeni keep-alive asynchronniho serveru v sekundach
+HTTP_KEEPALIVE = 15.0
+
 # ----------------------------------------------------------------------------------------------------------------------
 # Globální metody
 # ----------------------------------------------------------------------------------------------------------------------
@@ -68,22 +90,159 @@ def postmort():
 
 @app.route('/co.json')
 def read_coils():
-    return modbus_datastore.get_file_data('co.json')
+    return read_json_file('co.json')
 
 
 @app.route('/di.json')
 def read_digital_inputs():
-    return modbus_datastore.get_file_data('di.json')
+    return read_json_file('di.json')
 
 
 @app.route('/hr.json')
 def read_holding_registers():
-    return modbus_datastore.get_file_data('hr.json')
+    return read_json_file('hr.json')
 
 
 @app.route('/ir.json')
 def read_input_registers():
-    return modbus_datastore.get_file_data('ir.json')
+    return read_json_file('ir.json')
+
+
+@app.route('/all.json')
+def read_all_registers():
+    return read_json_file('all.json')
+
+
+@app.route('/timing.json')
+def read_timing():
+    response = make_response(stage_timer.get_json())
+    response.mimetype = 'application/json'
+    return response
+
+
+@app.route('/startup.json')
+def read_startup():
+    response = make_response(startup_timer.get_json())
+    response.mimetype = 'application/json'
+    return response
+
+
+def read_json_file(filename: str):
+    """
+    Odpoved se souborem json. Pokud klient posila v hlavicce If-None-Match aktualni znacku verze obsahu, odpovida se
+    pouze kodem 304 bez obsahu.
+
+    Parameters
+    ----------
+    filename : str
+        nazev souboru json v datovem prostoru modbusu.
+
+    Returns
+    -------
+    response : flask.Response
+        odpoved serveru.
+    """
+    etag = modbus_datastore.get_file_etag(filename)
+    if etag is not None and etag in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        response = make_response(modbus_datastore.get_file_data(filename))
+    response.set_etag(etag)
+    return response
+
+
+async def serve_http_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """
+    Obsluha jednoho spojení asynchronního http serveru. Požadavky se předávají aplikaci Flask přes rozhraní WSGI
+    přímo ve smyčce asyncio, obsluha je krátká, protože soubory json jsou připravené v datovém prostoru. Spojení
+    zůstává otevřené pro další požadavky (HTTP/1.1 keep-alive) až do HTTP_KEEPALIVE sekund nečinnosti.
+
+    Parameters
+    ----------
+    reader : asyncio.StreamReader
+        čtení požadavků,
+    writer : asyncio.StreamWriter
+        zápis odpovědí.
+
+    Returns
+    -------
+        None
+    """
+    peer = writer.get_extra_info('peername') or ('', 0)
+    sock = writer.get_extra_info('sockname') or (DEFAULT_IP, DEFAULT_PORT)
+    try:
+        keep_alive = True
+        while keep_alive:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=HTTP_KEEPALIVE)
+            if not request_line:
+                break
+            try:
+                method, target, version = request_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+            except ValueError:
+                writer.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                break
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length') or 0)
+            body = await reader.readexactly(length) if length else b''
+            keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+            path, _, query = target.partition('?')
+            environ = {
+                'REQUEST_METHOD': method,
+                'SCRIPT_NAME': '',
+                'PATH_INFO': path,
+                'QUERY_STRING': query,
+                'SERVER_NAME': str(sock[0]),
+                'SERVER_PORT': str(sock[1]),
+                'SERVER_PROTOCOL': version,
+                'REMOTE_ADDR': str(peer[0]),
+                'wsgi.version': (1, 0),
+                'wsgi.url_scheme': 'http',
+                'wsgi.input': io.BytesIO(body),
+                'wsgi.errors': sys.stderr,
+                'wsgi.multithread': False,
+                'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+            }
+            for name, value in headers.items():
+                if name in ('content-type', 'content-length'):
+                    environ[name.upper().replace('-', '_')] = value
+                else:
+                    environ['HTTP_' + name.upper().replace('-', '_')] = value
+
+            response = []
+
+            def start_response(status, response_headers, exc_info=None):
+                response[:] = [status, response_headers]
+                return lambda data: None
+
+            result = app(environ, start_response)
+            try:
+                data = b''.join(result)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+
+            status, response_headers = response
+            head = ['HTTP/1.1 {0}'.format(status)]
+            for name, value in response_headers:
+                if name.lower() not in ('content-length', 'connection'):
+                    head.append('{0}: {1}'.format(name, value))
+            head.append('Content-Length: {0}'.format(len(data)))
+            head.append('Connection: {0}'.format('keep-alive' if keep_alive else 'close'))
+            writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + data)
+            await writer.drain()
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
 
 
 # ----------------------------------------------------------------------------------------------------------------------
@@ -118,6 +277,20 @@ class WebServer(BasicServer):
             else:
                 peg_msg.errormsg("Vlakno web serveru neocekavane ukoncilo cinnost")
 
+    async def serve_async(self):
+        """
+        Běh asynchronního http serveru jako úlohy smyčky asyncio místo vlákna serveru waitress. Server se ukončí
+        zrušením úlohy.
+
+        Returns
+        -------
+            None
+        """
+        server = await asyncio.start_server(serve_http_connection, host=self.__ipaddr[0], port=self.__ipaddr[1])
+        peg_msg.validmsg("Start asynchronniho web serveru.")
+        async with server:
+            await server.serve_forever()
+
     def get_address(self) -> str:
         """
         Funkce vrati retezec obsahujici ip adresu serveru ve formatu <ip>:<port>.
@@ -15,38 +15,17 @@ const postmort = document.getElementById("postmort")
 // =============================================================================
 // funkce pro cteni udaju modbus
 function ctiModbus() {
-		fetch("co.json")
+		fetch("all.json")
 				.then(function(response){
 					return response.json()
 				})
 				.then(function(data){
 				    {% block read_coils %}{% endblock %}
 
-				})
-
-		fetch("di.json")
-				.then(function(response){
-					return response.json()
-				})
-				.then(function(data){
 					{% block read_digital_inputs %}{% endblock %}
 
-				})
-
-		fetch("hr.json")
-				.then(function(response){
-					return response.json()
-				})
-				.then(function(data){
 					{% block read_holding_registers %}{% endblock %}
 
-				})
-
-		fetch("ir.json")
-				.then(function(response){
-				 return response.json()
-				})
-				.then(function(data){
 					{% block read_input_registers %}{% endblock %}
 
 				})}